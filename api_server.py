@@ -0,0 +1,262 @@
+"""Servidor HTTP de VictorIA sin Streamlit en el camino de cada petición.
+
+Expone la validación y la generación en streaming de ChatService:
+
+    POST /v1/chat   {"message": "...", "session": "<id>", "stream": true}
+    GET  /health    estado del motor de streaming y sesiones abiertas
+    GET  /metrics   métricas en formato Prometheus
+
+Con "stream" (por defecto) la respuesta son eventos SSE con codificación
+chunked: un `data: {"content": ...}` por fragmento, un evento final con la
+sesión, la ruta, los tokens y si la respuesta se cortó por max_tokens
+("truncated"), y `data: [DONE]`. Con "stream": false se
+responde un solo JSON. El cliente HTTP, el motor, el router y la caché de
+respuestas son los mismos para todas las peticiones del proceso.
+
+Uso:
+    python api_server.py [--host 127.0.0.1] [--port 8080]
+"""
+import argparse
+import hmac
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+import chat_engine
+import metrics
+from chat_service import ChatService
+
+# Sesiones con historial en memoria; al pasar el límite sale la menos usada
+MAX_SESSIONS = 1000
+# Cuerpo máximo de una petición (el mensaje ya se limita a 2000 caracteres)
+MAX_BODY_BYTES = 64 * 1024
+
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+class _Session:
+    __slots__ = ("service", "lock")
+
+    def __init__(self, service):
+        self.service = service
+        # Una respuesta a la vez por sesión: el contexto multi-turno es secuencial
+        self.lock = threading.Lock()
+
+class SessionPool:
+    """Conversaciones abiertas en el servidor, un ChatService por sesión (LRU)"""
+
+    def __init__(self, max_sessions=None, factory=ChatService):
+        self.max_sessions = max_sessions or int(os.getenv("VICTORIA_API_MAX_SESSIONS", str(MAX_SESSIONS)))
+        self.factory = factory
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id=None):
+        """Retorna (id, sesión), creándola si no existe o ya salió del pool"""
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        elif not isinstance(session_id, str) or not _SESSION_ID.fullmatch(session_id):
+            raise ValueError("el id de sesión debe ser un uuid en hexadecimal")
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.factory())
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+        return session_id, session
+
+    def __len__(self):
+        return len(self._sessions)
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    sessions = None
+    token = None
+
+    def setup(self):
+        super().setup()
+        # Sin Nagle: cada fragmento sale en cuanto llega del upstream
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/health":
+            self._send_json(200, {
+                "status": "ok",
+                "sessions": len(self.sessions),
+                "engine": chat_engine.get_engine().stats(),
+            })
+        elif path == "/metrics":
+            data = metrics.get_registry().render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": "Ruta no encontrada"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            # Sin un largo válido no se sabe dónde termina el cuerpo
+            self.close_connection = True
+            self._send_json(400, {"error": "Content-Length inválido"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {"error": "Petición demasiado grande"})
+            return
+        raw = self.rfile.read(length)
+        if self.path.split("?", 1)[0].rstrip("/") != "/v1/chat":
+            self._send_json(404, {"error": "Ruta no encontrada"})
+            return
+        if not self._authorized():
+            self._send_json(401, {"error": "Token inválido"})
+            return
+        try:
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            message = body.get("message")
+            if not isinstance(message, str) or not message.strip():
+                raise ValueError("falta el mensaje")
+            session_id, session = self.sessions.get(body.get("session"))
+        except ValueError as e:
+            self._send_json(400, {"error": f"Petición inválida: {e}"})
+            return
+
+        if not session.lock.acquire(blocking=False):
+            self._send_json(409, {"error": "La sesión ya tiene una respuesta en curso", "session": session_id})
+            return
+        try:
+            service = session.service
+            is_valid, error = service.validate_request(message)
+            if not is_valid:
+                self._send_json(400, {"error": error, "session": session_id})
+            elif body.get("stream", True):
+                self._stream_reply(session_id, service, message)
+            else:
+                self._complete_reply(session_id, service, message)
+        finally:
+            session.lock.release()
+
+    def _authorized(self):
+        if not self.token:
+            return True
+        header = self.headers.get("Authorization", "")
+        return hmac.compare_digest(header.encode("utf-8"), f"Bearer {self.token}".encode("utf-8"))
+
+    def _stream_reply(self, session_id, service, message):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        reply = service.stream_reply(message)
+        try:
+            try:
+                for content in reply:
+                    self._send_event({"content": content})
+                last = _summary(session_id, service)
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception as e:
+                last = {"error": f"Lo siento, ha ocurrido un error: {e}", "session": session_id}
+            self._send_event(last)
+            self._send_raw(b"data: [DONE]\n\n")
+            self._send_raw(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente se fue: cerrar el generador cancela el stream del upstream
+            self.close_connection = True
+        finally:
+            reply.close()
+
+    def _complete_reply(self, session_id, service, message):
+        try:
+            content = "".join(service.stream_reply(message))
+        except Exception as e:
+            self._send_json(502, {"error": f"Lo siento, ha ocurrido un error: {e}", "session": session_id})
+            return
+        self._send_json(200, {"content": content, **_summary(session_id, service)})
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, payload):
+        self._send_raw(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _send_raw(self, data):
+        # Codificación chunked de HTTP/1.1 para poder reutilizar la conexión
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+class _APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Cola de conexiones pendientes: la de socketserver (5) corta ráfagas de clientes
+    request_queue_size = 128
+
+def _summary(session_id, service):
+    return {
+        "done": True,
+        "session": session_id,
+        "route": service.last_route.name if service.last_route else None,
+        "usage": service.last_usage,
+        "truncated": service.last_truncated,
+    }
+
+def make_server(host="127.0.0.1", port=8080, sessions=None, token=None):
+    """Crea el servidor HTTP; el token por defecto sale de VICTORIA_API_TOKEN"""
+    handler = type("ChatHandler", (_ChatHandler,), {
+        "sessions": sessions or SessionPool(),
+        "token": token if token is not None else os.getenv("VICTORIA_API_TOKEN"),
+    })
+    return _APIServer((host, port), handler)
+
+def start_server(host="127.0.0.1", port=8080, sessions=None, token=None):
+    """Sirve la API desde un hilo de fondo y retorna el servidor"""
+    server = make_server(host, port, sessions, token)
+    threading.Thread(target=server.serve_forever, name="victoria-api", daemon=True).start()
+    return server
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.getenv("VICTORIA_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("VICTORIA_API_PORT", "8080")))
+    args = parser.parse_args()
+
+    if not os.getenv("DEEPSEEK_API_KEY"):
+        sys.exit("API Key no configurada: define DEEPSEEK_API_KEY en el entorno o en un archivo .env")
+    metrics.start_exporters_from_env()
+    server = make_server(args.host, args.port)
+    print(f"VictorIA API escuchando en http://{args.host}:{server.server_address[1]}/v1/chat")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
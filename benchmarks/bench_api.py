@@ -0,0 +1,167 @@
+"""Benchmark de throughput: API HTTP sin Streamlit vs. el camino de Streamlit.
+
+Levanta el mock de DeepSeek y api_server.py en hilos de fondo, y simula
+clientes concurrentes que envían varias preguntas seguidas a /v1/chat en su
+misma sesión leyendo los eventos SSE. Después manda la misma carga a
+VictoriaChatbot.generate_response en modo "bare" (un hilo por sesión, como
+bench_load.py) y, si se puede, a la app completa con el AppTest de
+Streamlit (una sesión), que vuelve a ejecutar todo el script en cada mensaje
+como lo haría el servidor. Reporta peticiones por segundo, tiempo hasta el primer
+fragmento y latencias p50/p95.
+
+Uso:
+    python benchmarks/bench_api.py [--clients 20] [--requests 3] [--tokens 50] [--token-rate 200]
+    python benchmarks/bench_api.py --skip-apptest   # sin la app completa
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+
+import api_server
+from chat_service import ChatService
+from bench_load import ERROR_PREFIX, import_app, percentile
+from mock_server import MockDeepSeekServer
+
+
+def prompt(label, client, request):
+    # Preguntas distintas por cliente: sin aciertos de caché ni streams compartidos
+    return f"¿Cómo interpreto la silueta de k-means? ({label} {client}-{request})"
+
+
+def api_client(port, client, requests, barrier, results):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    session = None
+    barrier.wait()
+    for request in range(requests):
+        start = time.perf_counter()
+        first_chunk = None
+        body = {"message": prompt("api", client, request), "session": session}
+        connection.request("POST", "/v1/chat", json.dumps(body), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        if response.status != 200:
+            results["errors"] += 1
+            response.read()
+            continue
+        for line in response:
+            if not line.startswith(b"data: "):
+                continue
+            data = line[6:].strip()
+            if data == b"[DONE]":
+                break
+            event = json.loads(data)
+            if "content" in event and first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            if "error" in event:
+                results["errors"] += 1
+            session = event.get("session", session)
+        response.read()
+        results["latency"].append(time.perf_counter() - start)
+        results["first_chunk"].append(first_chunk)
+    connection.close()
+
+
+def bare_client(app, client, requests, barrier, results):
+    bot = app.VictoriaChatbot()
+    barrier.wait()
+    for request in range(requests):
+        start = time.perf_counter()
+        response = bot.generate_response(prompt("bare", client, request))
+        results["latency"].append(time.perf_counter() - start)
+        results["first_chunk"].append(bot.get_render_stats().get("time_to_first_chunk"))
+        if response.startswith(ERROR_PREFIX):
+            results["errors"] += 1
+
+
+def apptest_client(client, requests, barrier, results):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, "victoriaChat.py"), default_timeout=120)
+    app.secrets["RUNNING_IN_STREAMLIT_CLOUD"] = True
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    barrier.wait()
+    for request in range(requests):
+        start = time.perf_counter()
+        app.chat_input[0].set_value(prompt("apptest", client, request)).run()
+        results["latency"].append(time.perf_counter() - start)
+        results["first_chunk"].append(None)
+        if app.exception:
+            results["errors"] += 1
+
+
+def run(label, clients, requests, target):
+    results = {"latency": [], "first_chunk": [], "errors": 0}
+    barrier = threading.Barrier(clients + 1)
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(target, client, requests, barrier, results) for client in range(clients)]
+        try:
+            barrier.wait(timeout=120)
+        except threading.BrokenBarrierError:
+            # Algún cliente falló antes de empezar; su excepción sale abajo
+            pass
+        start = time.perf_counter()
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    latency = results["latency"]
+    first_chunk = [value for value in results["first_chunk"] if value is not None]
+    print(f"{label:<34} {len(latency) / elapsed:7.1f} req/s | "
+          f"primer fragmento p50 {percentile(first_chunk, 50) * 1000:7.0f} ms | "
+          f"latencia p50 {percentile(latency, 50) * 1000:7.0f} ms | "
+          f"p95 {percentile(latency, 95) * 1000:7.0f} ms | errores {results['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=20, help="Clientes o sesiones concurrentes")
+    parser.add_argument("--requests", type=int, default=3, help="Preguntas seguidas por cliente")
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens por respuesta del mock")
+    parser.add_argument("--token-rate", type=float, default=200.0)
+    parser.add_argument("--latency", type=float, default=0.1, help="Segundos hasta el primer token del mock")
+    parser.add_argument("--skip-apptest", action="store_true", help="No medir la app completa con AppTest")
+    args = parser.parse_args()
+    print(f"{args.clients} clientes x {args.requests} preguntas, {args.tokens} tokens por respuesta")
+
+    with MockDeepSeekServer(tokens=args.tokens, token_rate=args.token_rate,
+                            first_token_delay=args.latency) as server:
+        os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+        os.environ.setdefault("DEEPSEEK_API_KEY", "sk-mock")
+        os.environ.pop("VICTORIA_CACHE_DB", None)
+        os.environ["VICTORIA_MESSAGES_DB"] = ""
+        # Cliente HTTP y motor compartidos ya creados para ambos caminos
+        "".join(ChatService().stream_reply("calentamiento"))
+
+        api = api_server.start_server(port=0, token="")
+        port = api.server_address[1]
+        run("API HTTP (SSE, sin Streamlit)", args.clients, args.requests,
+            lambda *a: api_client(port, *a))
+        api.shutdown()
+
+        app = import_app()
+        run("Streamlit bare (generate_response)", args.clients, args.requests,
+            lambda *a: bare_client(app, *a))
+
+        if args.skip_apptest:
+            return
+        try:
+            # AppTest ejecuta un script a la vez: una sola sesión, preguntas seguidas
+            run("Streamlit AppTest (1 sesión)", 1, args.requests, apptest_client)
+        except Exception as e:
+            print(f"{'Streamlit AppTest (1 sesión)':<34} no disponible en este entorno: {str(e).splitlines()[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Prueba de la cancelación real de streams contra un mock lento.
+
+Compara detener una respuesta solo dejando de mostrarla (el upstream sigue
+generando hasta terminar, como antes de StreamHandle.cancel) con cancelarla:
+la conexión debe cerrarse de inmediato, el mock debe dejar de enviar tokens
+y el pool debe seguir sirviendo peticiones. También cancela un stream
+compartido por dos peticiones con coalesce_key (el camino de ChatService),
+una petición que espera el primer token y otra que espera turno en el
+motor. Reporta los tokens ahorrados y termina con código 1 si alguna
+comprobación falla.
+
+Uso:
+    python benchmarks/bench_cancel.py [--tokens 300] [--token-rate 100] [--stop-after 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_engine
+import metrics
+from mock_server import MockDeepSeekServer
+
+
+def submit(engine, server, content="Explícame k-means paso a paso", coalesce_key=None):
+    return engine.submit(
+        [{"role": "user", "content": content}], "deepseek-chat",
+        api_key="sk-mock", base_url=server.base_url, coalesce_key=coalesce_key,
+        extra_body={"stream_options": {"include_usage": True}},
+    )
+
+
+def tokens_saved_total():
+    return sum(metrics.get_registry().summary().get(metrics.TOKENS_SAVED_TOTAL, {}).values())
+
+
+def read(handle, count):
+    received = 0
+    for _ in handle.iter_chunks():
+        received += 1
+        if received >= count:
+            break
+    return received
+
+
+def wait_closed(server, timeout=10.0):
+    """Segundos hasta que el mock ve el stream cerrado (None si no pasa)"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if server.open_streams == 0:
+            return time.perf_counter() - start
+        time.sleep(0.005)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--token-rate", type=float, default=100.0)
+    parser.add_argument("--stop-after", type=int, default=20, help="Fragmentos leídos antes de detener")
+    args = parser.parse_args()
+    failures = []
+
+    def check(condition, message):
+        print(f"  {'OK   ' if condition else 'FALLA'} {message}")
+        if not condition:
+            failures.append(message)
+
+    with MockDeepSeekServer(tokens=args.tokens, token_rate=args.token_rate, first_token_delay=0.1) as server:
+        engine = chat_engine.StreamEngine()
+        # Una respuesta completa para que el motor conozca el largo esperado
+        "".join(submit(engine, server, "calentamiento").iter_chunks())
+
+        print("Detener solo dejando de mostrar (el upstream sigue)")
+        sent_before = server.tokens_sent
+        start = time.perf_counter()
+        handle = submit(engine, server)
+        read(handle, args.stop_after)
+        # Sin cancel(): el motor sigue leyendo hasta que el upstream termina
+        for _ in handle.iter_chunks():
+            pass
+        wait_closed(server)
+        print(f"  tokens generados {server.tokens_sent - sent_before} | "
+              f"conexión ocupada {time.perf_counter() - start:.2f} s")
+
+        print("Cancelar con StreamHandle.cancel()")
+        sent_before = server.tokens_sent
+        handle = submit(engine, server)
+        read(handle, args.stop_after)
+        sent_at_cancel = server.tokens_sent - sent_before
+        handle.cancel()
+        remaining = list(handle.iter_chunks())
+        closed_after = wait_closed(server)
+        sent_after = server.tokens_sent - sent_before - sent_at_cancel
+        print(f"  tokens generados {server.tokens_sent - sent_before} | tokens ahorrados (estimados) "
+              f"{handle.tokens_saved}")
+        check(closed_after is not None and closed_after < 1.0,
+              f"el mock ve la conexión cerrada ({(closed_after or float('nan')) * 1000:.0f} ms)")
+        check(sent_after <= 5, f"el mock dejó de generar ({sent_after} tokens tras cancelar)")
+        check(handle.cancelled and handle.finished, "el handle termina como cancelado")
+        check(len(remaining) < args.tokens - args.stop_after, "iter_chunks termina sin esperar el resto")
+        check(handle.tokens_saved > args.tokens // 2, "se registran los tokens ahorrados")
+        check(engine.stats()["active"] == 0, "el motor libera el cupo del stream")
+
+        connections = server.connections
+        text = "".join(submit(engine, server, "después de cancelar").iter_chunks())
+        check(len(text.split()) == args.tokens, "el pool sigue sirviendo peticiones")
+        print(f"  conexiones nuevas para la siguiente petición: {server.connections - connections}")
+
+        print("Cancelar un stream compartido (coalesce_key, como ChatService)")
+        saved_before = tokens_saved_total()
+        first = submit(engine, server, "compartida", coalesce_key="bench-cancel")
+        second = submit(engine, server, "compartida", coalesce_key="bench-cancel")
+        read(first, args.stop_after)
+        first.cancel()
+        list(first.iter_chunks())
+        check(first.cancelled and first.tokens_saved == 0 and server.open_streams == 1,
+              "cancelar a un suscriptor no corta el stream del otro")
+        read(second, args.stop_after)
+        second.cancel()
+        list(second.iter_chunks())
+        closed_after = wait_closed(server)
+        saved = tokens_saved_total() - saved_before
+        print(f"  recibidos {second.received} | etapa {second.cancel_stage} | tokens ahorrados "
+              f"{second.tokens_saved} (métrica {saved:.0f})")
+        check(closed_after is not None and closed_after < 1.0, "el último suscriptor cierra la conexión")
+        check(second.received >= args.stop_after and second.cancel_stage == "streaming",
+              "el handle que cancela recibe los fragmentos y la etapa del vuelo")
+        check(second.tokens_saved > args.tokens // 2 and second.tokens_saved == saved,
+              "el handle que cancela reporta los mismos tokens ahorrados que la métrica")
+
+        print("Cancelar mientras espera el primer token")
+        server.first_token_delay = 2.0
+        handle = submit(engine, server)
+        time.sleep(0.2)
+        start = time.perf_counter()
+        handle.cancel()
+        list(handle.iter_chunks())
+        elapsed = time.perf_counter() - start
+        check(handle.cancelled and engine.stats()["active"] == 0 and elapsed < 0.5,
+              f"el cliente corta la petición sin tokens ({elapsed * 1000:.0f} ms)")
+        # El mock solo nota el cierre al intentar escribir el primer token
+        check(wait_closed(server, 3.0) is not None, "el mock ve la conexión cerrada al escribir")
+        server.first_token_delay = 0.1
+
+        print("Cancelar mientras espera turno en el motor")
+        single = chat_engine.StreamEngine(max_concurrent=1)
+        first = submit(single, server)
+        queued = submit(single, server, "en cola")
+        queued.cancel()
+        list(queued.iter_chunks())
+        check(queued.cancelled and single.stats()["waiting"] == 0, "sale de la cola sin abrir conexión")
+        first.cancel()
+        list(first.iter_chunks())
+        wait_closed(server)
+
+    summary = metrics.get_registry().summary()
+    print(f"Cancelaciones: {summary.get(metrics.CANCELLED_TOTAL)} | "
+          f"tokens ahorrados: {summary.get(metrics.TOKENS_SAVED_TOTAL)} | "
+          f"cancel() hasta cerrar p95: {(summary[metrics.CANCEL_SECONDS]['p95'] or 0) * 1000:.1f} ms")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark del renderizado del historial del chat en cada rerun.
+
+Simula varios reruns de Streamlit sobre una conversación de 500 turnos y
+compara el recorrido anterior (formatear y emitir todos los mensajes en cada
+rerun) con la ventana de los últimos turnos y el HTML memoizado por mensaje.
+Se ejecuta en modo "bare" de Streamlit, así que mide el costo del lado de
+Python (formateo y llamadas a st.*), no el del navegador.
+
+Uso:
+    python benchmarks/bench_chat_history.py [--turns 500] [--reruns 20]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+
+import streamlit as st
+
+import design
+
+ANSWER = """Para aplicar k-means con scikit-learn primero escala las variables:
+
+```python
+from sklearn.preprocessing import StandardScaler
+from sklearn.cluster import KMeans
+
+X_scaled = StandardScaler().fit_transform(df[["edad", "ingreso"]])
+modelo = KMeans(n_clusters={k}, n_init=10).fit(X_scaled)
+df["cluster"] = modelo.labels_
+```
+
+Luego revisa el codo de la inercia para elegir k:
+
+```python
+inercias = [KMeans(n_clusters=k, n_init=10).fit(X_scaled).inertia_ for k in range(1, 10)]
+```
+
+Con eso puedes interpretar cada segmento por sus medias."""
+
+
+def build_conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Pregunta {i}: ¿cómo segmento clientes con k-means?"})
+        messages.append({"role": "assistant", "content": ANSWER.format(k=i % 7 + 2)})
+    return messages
+
+
+def legacy_render(messages):
+    """Recorrido anterior: todos los mensajes, formateados en cada rerun"""
+    for message in messages:
+        with st.chat_message(message["role"]):
+            message_class = "user" if message["role"] == "user" else "assistant"
+            st.markdown(f"""
+            <div class='chat-message {message_class} animate-slide-in'>
+                {design.format_code_blocks(message["content"]) if message["role"] == "assistant" else message["content"]}
+            </div>
+        """, unsafe_allow_html=True)
+
+
+def time_reruns(render, reruns):
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    messages = build_conversation(args.turns)
+    window = design.HISTORY_PAGE_SIZE
+
+    legacy = time_reruns(lambda: legacy_render(messages), args.reruns)
+    design.message_html.cache_clear()
+    windowed = time_reruns(lambda: design.show_chat_history(messages, window), args.reruns)
+    design.message_html.cache_clear()
+    expanded = time_reruns(lambda: design.show_chat_history(messages, len(messages)), args.reruns)
+
+    def row(label, timings):
+        warm = sorted(timings[1:])[len(timings[1:]) // 2] if len(timings) > 1 else timings[0]
+        print(f"{label:<34} primer rerun {timings[0] * 1000:8.2f} ms | "
+              f"reruns siguientes {warm * 1000:8.2f} ms")
+
+    print(f"Conversación de {args.turns} turnos ({len(messages)} mensajes)")
+    row("Anterior (todo, sin memoizar)", legacy)
+    row(f"Ventana de {window} + HTML memoizado", windowed)
+    row("Todo expandido + HTML memoizado", expanded)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark del motor de streaming compartido contra un cliente por sesión.
+
+Levanta el servidor mock local y simula varias sesiones concurrentes que
+hacen peticiones en streaming. Compara el tiempo hasta el primer token y las
+conexiones abiertas cuando cada petición crea su propio cliente OpenAI (como
+cada sesión de Streamlit antes) y cuando todas pasan por el StreamEngine del
+proceso, cuyo cliente AsyncOpenAI usa el pool de client_pool (el camino de
+ChatService).
+
+Uso:
+    python benchmarks/bench_client_pool.py [--sessions 8] [--requests 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+
+import chat_engine
+from mock_server import MockDeepSeekServer
+
+API_KEY = "sk-mock"
+
+
+def time_to_first_token(client):
+    start = time.perf_counter()
+    stream = client.chat.completions.create(
+        model="deepseek-chat",
+        messages=[{"role": "user", "content": "¿Qué es k-means?"}],
+        stream=True,
+    )
+    ttft = None
+    for chunk in stream:
+        if ttft is None and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - start
+    return ttft
+
+
+def engine_time_to_first_token(engine, base_url):
+    start = time.perf_counter()
+    handle = engine.submit(
+        [{"role": "user", "content": "¿Qué es k-means?"}], "deepseek-chat",
+        api_key=API_KEY, base_url=base_url,
+    )
+    ttft = None
+    for _ in handle.iter_chunks():
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return ttft
+
+
+def run_scenario(server, sessions, requests, pooled):
+    def session(_):
+        timings = []
+        for _ in range(requests):
+            if pooled:
+                timings.append(engine_time_to_first_token(chat_engine.get_engine(), server.base_url))
+            else:
+                with OpenAI(api_key=API_KEY, base_url=server.base_url) as client:
+                    timings.append(time_to_first_token(client))
+        return timings
+
+    connections_before = server.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        timings = [t for result in executor.map(session, range(sessions)) for t in result]
+    elapsed = time.perf_counter() - start
+    return timings, elapsed, server.connections - connections_before
+
+
+def report(label, timings, elapsed, connections):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<12} TTFT p50 {statistics.median(timings) * 1000:7.2f} ms | "
+          f"p95 {p95 * 1000:7.2f} ms | total {elapsed:6.2f} s | conexiones {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=20)
+    args = parser.parse_args()
+
+    with MockDeepSeekServer(tokens=args.tokens) as server:
+        # Calentar el servidor, el stack HTTP y el motor antes de medir
+        run_scenario(server, 1, 1, pooled=False)
+        run_scenario(server, 1, 1, pooled=True)
+        report("Sin pool", *run_scenario(server, args.sessions, args.requests, pooled=False))
+        report("Motor", *run_scenario(server, args.sessions, args.requests, pooled=True))
+
+
+if __name__ == "__main__":
+    main()
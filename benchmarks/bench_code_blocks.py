@@ -0,0 +1,160 @@
+"""Benchmark del formateo de bloques de código de design.format_code_blocks.
+
+Compara la implementación anterior (re.finditer + str.replace sobre todo el
+texto por cada bloque) con el formateador de una sola pasada, tanto sobre
+respuestas grandes con muchos bloques como en modo streaming, donde antes se
+reformateaba el texto acumulado completo en cada repintado. Por último pasa
+un bloque de código largo por design.StreamRenderer (el camino de la app),
+contra reformatear el párrafo abierto completo en cada repintado.
+
+Uso:
+    python benchmarks/bench_code_blocks.py [--blocks 200] [--chunk 8] [--code-lines 2000]
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+
+import design
+
+BLOCK = """Paso {i}: calculamos la media móvil de la columna `ventas`.
+
+```python
+df["media_{i}"] = df["ventas"].rolling(window={w}).mean()
+print(df[["ventas", "media_{i}"]].tail())
+```
+
+"""
+
+
+def legacy_format_code_blocks(text):
+    """Implementación anterior, conservada solo como referencia"""
+    code_blocks = re.finditer(r'```(?:python)?(.*?)```', text, re.DOTALL)
+    formatted_text = text
+    for block in code_blocks:
+        code = block.group(1).strip()
+        formatted_code = f"""
+        <div class="code-block">
+            <pre><code class="python">{code}</code></pre>
+        </div>
+        """
+        formatted_text = formatted_text.replace(block.group(0), formatted_code)
+    return formatted_text
+
+
+def build_answer(blocks):
+    return "".join(BLOCK.format(i=i, w=i % 12 + 3) for i in range(blocks))
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def stream_legacy(text, chunk, flush_every):
+    parts = []
+    for n, i in enumerate(range(0, len(text), chunk), 1):
+        parts.append(text[i:i + chunk])
+        if n % flush_every == 0:
+            legacy_format_code_blocks("".join(parts))
+    return legacy_format_code_blocks("".join(parts))
+
+
+def stream_incremental(text, chunk, flush_every):
+    formatter = design.CodeBlockFormatter()
+    for n, i in enumerate(range(0, len(text), chunk), 1):
+        formatter.feed(text[i:i + chunk])
+        if n % flush_every == 0:
+            formatter.render(partial=True)
+    return formatter.render()
+
+
+class _Slot:
+    """Contenedor de Streamlit mínimo: guarda el último markdown pintado"""
+
+    def __init__(self):
+        self.body = None
+
+    def container(self):
+        return self
+
+    def empty(self):
+        return _Slot()
+
+    def markdown(self, body, unsafe_allow_html=False):
+        self.body = body
+
+
+def build_code_answer(lines):
+    code = "".join(f"resultado_{i} = df['ventas'].shift({i % 7}) * 1.{i % 10}\n" for i in range(lines))
+    return f"Este script calcula los rezagos de ventas.\n\n```python\n{code}```\n\nListo."
+
+
+def stream_reformat_tail(text, chunk, flush_every):
+    # Lo que hacía el renderer antes: el párrafo abierto completo en cada repintado
+    parts = []
+    for n, i in enumerate(range(0, len(text), chunk), 1):
+        parts.append(text[i:i + chunk])
+        if n % flush_every == 0:
+            design.format_code_blocks("".join(parts), partial=True)
+    return design.format_code_blocks("".join(parts))
+
+
+def stream_renderer(text, chunk, flush_every):
+    slot = _Slot()
+    renderer = design.StreamRenderer(slot, flush_interval=float("inf"), flush_chunks=flush_every)
+    for i in range(0, len(text), chunk):
+        renderer.append(text[i:i + chunk])
+    renderer.finish()
+    return slot.body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=200)
+    parser.add_argument("--chunk", type=int, default=8, help="Caracteres por fragmento del stream")
+    parser.add_argument("--flush-every", type=int, default=16, help="Fragmentos entre repintados")
+    parser.add_argument("--code-lines", type=int, default=2000, help="Líneas del bloque largo en StreamRenderer")
+    args = parser.parse_args()
+
+    text = build_answer(args.blocks)
+    if legacy_format_code_blocks(text) != design.format_code_blocks(text):
+        print("ERROR: la salida difiere de la implementación anterior")
+        sys.exit(1)
+
+    print(f"Respuesta de {args.blocks} bloques ({len(text) / 1024:.0f} KB)")
+    legacy = best_of(lambda: legacy_format_code_blocks(text))
+    single = best_of(lambda: design.format_code_blocks(text))
+    print(f"Texto completo  anterior {legacy * 1000:9.2f} ms | una pasada {single * 1000:9.2f} ms "
+          f"| x{legacy / single:.1f}")
+
+    legacy = best_of(lambda: stream_legacy(text, args.chunk, args.flush_every), repeat=1)
+    incremental = best_of(lambda: stream_incremental(text, args.chunk, args.flush_every), repeat=1)
+    print(f"Streaming       anterior {legacy * 1000:9.2f} ms | incremental {incremental * 1000:8.2f} ms "
+          f"| x{legacy / incremental:.1f}")
+
+    code_text = build_code_answer(args.code_lines)
+    expected = design.StreamRenderer.RESPONSE_TEMPLATE.format(content=design.format_code_blocks(code_text))
+    if stream_renderer(code_text, args.chunk, args.flush_every) != expected:
+        print("ERROR: StreamRenderer.finish no coincide con format_code_blocks")
+        sys.exit(1)
+    print(f"Bloque de {args.code_lines} líneas ({len(code_text) / 1024:.0f} KB) en StreamRenderer")
+    legacy = best_of(lambda: stream_reformat_tail(code_text, args.chunk, args.flush_every), repeat=1)
+    renderer = best_of(lambda: stream_renderer(code_text, args.chunk, args.flush_every), repeat=1)
+    print(f"Renderer        anterior {legacy * 1000:9.2f} ms | incremental {renderer * 1000:8.2f} ms "
+          f"| x{legacy / renderer:.1f}")
+
+
+if __name__ == "__main__":
+    main()
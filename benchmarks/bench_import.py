@@ -0,0 +1,102 @@
+"""Benchmark del tiempo de arranque en frío de victoriaChat.py.
+
+Cada medición corre en un intérprete nuevo. Se comparan los imports de nivel
+de módulo de la app (leídos de victoriaChat.py) contra los mismos imports más
+el stack de ML cargado de forma ansiosa, como se hacía antes. También se mide
+cuánto cuesta la primera carga diferida del stack.
+
+El script falla (código 1) si la app vuelve a importar el stack de ML al
+arrancar o si el arranque supera --max-seconds, para detectar regresiones.
+
+Uso:
+    python benchmarks/bench_import.py [--runs 5] [--max-seconds 3.0]
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que no deben cargarse al arrancar la app
+HEAVY_MODULES = ["pandas", "sklearn", "xgboost"]
+
+EAGER_ML_IMPORTS = [
+    "import pandas",
+    "import numpy",
+    "import sklearn.model_selection",
+    "import sklearn.preprocessing",
+    "import sklearn.linear_model",
+    "import sklearn.ensemble",
+    "import sklearn.cluster",
+    "import xgboost",
+]
+
+
+def app_imports():
+    """Retorna las sentencias import de nivel de módulo de victoriaChat.py"""
+    with open(os.path.join(ROOT, "victoriaChat.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [
+        ast.unparse(node) for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    ]
+
+
+def timed_run(statements, epilogue=""):
+    """Ejecuta los imports en un intérprete nuevo y retorna (segundos, salida)"""
+    code = "\n".join([
+        "import time, warnings",
+        "warnings.filterwarnings('ignore')",
+        "_start = time.perf_counter()",
+        *statements,
+        "print(time.perf_counter() - _start)",
+        epilogue,
+    ])
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    lines = result.stdout.strip().splitlines()
+    return float(lines[0]), lines[1:]
+
+
+def median_time(statements, runs):
+    return statistics.median(timed_run(statements)[0] for _ in range(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=3.0,
+                        help="Tiempo máximo permitido para el arranque de la app")
+    args = parser.parse_args()
+
+    imports = app_imports()
+    lazy = median_time(imports, args.runs)
+    eager = median_time(imports + EAGER_ML_IMPORTS, args.runs)
+    first_use = median_time(imports + ["import ml_tools", "ml_tools.load_ml_stack()"], args.runs) - lazy
+
+    _, loaded = timed_run(imports, epilogue=(
+        "import sys; print(','.join(m for m in %r if m in sys.modules))" % HEAVY_MODULES
+    ))
+    loaded = [m for m in (loaded[0] if loaded else "").split(",") if m]
+
+    print(f"Arranque con ML ansioso:  {eager:6.2f} s")
+    print(f"Arranque con ML diferido: {lazy:6.2f} s")
+    print(f"Mejora en frío:           {eager - lazy:6.2f} s ({(1 - lazy / eager) * 100:.0f}%)")
+    print(f"Primera carga del stack:  {first_use:6.2f} s (solo al usar MLTools)")
+
+    failed = False
+    if loaded:
+        print(f"REGRESIÓN: la app importa al arrancar {', '.join(loaded)}")
+        failed = True
+    if lazy > args.max_seconds:
+        print(f"REGRESIÓN: el arranque supera {args.max_seconds:.2f} s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark de la carga de CSV: pandas completo vs. Arrow con tipos reducidos.
+
+Genera un CSV sintético con enteros, flotantes y columnas de texto de pocos
+valores, y compara pandas.read_csv (lo que haría cada rerun si se guardara
+un DataFrame) con data_ingestion.ingest_csv: tiempo de la primera carga, de
+volver a subir el mismo archivo y de abrir el Feather mapeado, y la memoria
+de los datos en cada caso. Comprueba además que el Feather tiene los mismos
+valores que el CSV, que los flotantes que float32 no representa bien siguen
+en float64 y que la aritmética sobre los enteros reducidos no da la vuelta
+(termina con código 1 si algo falla).
+
+Uso:
+    python benchmarks/bench_ingestion.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import data_ingestion
+import ml_tools
+
+
+def write_dataset(path, rows):
+    ml = ml_tools.load_ml_stack()
+    np, pd = ml.np, ml.pd
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "edad": rng.integers(18, 90, rows),
+        "visitas": rng.integers(0, 5000, rows),
+        "monto": rng.normal(100, 30, rows),
+        "descuento": rng.random(rows),
+        # Montos grandes con centavos: en float32 123456789.12 sería 123456792.0
+        "saldo": rng.integers(10 ** 8, 10 ** 9, rows) + rng.integers(0, 100, rows) / 100,
+        "ciudad": rng.choice(["Lima", "Quito", "Bogotá", "Santiago", "La Paz"], rows),
+        "plan": rng.choice(["básico", "pro", "empresa"], rows),
+    })
+    frame.to_csv(path, index=False)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    pd = ml_tools.load_ml_stack().pd
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clientes.csv")
+        write_dataset(path, args.rows)
+        store = os.path.join(tmp, "store")
+        print(f"CSV de {args.rows} filas ({os.path.getsize(path) / 2 ** 20:.0f} MB)")
+
+        expected, elapsed = timed(lambda: pd.read_csv(path))
+        pandas_mb = expected.memory_usage(deep=True).sum() / 2 ** 20
+        print(f"{'pandas.read_csv':<28} {elapsed * 1000:8.0f} ms | {pandas_mb:7.1f} MB en memoria")
+
+        handle, elapsed = timed(lambda: data_ingestion.ingest_csv(path, store_dir=store))
+        report = handle.report
+        print(f"{'Arrow + tipos reducidos':<28} {elapsed * 1000:8.0f} ms | "
+              f"{report['arrow_bytes'] / 2 ** 20:7.1f} MB (antes {report['arrow_bytes_before'] / 2 ** 20:.1f} MB)")
+        for column, change in report["downcast"].items():
+            print(f"    {column:<12} {change}")
+
+        _, elapsed = timed(lambda: data_ingestion.ingest_csv(path, store_dir=store))
+        print(f"{'Mismo archivo otra vez':<28} {elapsed * 1000:8.0f} ms (hash y Feather existente)")
+
+        table, elapsed = timed(handle.table)
+        print(f"{'Abrir Feather mapeado':<28} {elapsed * 1000:8.1f} ms | {table.num_rows} filas")
+
+        frame, elapsed = timed(handle.to_pandas)
+        arrow_pandas_mb = frame.memory_usage(deep=True).sum() / 2 ** 20
+        print(f"{'Feather a pandas':<28} {elapsed * 1000:8.0f} ms | {arrow_pandas_mb:7.1f} MB en memoria")
+
+        failures = []
+        for column in ("edad", "visitas"):
+            if not (frame[column].astype("int64") == expected[column]).all():
+                failures.append(f"{column}: valores distintos al CSV")
+            if frame[column].dtype.kind != "i":
+                failures.append(f"{column}: {frame[column].dtype} no es un entero con signo")
+        if (frame["edad"] - 130).min() != expected["edad"].min() - 130:
+            failures.append("edad - 130 da la vuelta")
+        for column in ("monto", "descuento"):
+            if not ((frame[column] - expected[column]).abs() < 1e-4 * expected[column].abs().max()).all():
+                failures.append(f"{column}: error de float32 mayor al esperado")
+        if frame["saldo"].dtype != "float64" or not (frame["saldo"] == expected["saldo"]).all():
+            failures.append(f"saldo: {frame['saldo'].dtype} cambia los valores del CSV")
+        for column in ("ciudad", "plan"):
+            if not (frame[column].astype(str) == expected[column]).all():
+                failures.append(f"{column}: categorías distintas al CSV")
+        for failure in failures:
+            print(f"FALLA {failure}")
+        if failures:
+            sys.exit(1)
+        print("Valores iguales al CSV y aritmética de enteros con signo correcta")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Prueba de carga de VictoriaChatbot.generate_response contra el mock local.
+
+Levanta el servidor mock de DeepSeek (o usa uno externo con --base-url) y
+simula muchas sesiones concurrentes, cada una con su propio VictoriaChatbot
+y varias preguntas seguidas, como lo haría el servidor de Streamlit con un
+hilo por sesión. Reporta el tiempo hasta el primer token, tokens por segundo,
+latencias p50/p95/p99 de extremo a extremo y memoria por sesión.
+
+Streamlit corre en modo "bare", así que se mide el lado de Python (motor de
+streaming, caché, contexto y repintados) y no el navegador.
+
+Uso:
+    python benchmarks/bench_load.py [--sessions 50] [--requests 3] [--token-rate 100]
+    python benchmarks/bench_load.py --max-p95 5   # falla si el p95 supera 5 s
+"""
+import argparse
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+
+from mock_server import MockDeepSeekServer
+
+ERROR_PREFIX = "Lo siento, ha ocurrido un error"
+
+
+def percentile(values, p):
+    """Percentil por rango más cercano (sin interpolar)"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def import_app():
+    """Importa victoriaChat fuera de `streamlit run`.
+
+    La app lee st.secrets al importarse, así que se ejecuta desde un
+    directorio temporal con un secrets.toml mínimo que además evita cargar
+    el .env (y con él una api key real).
+    """
+    workdir = tempfile.mkdtemp(prefix="victoria-load-")
+    os.makedirs(os.path.join(workdir, ".streamlit"))
+    with open(os.path.join(workdir, ".streamlit", "secrets.toml"), "w") as f:
+        f.write("RUNNING_IN_STREAMLIT_CLOUD = true\n")
+    os.chdir(workdir)
+    import victoriaChat
+    return victoriaChat
+
+
+def run_session(app, session, requests, start_barrier, results, bots, same_prompt=False):
+    bot = app.VictoriaChatbot()
+    bots.append(bot)
+    start_barrier.wait()
+    for turn in range(requests):
+        # Por defecto, preguntas distintas por sesión para no medir aciertos
+        # de caché ni streams compartidos
+        owner = "Todas" if same_prompt else f"Sesión {session}"
+        prompt = f"{owner}, pregunta {turn}: ¿cómo aplico k-means a mis clientes?"
+        start = time.perf_counter()
+        response = bot.generate_response(prompt)
+        elapsed = time.perf_counter() - start
+        stats = bot.get_render_stats()
+        failed = response.startswith(ERROR_PREFIX)
+        results.append({
+            "latency": elapsed,
+            "ttft": stats.get("time_to_first_chunk") if not failed else None,
+            "chunks": stats.get("chunks", 0) if not failed else 0,
+            "failed": failed,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=3, help="Preguntas por sesión")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens por respuesta del mock")
+    parser.add_argument("--token-rate", type=float, default=100.0, help="Tokens por segundo del mock (0 = sin límite)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Segundos del mock hasta el primer token")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--same-prompt", action="store_true",
+                        help="Todas las sesiones hacen las mismas preguntas a la vez (clase en vivo)")
+    parser.add_argument("--base-url", help="Usar un servidor ya levantado en lugar del mock interno")
+    parser.add_argument("--max-p95", type=float, help="Falla si la latencia p95 supera estos segundos")
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url is None:
+        server = MockDeepSeekServer(
+            tokens=args.tokens, token_rate=args.token_rate or None,
+            first_token_delay=args.latency, jitter=args.jitter,
+            error_rate=args.error_rate, drop_rate=args.drop_rate, seed=0,
+        ).start()
+    os.environ["DEEPSEEK_BASE_URL"] = args.base_url or server.base_url
+    os.environ.setdefault("DEEPSEEK_API_KEY", "sk-mock")
+    os.environ.pop("VICTORIA_CACHE_DB", None)
+
+    app = import_app()
+    app.VictoriaChatbot()  # calentar clientes y motor fuera de la medición
+
+    results, bots = [], []
+    barrier = threading.Barrier(args.sessions)
+    rss_before = peak_rss_mb()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [
+            pool.submit(run_session, app, s, args.requests, barrier, results, bots, args.same_prompt)
+            for s in range(args.sessions)
+        ]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - wall_start
+    rss_after = peak_rss_mb()
+    if server is not None:
+        server.stop()
+
+    ok = [r for r in results if not r["failed"]]
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    rates = [r["chunks"] / (r["latency"] - r["ttft"]) for r in ok
+             if r["ttft"] is not None and r["latency"] > r["ttft"]]
+    total_chunks = sum(r["chunks"] for r in ok)
+
+    print(f"{args.sessions} sesiones x {args.requests} preguntas | "
+          f"{len(ok)} correctas, {len(results) - len(ok)} con error | {wall:.2f} s")
+    if server is not None:
+        print(f"Mock: {server.stats()}")
+    print(f"Primer token  p50 {percentile(ttfts, 50) * 1000:8.1f} ms | p95 {percentile(ttfts, 95) * 1000:8.1f} ms"
+          f" | p99 {percentile(ttfts, 99) * 1000:8.1f} ms")
+    print(f"Latencia e2e  p50 {percentile(latencies, 50) * 1000:8.1f} ms | p95 {percentile(latencies, 95) * 1000:8.1f} ms"
+          f" | p99 {percentile(latencies, 99) * 1000:8.1f} ms")
+    print(f"Tokens/s por sesión p50 {percentile(rates, 50):8.1f} | total {total_chunks / wall:10.1f} tokens/s")
+    print(f"Memoria: pico {rss_after:.1f} MB | {(rss_after - rss_before) * 1024 / args.sessions:.1f} KB por sesión")
+
+    if args.max_p95 is not None and percentile(latencies, 95) > args.max_p95:
+        print(f"ERROR: p95 {percentile(latencies, 95):.2f} s supera el límite de {args.max_p95:.2f} s")
+        sys.exit(1)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
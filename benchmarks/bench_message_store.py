@@ -0,0 +1,114 @@
+"""Benchmark del historial por sesión: lista de dicts vs. SessionMessageStore.
+
+Simula muchas sesiones largas y compara la memoria del historial guardado
+como lista de dicts en st.session_state (crece sin límite) con la ventana
+caliente de objetos con __slots__ y el resto en SQLite (modo WAL). Mide
+también escribir un commit por mensaje contra un lote por turno, leer la
+ventana visible en cada rerun y retomar una sesión tras reiniciar el worker.
+
+Uso:
+    python benchmarks/bench_message_store.py [--sessions 200] [--turns 200] [--hot 40]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import message_store
+
+ANSWER = ("Para segmentar clientes con k-means escala las variables, prueba varios "
+          "valores de k y revisa la inercia y la silueta de cada uno. ") * 6
+
+
+def conversation(session, turns):
+    for turn in range(turns):
+        # Textos distintos por sesión, como en la app real
+        yield "user", f"Sesión {session}, pregunta {turn}: ¿cómo elijo k?"
+        yield "assistant", f"{ANSWER} (respuesta {session}-{turn})"
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--hot", type=int, default=40, help="Mensajes en memoria por sesión")
+    args = parser.parse_args()
+    messages = args.sessions * args.turns * 2
+    print(f"{args.sessions} sesiones x {args.turns} turnos ({messages} mensajes)")
+
+    def as_lists():
+        sessions = []
+        for session in range(args.sessions):
+            history = []
+            for role, content in conversation(session, args.turns):
+                history.append({"role": role, "content": content})
+            sessions.append(history)
+        return sessions
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = message_store.MessageDatabase(os.path.join(tmp, "messages.sqlite3"))
+
+        def as_stores():
+            stores = []
+            for session in range(args.sessions):
+                store = message_store.SessionMessageStore(db=db, hot_size=args.hot)
+                for role, content in conversation(session, args.turns):
+                    store.append(role, content)
+                    if role == "assistant":
+                        store.flush()
+                stores.append(store)
+            return stores
+
+        lists, elapsed, memory = measure(as_lists)
+        print(f"{'Lista de dicts':<30} {memory / 2 ** 20:8.1f} MB | {memory / args.sessions / 1024:8.1f} KB por sesión")
+        del lists
+        stores, elapsed, memory = measure(as_stores)
+        print(f"{'Ventana __slots__ + SQLite':<30} {memory / 2 ** 20:8.1f} MB | {memory / args.sessions / 1024:8.1f} KB por sesión")
+        print(f"  memory_bytes() de una sesión: {stores[0].memory_bytes() / 1024:.1f} KB, "
+              f"db {os.path.getsize(db.path) / 2 ** 20:.1f} MB")
+
+        # Un commit por mensaje (escritura ingenua) contra un lote por turno
+        for label, batch in (("Un commit por mensaje", 1), ("Un lote por turno", message_store.WRITE_BATCH)):
+            writer = message_store.SessionMessageStore(db=db, hot_size=args.hot, write_batch=batch)
+            start = time.perf_counter()
+            for role, content in conversation(label, args.turns):
+                writer.append(role, content)
+                if role == "assistant":
+                    writer.flush()
+            per_message = (time.perf_counter() - start) / (args.turns * 2)
+            print(f"{label:<30} {per_message * 1e6:8.0f} µs por mensaje")
+
+        store = stores[-1]
+        start = time.perf_counter()
+        for _ in range(100):
+            store.tail(20)
+        print(f"{'Ventana visible (20 mensajes)':<30} {(time.perf_counter() - start) / 100 * 1e6:8.1f} µs por rerun")
+        start = time.perf_counter()
+        store[:len(store) - args.hot]
+        print(f"{'Cargar los anteriores':<30} {(time.perf_counter() - start) * 1000:8.1f} ms "
+              f"({len(store) - args.hot} mensajes desde SQLite)")
+
+        start = time.perf_counter()
+        resumed = message_store.SessionMessageStore(store.session_id, db=db, hot_size=args.hot)
+        elapsed = time.perf_counter() - start
+        assert resumed.resumed and len(resumed) == len(store)
+        assert [m.content for m in resumed.tail(5)] == [m.content for m in store.tail(5)]
+        print(f"{'Retomar sesión tras reinicio':<30} {elapsed * 1000:8.1f} ms ({len(resumed)} mensajes)")
+
+
+if __name__ == "__main__":
+    main()
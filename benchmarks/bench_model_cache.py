@@ -0,0 +1,69 @@
+"""Benchmark de la caché de artefactos de auto_ml.
+
+Entrena auto_ml una vez (fallo de caché), repite la misma llamada (acierto:
+se carga el artefacto con los arrays mapeados en memoria) y luego lanza
+varios procesos a la vez con el mismo dataset sobre una caché vacía para
+comprobar que solo uno entrena y el resto reutiliza su resultado.
+
+Uso:
+    python benchmarks/bench_model_cache.py [--rows 20000] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import ml_tools
+from ml_tools import MLTools
+from model_cache import ModelArtifactCache
+
+
+def make_data(rows):
+    np = ml_tools.load_ml_stack().np
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows, 15))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.3, size=rows) > 0).astype(int)
+    return X, y
+
+
+def worker(root, rows):
+    warnings.filterwarnings("ignore")
+    X, y = make_data(rows)
+    start = time.perf_counter()
+    report = MLTools.auto_ml(X, y, cache=ModelArtifactCache(root), return_report=True)[3]
+    return report["cache_hit"], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    X, y = make_data(args.rows)
+    with tempfile.TemporaryDirectory() as root:
+        cache = ModelArtifactCache(root)
+        for label in ("Primera llamada (entrena)", "Misma llamada (caché)"):
+            start = time.perf_counter()
+            _, _, score, report = MLTools.auto_ml(X, y, cache=cache, return_report=True)
+            print(f"{label:<28} {time.perf_counter() - start:8.3f} s | score {score:.3f} | "
+                  f"acierto {report['cache_hit']}")
+        print(f"Artefactos en disco: {cache.stats()['entries']} ({cache.stats()['bytes'] / 2 ** 20:.1f} MB)")
+
+    with tempfile.TemporaryDirectory() as root:
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(args.workers) as pool:
+            results = pool.starmap(worker, [(root, args.rows)] * args.workers)
+        trained = sum(1 for hit, _ in results if not hit)
+        print(f"{args.workers} procesos a la vez: {trained} entrenó, {args.workers - trained} reutilizaron "
+              f"| tiempos {', '.join(f'{seconds:.2f} s' for _, seconds in results)}")
+
+
+if __name__ == "__main__":
+    main()
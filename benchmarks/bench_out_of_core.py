@@ -0,0 +1,81 @@
+"""Benchmark del entrenamiento por bloques (out-of-core) de MLTools.
+
+Genera un CSV sintético y compara el pico de memoria y el tiempo de
+MLTools.auto_ml con el archivo cargado completo (read_csv, train_test_split
+y los arrays escalados) contra MLTools.auto_ml_from_file, que recorre el
+archivo por bloques. El pico se mide con tracemalloc (memoria de Python y
+numpy; no incluye la memoria interna de XGBoost).
+
+Uso:
+    python benchmarks/bench_out_of_core.py [--rows 500000] [--features 20] [--chunk-rows 50000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import ml_tools
+from ml_tools import MLTools
+
+
+def write_dataset(path, rows, features, chunk_rows=100_000):
+    ml = ml_tools.load_ml_stack()
+    np, pd = ml.np, ml.pd
+    rng = np.random.default_rng(0)
+    weights = rng.normal(size=features)
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        X = rng.normal(size=(n, features))
+        frame = pd.DataFrame(X, columns=[f"x{i}" for i in range(features)])
+        frame["y"] = X @ weights + rng.normal(scale=0.5, size=n)
+        frame.to_csv(path, mode="a", header=start == 0, index=False)
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    score = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return score, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "datos.csv")
+        write_dataset(path, args.rows, args.features)
+        size_mb = os.path.getsize(path) / 2 ** 20
+        print(f"CSV de {args.rows} filas x {args.features} columnas ({size_mb:.0f} MB), regresión")
+
+        def in_memory():
+            frame = ml_tools.load_ml_stack().pd.read_csv(path)
+            X, y = frame.drop(columns="y").to_numpy(), frame["y"].to_numpy()
+            del frame
+            return MLTools.auto_ml(X, y, task='regression', cache=False)[2]
+
+        def streamed():
+            return MLTools.auto_ml_from_file(
+                path, "y", task='regression', chunk_rows=args.chunk_rows, cache=False
+            )[2]
+
+        for label, func in (("En memoria (auto_ml)", in_memory),
+                            (f"Por bloques de {args.chunk_rows}", streamed)):
+            score, elapsed, peak = measure(func)
+            print(f"{label:<26} R² {score:6.3f} | {elapsed:6.1f} s | pico de memoria {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark de la predicción por lotes con resultados de auto_ml.
+
+Entrena un RandomForest y un XGBoost (con su scaler, como los retorna
+auto_ml) sobre datos sintéticos y compara predecir fila por fila, como se
+haría desde el chat, contra BatchPredictor con buffers preasignados e
+inferencia multihilo. La versión fila por fila se mide sobre --naive-rows
+filas y se reportan filas por segundo en ambos casos. También comprueba que
+las predicciones son idénticas a model.predict(scaler.transform(X)), incluido
+un XGBRegressor con columnas enteras (cortes justo sobre valores de
+entrenamiento), KMeans y scalers distintos de StandardScaler, y termina con
+código 1 si difieren.
+
+Uso:
+    python benchmarks/bench_predict.py [--rows 500000] [--features 20] [--naive-rows 2000]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import ml_tools
+from predictor import BatchPredictor
+
+
+def make_data(ml, rows, features):
+    rng = ml.np.random.default_rng(0)
+    X = rng.normal(size=(rows, features))
+    y = (X[:, :3].sum(axis=1) + rng.normal(scale=0.5, size=rows) > 0).astype(int)
+    return X, y
+
+
+def check_regressor(ml, failures):
+    rng = ml.np.random.default_rng(1)
+    # Columnas enteras, como edades o conteos: los cortes del histograma caen
+    # exactamente sobre valores de entrenamiento
+    X = rng.integers(18, 90, size=(3000, 4)).astype(float)
+    y = X[:, 0] * 0.5 + rng.normal(size=len(X))
+    scaler = ml.StandardScaler().fit(X)
+    model = ml.xgb.XGBRegressor(n_estimators=50, tree_method="hist").fit(scaler.transform(X), y)
+    config = model.get_booster().save_config()
+    expected = model.predict(scaler.transform(X))
+    predicted = BatchPredictor(model, scaler, batch_rows=1024, n_threads=1).predict(X)
+    differing = int((predicted != expected).sum())
+    print(f"XGBRegressor  filas distintas a predict(transform(X)): {differing} de {len(X)}")
+    if differing:
+        failures.append("XGBRegressor difiere de scaler.transform + predict")
+    if model.get_booster().save_config() != config:
+        failures.append("BatchPredictor cambió la configuración del modelo original")
+
+
+def check_other_models(ml, failures):
+    from sklearn.preprocessing import MinMaxScaler, RobustScaler
+    from sklearn.linear_model import LinearRegression
+
+    rng = ml.np.random.default_rng(2)
+    X = rng.normal(50, 30, size=(3000, 4))
+    y = X @ ml.np.arange(1, 5)
+    scalers = {
+        "MinMaxScaler": MinMaxScaler(),
+        "RobustScaler": RobustScaler(),
+        "StandardScaler(with_mean=False)": ml.StandardScaler(with_mean=False),
+    }
+    for name, scaler in scalers.items():
+        X_scaled = scaler.fit_transform(X)
+        model = LinearRegression().fit(X_scaled, y)
+        error = ml.np.abs(BatchPredictor(model, scaler, batch_rows=1024).predict(X) - model.predict(X_scaled)).max()
+        print(f"{name:<32} error máximo: {error:.3g}")
+        if error > 1e-6:
+            failures.append(f"{name} difiere de scaler.transform + predict")
+    scaler = ml.StandardScaler().fit(X)
+    model = ml.KMeans(n_clusters=3, n_init=2, random_state=0).fit(scaler.transform(X))
+    try:
+        if not (BatchPredictor(model, scaler).predict(X) == model.predict(scaler.transform(X))).all():
+            failures.append("KMeans difiere de scaler.transform + predict")
+    except ValueError as e:
+        failures.append(f"KMeans falla: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--naive-rows", type=int, default=2000)
+    parser.add_argument("--threads", type=int, help="Hilos de inferencia (por defecto, uno por CPU)")
+    args = parser.parse_args()
+
+    ml = ml_tools.load_ml_stack()
+    X_train, y_train = make_data(ml, 20_000, args.features)
+    X, _ = make_data(ml, args.rows, args.features)
+    scaler = ml.StandardScaler().fit(X_train)
+    models = {
+        "RandomForest": ml.RandomForestClassifier(n_estimators=100, random_state=0),
+        "XGBoost": ml.xgb.XGBClassifier(n_estimators=100),
+    }
+    print(f"{args.rows} filas x {args.features} columnas, clasificación")
+    failures = []
+    for name, model in models.items():
+        model.fit(scaler.transform(X_train), y_train)
+
+        start = time.perf_counter()
+        naive = [model.predict(scaler.transform(row.reshape(1, -1)))[0] for row in X[:args.naive_rows]]
+        naive_rate = len(naive) / (time.perf_counter() - start)
+
+        batch_predictor = BatchPredictor(model, scaler, n_threads=args.threads)
+        predicted = batch_predictor.predict(X)
+        stats = batch_predictor.stats()
+        if not (predicted == model.predict(scaler.transform(X))).all():
+            failures.append(f"{name} difiere de scaler.transform + predict")
+        print(f"{name:<13} fila por fila {naive_rate:10.0f} filas/s | por lotes {stats['rows_per_second']:12.0f} filas/s "
+              f"({stats['rows_per_second'] / naive_rate:5.0f}x, {stats['threads']} hilos, "
+              f"lotes de {stats['batch_rows']})")
+    check_regressor(ml, failures)
+    check_other_models(ml, failures)
+    for failure in failures:
+        print(f"FALLA {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark del aprovechamiento de la caché de contexto (prefijos) de DeepSeek.
+
+Simula una conversación larga con un presupuesto de contexto pequeño contra
+el servidor mock, que cuenta como acierto los mensajes iniciales idénticos a
+una petición anterior (como la caché de prefijos de DeepSeek). Compara
+recortar la ventana justo lo necesario en cada petición (el prefijo cambia
+casi siempre) con recortar con margen (el prefijo se repite varias
+peticiones seguidas), y muestra el ahorro del system prompt compactado.
+
+Uso:
+    python benchmarks/bench_prompt_cache.py [--turns 40] [--context-tokens 1200]
+"""
+import argparse
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_engine
+from context_builder import ContextBuilder, compact_prompt, prompt_cache_tokens
+from mock_server import MockDeepSeekServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def system_prompt():
+    # El system prompt real, tal como está escrito dentro de ChatService
+    with open(os.path.join(ROOT, "chat_service.py"), encoding="utf-8") as f:
+        return re.search(r'self\.system_prompt = """(.*?)"""', f.read(), re.DOTALL).group(1)
+
+
+def converse(engine, server, prompt, turns, max_tokens, drop_ratio):
+    context = ContextBuilder(max_tokens=max_tokens, drop_ratio=drop_ratio)
+    hit_total = miss_total = 0
+    for turn in range(turns):
+        question = f"Pregunta {turn}: ¿cómo interpreto la inercia de k-means con {turn + 2} clusters?"
+        messages = context.build(prompt, question)
+        handle = engine.submit(
+            messages, "deepseek-chat", api_key="sk-mock", base_url=server.base_url,
+            extra_body={"stream_options": {"include_usage": True}},
+        )
+        answer = "".join(handle.iter_chunks())
+        hit, miss = prompt_cache_tokens(handle.usage)
+        hit_total += hit
+        miss_total += miss
+        context.add_turn("user", question)
+        context.add_turn("assistant", answer)
+    return hit_total, miss_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--context-tokens", type=int, default=1200)
+    args = parser.parse_args()
+
+    prompt = system_prompt()
+    compacted = compact_prompt(prompt)
+    print(f"System prompt: {len(prompt.encode('utf-8'))} bytes tal como está escrito, "
+          f"{len(compacted.encode('utf-8'))} bytes compactado")
+
+    engine = chat_engine.StreamEngine()
+    print(f"{args.turns} turnos con {args.context_tokens} tokens de contexto")
+    for label, ratio in (("Recorte justo", 0.0), ("Recorte con margen 25%", 0.25)):
+        # Un servidor nuevo por escenario para no compartir prefijos vistos
+        with MockDeepSeekServer(tokens=60) as server:
+            hit, miss = converse(engine, server, prompt, args.turns, args.context_tokens, ratio)
+        print(f"{label:<24} tokens de prompt en caché {hit:7d} | sin caché {miss:7d} | "
+              f"acierto {hit / (hit + miss):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
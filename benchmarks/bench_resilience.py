@@ -0,0 +1,97 @@
+"""Benchmark de la capa de resiliencia del motor de streaming.
+
+Usa el servidor mock con inyección de fallos (errores HTTP 500 y arranques
+lentos) y compara, sobre las mismas peticiones concurrentes, el motor sin
+reintentos, con reintentos con backoff y jitter, y con reintentos más
+hedging. Al final muestra cómo el circuit breaker deja de golpear a un
+upstream caído.
+
+Uso:
+    python benchmarks/bench_resilience.py [--requests 100] [--error-rate 0.2] [--slow-rate 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_engine
+import resilience
+from bench_load import percentile
+from mock_server import MockDeepSeekServer
+
+API_KEY = "sk-mock"
+MESSAGES = [{"role": "user", "content": "¿Qué es k-means?"}]
+
+
+def one_request(engine, base_url):
+    start = time.perf_counter()
+    ttft = None
+    try:
+        handle = engine.submit(MESSAGES, "deepseek-chat", api_key=API_KEY, base_url=base_url)
+        for _ in handle.iter_chunks():
+            if ttft is None:
+                ttft = time.perf_counter() - start
+        return ttft, None
+    except Exception as e:
+        return None, resilience.error_kind(e)
+
+
+def run(label, engine, server, requests, concurrency):
+    before = server.requests
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: one_request(engine, server.base_url), range(requests)))
+    ttfts = [ttft for ttft, error in results if error is None]
+    errors = [error for _, error in results if error is not None]
+    print(f"{label:<28} éxito {len(ttfts) / requests:6.1%} | primer token p50 {percentile(ttfts, 50) * 1000:7.1f} ms"
+          f" | p95 {percentile(ttfts, 95) * 1000:7.1f} ms | p99 {percentile(ttfts, 99) * 1000:7.1f} ms"
+          f" | peticiones al upstream {server.requests - before}")
+    if errors:
+        kinds = {kind: errors.count(kind) for kind in set(errors)}
+        print(f"{'':<28} errores {kinds}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--slow-delay", type=float, default=2.0)
+    parser.add_argument("--hedge-after", type=float, default=0.3, help="Segundos sin primer token antes de la copia")
+    args = parser.parse_args()
+
+    server = MockDeepSeekServer(
+        tokens=30, first_token_delay=0.05, error_rate=args.error_rate,
+        slow_rate=args.slow_rate, slow_delay=args.slow_delay, seed=1,
+    ).start()
+    print(f"{args.requests} peticiones, {args.concurrency} concurrentes | "
+          f"{args.error_rate:.0%} con error 500, {args.slow_rate:.0%} con {args.slow_delay:.1f} s hasta el primer token")
+
+    configs = [
+        ("Sin reintentos", dict(retry=resilience.RetryPolicy(max_attempts=1), hedge_after=0)),
+        ("Reintentos con jitter", dict(retry=resilience.RetryPolicy(max_attempts=4, base_delay=0.05), hedge_after=0)),
+        (f"Reintentos + hedging {args.hedge_after * 1000:.0f} ms",
+         dict(retry=resilience.RetryPolicy(max_attempts=4, base_delay=0.05), hedge_after=args.hedge_after)),
+    ]
+    # Umbral alto para que el breaker no se abra en esta parte
+    os.environ["VICTORIA_BREAKER_FAILURES"] = str(10 ** 6)
+    for label, options in configs:
+        engine = chat_engine.StreamEngine(first_token_timeout=10, **options)
+        run(label, engine, server, args.requests, args.concurrency)
+
+    # Upstream caído: el breaker corta las llamadas tras unos pocos fallos
+    server.error_rate = 1.0
+    server.slow_rate = 0.0
+    for label, threshold in (("Upstream caído, sin breaker", 10 ** 6), ("Upstream caído, con breaker", 5)):
+        engine = chat_engine.StreamEngine(retry=resilience.RetryPolicy(max_attempts=2, base_delay=0.01), hedge_after=0)
+        os.environ["VICTORIA_BREAKER_FAILURES"] = str(threshold)
+        run(label, engine, server, args.requests, args.concurrency)
+    os.environ.pop("VICTORIA_BREAKER_FAILURES", None)
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark del router de peticiones (is_code_request precompilado).
+
+Mide primero el clasificador: los tres regex de la versión anterior
+(recompilados por la caché de re y con el mensaje en minúsculas en cada
+llamada) contra el patrón único precompilado. Después envía una mezcla de
+preguntas conceptuales cortas, peticiones de código y preguntas largas a
+VictoriaChatbot contra el mock (que respeta max_tokens, como la API) con
+todas las peticiones en la configuración general y con el router activo, y
+reporta latencia, tokens generados y respuestas cortadas por max_tokens por
+ruta. Las preguntas conceptuales piden una respuesta breve (el mock respeta
+el límite de palabras de la instrucción), así que max_tokens no debería
+cortarlas; las que se cortan se marcan y no se guardan en la caché.
+
+Uso:
+    python benchmarks/bench_router.py [--rounds 5] [--tokens 1500] [--token-rate 400]
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+import timeit
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+
+import router
+from bench_load import import_app, percentile
+from mock_server import MockDeepSeekServer
+
+PROMPTS = [
+    "¿Qué es el overfitting?",
+    "¿Cuál es la diferencia entre precisión y recall?",
+    "Escribe un script en Python con pandas que limpie valores nulos y entrene un modelo.",
+    "Genera el código de un gráfico de dispersión con matplotlib para mis ventas.",
+    "Tengo una base de clientes de una tienda en San Salvador con compras de los últimos tres años, "
+    "datos demográficos y canal de venta. Quiero entender qué segmentos existen, qué variables "
+    "conviene considerar, cómo validar que la segmentación tiene sentido de negocio y qué riesgos "
+    "de privacidad debo revisar antes de compartir los resultados con el equipo de marketing.",
+]
+
+
+def old_is_code_request(message):
+    patterns = [
+        r"\b(código|programar|script|función|analizar datos)\b",
+        r"\b(pandas|numpy|matplotlib|seaborn|python|ml|machine learning)\b",
+        r"\b(gráfico|gráfica|visualización|plot|predict|entrenar)\b"
+    ]
+    return any(re.search(p, message.lower()) for p in patterns)
+
+
+def bench_classifier():
+    number = 20_000
+    for label, func in (("3 regex + lower()", old_is_code_request),
+                        ("Patrón precompilado", router.is_code_request)):
+        seconds = timeit.timeit(lambda: [func(p) for p in PROMPTS], number=number)
+        print(f"{label:<22} {seconds / (number * len(PROMPTS)) * 1e6:6.2f} µs por mensaje")
+    assert all(old_is_code_request(p) == router.is_code_request(p) for p in PROMPTS)
+
+
+def run(app, label, use_router, rounds):
+    results = {}
+    classifier = router.get_router()
+    general = classifier.routes[router.GENERAL]
+    for turn in range(rounds):
+        for prompt in PROMPTS:
+            bot = app.VictoriaChatbot()
+            if not use_router:
+                bot.router = router.RequestRouter(routes={name: general for name in router.DEFAULT_ROUTES})
+            start = time.perf_counter()
+            response = bot.generate_response(f"{prompt} ({label} {turn})")
+            entry = results.setdefault(classifier.classify(prompt), {"latency": [], "tokens": [], "truncated": 0})
+            entry["latency"].append(time.perf_counter() - start)
+            entry["tokens"].append(bot.last_usage["completion_tokens"])
+            entry["truncated"] += bot.last_truncated
+    print(label)
+    for name, entry in sorted(results.items()):
+        print(f"  {name:<8} latencia p50 {percentile(entry['latency'], 50) * 1000:8.0f} ms | "
+              f"p95 {percentile(entry['latency'], 95) * 1000:8.0f} ms | "
+              f"tokens {sum(entry['tokens']) / len(entry['tokens']):7.0f} por respuesta | "
+              f"cortadas {entry['truncated']}/{len(entry['tokens'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--tokens", type=int, default=1500, help="Tokens de una respuesta sin límite")
+    parser.add_argument("--token-rate", type=float, default=400.0)
+    args = parser.parse_args()
+
+    bench_classifier()
+    with MockDeepSeekServer(tokens=args.tokens, token_rate=args.token_rate, first_token_delay=0.1) as server:
+        os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+        os.environ.setdefault("DEEPSEEK_API_KEY", "sk-mock")
+        os.environ.pop("VICTORIA_CACHE_DB", None)
+        app = import_app()
+        run(app, "Sin router (todo en la ruta general)", False, args.rounds)
+        run(app, "Con router", True, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
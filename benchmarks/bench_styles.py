@@ -0,0 +1,80 @@
+"""Benchmark de los bytes de estilos enviados al navegador por rerun.
+
+Compara el envío anterior (la hoja de estilos completa, sin minificar y con
+los @import de Google Fonts, en cada rerun) con la hoja precalculada por
+tema, minificada y enviada solo en el primer rerun de la sesión o al cambiar
+de tema.
+
+Uso:
+    python benchmarks/bench_styles.py [--reruns 50] [--theme-switches 1]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+logging.disable(logging.WARNING)
+
+import design
+
+GOOGLE_IMPORTS = """
+        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
+        @import url('https://fonts.googleapis.com/css2?family=JetBrains+Mono:wght@400;500&display=swap');
+"""
+
+
+def legacy_payload(theme_name):
+    """Bloque <style> que se enviaba con st.markdown en cada rerun"""
+    css = design.render_stylesheet(theme_name).replace(design.FONT_FACES, GOOGLE_IMPORTS)
+    return f"<style>{css}</style>"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=50)
+    parser.add_argument("--theme-switches", type=int, default=1)
+    args = parser.parse_args()
+
+    themes = ["light"]
+    for i in range(args.theme_switches):
+        themes.append("dark" if i % 2 == 0 else "light")
+    # Reparte los cambios de tema a lo largo de los reruns
+    step = max(1, args.reruns // len(themes))
+    schedule = [themes[min(i // step, len(themes) - 1)] for i in range(args.reruns)]
+
+    legacy_bytes = sum(len(legacy_payload(theme).encode("utf-8")) for theme in schedule)
+
+    sent_theme = None
+    cached_bytes = 0
+    for theme in schedule:
+        if theme != sent_theme:
+            cached_bytes += len(design.stylesheet_payload(theme).encode("utf-8"))
+            sent_theme = theme
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        legacy_payload("light")
+    legacy_build = (time.perf_counter() - start) / 1000
+    design.build_stylesheet.cache_clear()
+    design.stylesheet_payload.cache_clear()
+    start = time.perf_counter()
+    for _ in range(1000):
+        design.stylesheet_payload("light")
+    cached_build = (time.perf_counter() - start) / 1000
+
+    print(f"{args.reruns} reruns, {args.theme_switches} cambio(s) de tema")
+    print(f"Anterior   {legacy_bytes / 1024:8.1f} KB enviados | "
+          f"{len(legacy_payload('light')) / 1024:5.1f} KB por rerun | "
+          f"generación {legacy_build * 1e6:7.1f} µs por rerun")
+    print(f"Precalculada {cached_bytes / 1024:6.1f} KB enviados | "
+          f"{len(design.stylesheet_payload('light')) / 1024:5.1f} KB al cambiar de tema, 0 KB el resto | "
+          f"generación {cached_build * 1e6:7.1f} µs por rerun")
+    print(f"Reducción de bytes por sesión: x{legacy_bytes / cached_bytes:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Servidor local que imita el endpoint /chat/completions de DeepSeek.
+
+Responde en streaming (SSE) con el mismo formato de chunks que la API
+compatible con OpenAI, para medir el cliente sin gastar cuota real. La
+velocidad de tokens, la latencia, el jitter y la inyección de errores son
+configurables.
+
+Uso como servidor independiente (la app o el benchmark apuntan a él con
+DEEPSEEK_BASE_URL):
+    python benchmarks/mock_server.py --port 8000 --token-rate 50 --latency 0.3
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límite de palabras pedido en el mensaje (la instrucción de la ruta CONCEPT);
+# el mock lo respeta como lo haría el modelo, contando una palabra por token
+_WORD_LIMIT = re.compile(r"no más de (\d+) palabras")
+
+
+class MockDeepSeekServer:
+    """Servidor SSE en un hilo de fondo; usar base_url como DEEPSEEK_BASE_URL"""
+
+    def __init__(self, host="127.0.0.1", port=0, tokens=50, token_delay=0.0,
+                 first_token_delay=0.0, token_rate=None, jitter=0.0, error_rate=0.0,
+                 error_status=500, drop_rate=0.0, slow_rate=0.0, slow_delay=5.0, seed=None):
+        self.tokens = tokens
+        # token_rate (tokens por segundo) tiene prioridad sobre token_delay
+        self.token_delay = 1.0 / token_rate if token_rate else token_delay
+        self.first_token_delay = first_token_delay
+        # Variación aleatoria (± segundos) de cada espera
+        self.jitter = jitter
+        # Probabilidad de responder con error_status antes de empezar el stream
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # Probabilidad de cortar la conexión a mitad del stream
+        self.drop_rate = drop_rate
+        # Probabilidad de que el primer token tarde slow_delay segundos
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.connections = 0
+        self.requests = 0
+        self.disconnects = 0
+        self.errors = 0
+        self.drops = 0
+        self.slow = 0
+        # Tokens escritos al socket y streams abiertos en este momento
+        self.tokens_sent = 0
+        self.open_streams = 0
+        self.cache_hit_tokens = 0
+        self.cache_miss_tokens = 0
+        # Prefijos de mensajes ya vistos, como la caché de contexto de DeepSeek
+        self._prefixes = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        """Retorna los contadores de conexiones, peticiones y fallos"""
+        return {
+            "connections": self.connections,
+            "requests": self.requests,
+            "disconnects": self.disconnects,
+            "errors": self.errors,
+            "drops": self.drops,
+            "slow": self.slow,
+            "tokens_sent": self.tokens_sent,
+            "open_streams": self.open_streams,
+            "cache_hit_tokens": self.cache_hit_tokens,
+            "cache_miss_tokens": self.cache_miss_tokens,
+        }
+
+    def _count(self, attribute, amount=1):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + amount)
+
+    def _chance(self, probability):
+        if probability <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < probability
+
+    def _prompt_cache(self, messages):
+        # Tokens (palabras) de los mensajes iniciales idénticos a una petición
+        # anterior; el resto cuenta como fallo de caché
+        digest = hashlib.sha256()
+        hit = miss = 0
+        matching = True
+        with self._lock:
+            for message in messages:
+                digest.update(json.dumps(message, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+                prefix = digest.copy().hexdigest()
+                tokens = len(str(message.get("content", "")).split())
+                if matching and prefix in self._prefixes:
+                    hit += tokens
+                else:
+                    matching = False
+                    miss += tokens
+                    self._prefixes.add(prefix)
+            self.cache_hit_tokens += hit
+            self.cache_miss_tokens += miss
+        return hit, miss
+
+    def _delay(self, base):
+        # Espera base con jitter uniforme, nunca negativa
+        if self.jitter:
+            with self._lock:
+                base += self._random.uniform(-self.jitter, self.jitter)
+        if base > 0:
+            time.sleep(base)
+
+
+def _chunk(model, content=None, finish_reason=None):
+    delta = {"role": "assistant", "content": content} if content is not None else {}
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _usage_chunk(model, cache_hit_tokens, cache_miss_tokens, completion_tokens):
+    payload = _chunk(model)
+    payload["choices"] = []
+    prompt_tokens = cache_hit_tokens + cache_miss_tokens
+    payload["usage"] = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_cache_hit_tokens": cache_hit_tokens,
+        "prompt_cache_miss_tokens": cache_miss_tokens,
+    }
+    return payload
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Sin Nagle: cada evento SSE sale en cuanto se escribe
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            server._count("connections")
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            server._count("requests")
+            model = body.get("model", "deepseek-chat")
+
+            if server._chance(server.error_rate):
+                server._count("errors")
+                self._send_error_body(server.error_status)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            cache_hit, cache_miss = server._prompt_cache(body.get("messages", []))
+            messages = body.get("messages") or [{}]
+            word_limit = _WORD_LIMIT.search(str(messages[-1].get("content", "")))
+            wanted = min(server.tokens, int(word_limit.group(1))) if word_limit else server.tokens
+            # Como la API real, max_tokens corta la respuesta
+            tokens = min(wanted, body.get("max_tokens") or wanted)
+            drop_at = tokens // 2 if server._chance(server.drop_rate) else None
+            first_token_delay = server.first_token_delay
+            if server._chance(server.slow_rate):
+                server._count("slow")
+                first_token_delay = server.slow_delay
+            server._count("open_streams")
+            try:
+                server._delay(first_token_delay)
+                for i in range(tokens):
+                    if i == drop_at:
+                        # Corte abrupto: sin fin de chunked ni [DONE]
+                        server._count("drops")
+                        self.close_connection = True
+                        return
+                    if i:
+                        server._delay(server.token_delay)
+                    self._send_event(_chunk(model, f"tok{i} "))
+                    server._count("tokens_sent")
+                self._send_event(_chunk(model, finish_reason="stop" if tokens == wanted else "length"))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self._send_event(_usage_chunk(model, cache_hit, cache_miss, tokens))
+                self._send_raw(b"data: [DONE]\n\n")
+                self._send_raw(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                # El cliente cerró el stream antes de terminar
+                server._count("disconnects")
+                self.close_connection = True
+            finally:
+                server._count("open_streams", -1)
+
+        def _send_error_body(self, status):
+            data = json.dumps({"error": {
+                "message": "Error simulado por el servidor mock",
+                "type": "server_error" if status >= 500 else "rate_limit_error",
+                "code": status,
+            }}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_event(self, payload):
+            self._send_raw(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        def _send_raw(self, data):
+            # Codificación chunked de HTTP/1.1 para poder reutilizar la conexión
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens por respuesta")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Tokens por segundo (0 = sin límite)")
+    parser.add_argument("--latency", type=float, default=0.3, help="Segundos hasta el primer token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación ± en segundos de cada espera")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de peticiones que fallan")
+    parser.add_argument("--error-status", type=int, default=500, help="Código HTTP de los fallos (500, 429, ...)")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fracción de streams cortados a la mitad")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fracción de peticiones con arranque lento")
+    parser.add_argument("--slow-delay", type=float, default=5.0, help="Segundos hasta el primer token en las lentas")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockDeepSeekServer(
+        host=args.host, port=args.port, tokens=args.tokens, token_rate=args.token_rate or None,
+        first_token_delay=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        error_status=args.error_status, drop_rate=args.drop_rate, slow_rate=args.slow_rate,
+        slow_delay=args.slow_delay, seed=args.seed,
+    )
+    print(f"Mock de DeepSeek escuchando en {server.base_url}")
+    print(f"  export DEEPSEEK_BASE_URL={server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        print(f"\nContadores: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
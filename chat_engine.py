@@ -0,0 +1,419 @@
+import asyncio
+import os
+import threading
+
+import time
+
+import client_pool
+import metrics
+import resilience
+
+# Marca de fin de stream dentro de la cola de cada sesión
+_DONE = object()
+
+class StreamHandle:
+    """Stream de una sesión.
+
+    El motor deja los fragmentos en una cola acotada y la UI los consume
+    desde el hilo del script. Si la UI no consume, el productor se detiene al
+    llenarse la cola y deja de leer del upstream (backpressure).
+    """
+
+    def __init__(self, engine, queue_size):
+        self._engine = engine
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._task = None
+        self._stream = None
+        self._done_pending = False
+        self.error = None
+        self.cancelled = False
+        self.finished = False
+        self.usage = None
+        # "stop" o "length" (cortada por max_tokens) al terminar el stream
+        self.finish_reason = None
+        # Fragmentos recibidos del upstream y, al cancelar, tokens que no se
+        # generaron y etapa en la que se cortó ("queued", "first_token" o
+        # "streaming"); en un stream compartido se copian del vuelo
+        self.received = 0
+        self.tokens_saved = 0
+        self.cancel_stage = None
+        self.cancel_requested_at = None
+
+    def iter_chunks(self, timeout=None, max_batch=64):
+        """Genera los fragmentos de texto a medida que llegan.
+
+        timeout limita la espera de cada lote en segundos. Si el stream
+        terminó con error, la excepción se relanza al final.
+        """
+        while True:
+            for item in self._engine.call(self._drain(max_batch), timeout):
+                if item is _DONE:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield item
+
+    def cancel(self):
+        """Cancela el stream y cierra la conexión con el upstream.
+
+        No espera: el motor cierra la respuesta HTTP en cuanto la tarea
+        recibe la cancelación, aunque esté bloqueada esperando el siguiente
+        fragmento.
+        """
+        if self._task is not None and not self.finished and self.cancel_requested_at is None:
+            self.cancel_requested_at = time.perf_counter()
+            self._engine._loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _drain(self, max_batch):
+        # Espera el primer fragmento y se lleva todos los que ya estén listos
+        items = [await self._queue.get()]
+        while len(items) < max_batch and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        if self._done_pending and self._queue.empty():
+            self._done_pending = False
+            items.append(_DONE)
+        return items
+
+    async def _put(self, content):
+        await self._queue.put(content)
+
+    def _finish(self):
+        self.finished = True
+        try:
+            self._queue.put_nowait(_DONE)
+        except asyncio.QueueFull:
+            # La cola está llena: _drain entregará el fin al vaciarla
+            self._done_pending = True
+
+class _Flight:
+    """Stream del upstream compartido por peticiones idénticas en curso.
+
+    Guarda todos los fragmentos recibidos para que quien se sume tarde
+    reciba primero el prefijo ya generado. Cada suscriptor lo recorre con su
+    propio cursor, así que uno lento no frena a los demás.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.chunks = []
+        self.subscribers = set()
+        self.task = None
+        self._stream = None
+        self._wakeup = asyncio.Event()
+        self.error = None
+        self.cancelled = False
+        self.finished = False
+        self.usage = None
+        self.finish_reason = None
+        self.received = 0
+        self.tokens_saved = 0
+        self.cancel_stage = None
+        self.cancel_requested_at = None
+
+    async def _put(self, content):
+        self.chunks.append(content)
+        self._wake()
+
+    def _finish(self):
+        self.finished = True
+        self._wake()
+
+    def _wake(self):
+        # Despierta a los suscriptores en espera y prepara el siguiente aviso
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+class StreamEngine:
+    """Motor de generación asíncrono compartido por todas las sesiones.
+
+    Un único event loop en un hilo de fondo atiende todos los streams de
+    forma concurrente con AsyncOpenAI. Un semáforo limita cuántas llamadas al
+    upstream hay abiertas a la vez; el resto espera su turno.
+    """
+
+    def __init__(self, max_concurrent=None, queue_size=None, retry=None,
+                 first_token_timeout=None, hedge_after=None):
+        self.max_concurrent = max_concurrent or int(os.getenv("VICTORIA_MAX_CONCURRENT_STREAMS", "32"))
+        self.queue_size = queue_size or int(os.getenv("VICTORIA_STREAM_QUEUE_SIZE", "256"))
+        # Reintentos y hedging solo antes del primer token: después, repetir
+        # la petición duplicaría texto ya mostrado
+        self.retry = retry or resilience.RetryPolicy()
+        self.first_token_timeout = first_token_timeout or float(
+            os.getenv("VICTORIA_FIRST_TOKEN_TIMEOUT", "30")
+        )
+        self.hedge_after = hedge_after if hedge_after is not None else float(
+            os.getenv("VICTORIA_HEDGE_AFTER_MS", "0")
+        ) / 1000
+        self.active = 0
+        self.waiting = 0
+        self._clients = {}
+        self._breakers = {}
+        self._flights = {}
+        self._semaphore = None
+        # Tokens generados por las respuestas completas, para estimar los
+        # que ahorra una cancelación
+        self._completion_tokens = 0
+        self._completed = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="stream-engine", daemon=True)
+        self._thread.start()
+
+    def call(self, coro, timeout=None):
+        """Ejecuta una corrutina en el loop del motor y espera su resultado"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def submit(self, messages, model, api_key=None, base_url=None, coalesce_key=None, **params):
+        """Inicia un stream de chat y retorna su StreamHandle.
+
+        Las peticiones con el mismo coalesce_key que lleguen mientras otra
+        sigue en curso se suman a su stream en lugar de abrir uno nuevo.
+        """
+        return self.call(self._open(messages, model, api_key, base_url, params, coalesce_key))
+
+    def stats(self):
+        """Retorna los streams activos, los que esperan turno y el estado de los circuitos"""
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "circuits": {key[0]: breaker.state for key, breaker in self._breakers.items()},
+            "flights": len(self._flights),
+            "average_completion_tokens": self._average_completion(),
+        }
+
+    def _average_completion(self):
+        return self._completion_tokens / self._completed if self._completed else None
+
+    def _expected_tokens(self, params):
+        # Largo esperado de la respuesta: el promedio de las completas,
+        # acotado por max_tokens si la petición lo fija
+        limit = params.get("max_tokens")
+        average = self._average_completion()
+        if average is None:
+            return limit or 0
+        return min(average, limit) if limit else average
+
+    async def _open(self, messages, model, api_key, base_url, params, coalesce_key=None):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
+        base_url = base_url or os.getenv("DEEPSEEK_BASE_URL", client_pool.DEFAULT_BASE_URL)
+        key = client_pool.client_key(api_key, base_url)
+        if key not in self._clients:
+            # Los reintentos los maneja el motor, no el SDK
+            self._clients[key] = client_pool.create_async_client(api_key, base_url, max_retries=0)
+            self._breakers[key] = resilience.CircuitBreaker()
+
+        handle = StreamHandle(self, self.queue_size)
+        if coalesce_key is None:
+            handle._task = self._loop.create_task(
+                self._produce(handle, self._clients[key], self._breakers[key], messages, model, params)
+            )
+            return handle
+
+        flight = self._flights.get(coalesce_key)
+        if flight is None:
+            flight = _Flight(coalesce_key)
+            flight.task = self._loop.create_task(
+                self._produce(flight, self._clients[key], self._breakers[key], messages, model, params)
+            )
+            flight.task.add_done_callback(lambda _: self._land(flight))
+            self._flights[coalesce_key] = flight
+        else:
+            metrics.counter(metrics.COALESCED_TOTAL, "Peticiones unidas a un stream idéntico en curso").inc()
+        flight.subscribers.add(handle)
+        handle._task = self._loop.create_task(self._follow(handle, flight))
+        return handle
+
+    async def _follow(self, handle, flight):
+        # Copia los fragmentos del vuelo compartido a la cola de un suscriptor
+        cursor = 0
+        try:
+            while True:
+                if cursor < len(flight.chunks):
+                    content = flight.chunks[cursor]
+                    cursor += 1
+                    handle.received = cursor
+                    await handle._put(content)
+                elif flight.finished:
+                    handle.error = flight.error
+                    handle.usage = flight.usage
+                    handle.finish_reason = flight.finish_reason
+                    break
+                else:
+                    await flight._wakeup.wait()
+        except asyncio.CancelledError:
+            handle.cancelled = True
+        finally:
+            flight.subscribers.discard(handle)
+            if not flight.subscribers and not flight.finished:
+                # Era el último interesado: cortar el upstream
+                self._land(flight)
+                flight.cancel_requested_at = handle.cancel_requested_at
+                flight.task.cancel()
+                # Quien corta el upstream se lleva las cifras de la cancelación
+                await asyncio.wait({flight.task})
+                handle.received = flight.received
+                handle.tokens_saved = flight.tokens_saved
+                handle.cancel_stage = flight.cancel_stage
+            handle._finish()
+
+    def _land(self, flight):
+        # Un vuelo terminado o abandonado no acepta más suscriptores
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    async def _produce(self, handle, client, breaker, messages, model, params):
+        self.waiting += 1
+        acquired = False
+        try:
+            async with self._semaphore:
+                self.waiting -= 1
+                acquired = True
+                self.active += 1
+                try:
+                    await self._stream(handle, client, breaker, messages, model, params)
+                finally:
+                    self.active -= 1
+        except asyncio.CancelledError:
+            handle.cancelled = True
+            self._record_cancel(handle, params, acquired)
+        except Exception as e:
+            handle.error = e
+        finally:
+            if not acquired:
+                self.waiting -= 1
+            handle._finish()
+
+    async def _stream(self, handle, client, breaker, messages, model, params):
+        stream, chunks, pending = await self._connect(client, breaker, messages, model, params)
+        handle._stream = stream
+        gaps = metrics.histogram(metrics.CHUNK_GAP_SECONDS, "Tiempo entre fragmentos del upstream")
+        last_chunk = None
+        try:
+            while True:
+                if pending:
+                    chunk = pending.pop(0)
+                else:
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        break
+                if chunk.choices:
+                    choice = chunk.choices[0]
+                    if choice.finish_reason:
+                        handle.finish_reason = choice.finish_reason
+                    content = choice.delta.content
+                    if content:
+                        now = time.perf_counter()
+                        if last_chunk is not None:
+                            gaps.observe(now - last_chunk)
+                        last_chunk = now
+                        handle.received += 1
+                        await handle._put(content)
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    # Según la versión del SDK llega como modelo o como dict
+                    handle.usage = usage if isinstance(usage, dict) else usage.model_dump()
+                    self._completion_tokens += handle.usage.get("completion_tokens") or 0
+                    self._completed += 1
+        finally:
+            # Cerrar la respuesta HTTP devuelve la conexión al pool
+            await stream.close()
+
+    def _record_cancel(self, handle, params, started):
+        """Registra una cancelación y los tokens que no llegaron a generarse"""
+        if not started:
+            stage = "queued"
+        elif handle.received:
+            stage = "streaming"
+        else:
+            stage = "first_token"
+        # DeepSeek envía un token por fragmento, así que los recibidos
+        # aproximan los ya generados (y cobrados)
+        handle.tokens_saved = max(0, round(self._expected_tokens(params) - handle.received))
+        handle.cancel_stage = stage
+        metrics.counter(metrics.CANCELLED_TOTAL, "Streams cancelados por etapa").inc(stage=stage)
+        metrics.counter(metrics.TOKENS_SAVED_TOTAL, "Tokens estimados que no se generaron por cancelar").inc(
+            handle.tokens_saved
+        )
+        if handle.cancel_requested_at is not None:
+            metrics.histogram(metrics.CANCEL_SECONDS, "Desde cancel() hasta cerrar la conexión").observe(
+                time.perf_counter() - handle.cancel_requested_at
+            )
+
+    async def _connect(self, client, breaker, messages, model, params):
+        """Abre el stream y espera el primer token, con reintentos y hedging"""
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                copy, opened = await resilience.hedged(
+                    lambda: self._open_first(client, messages, model, params),
+                    self.first_token_timeout,
+                    self._discard,
+                    self.hedge_after,
+                )
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    e = resilience.FirstTokenTimeout(self.first_token_timeout)
+                if not resilience.is_retriable(e):
+                    breaker.release()
+                    raise e
+                breaker.record_failure()
+                attempt += 1
+                if attempt >= self.retry.max_attempts:
+                    raise e
+                metrics.counter(metrics.RETRIES_TOTAL, "Reintentos antes del primer token").inc(
+                    reason=resilience.error_kind(e)
+                )
+                await asyncio.sleep(self.retry.delay(attempt - 1))
+                continue
+            breaker.record_success()
+            if self.hedge_after:
+                metrics.counter(metrics.HEDGED_TOTAL, "Copia que entregó el primer token").inc(
+                    winner="hedge" if copy else "primary"
+                )
+            return opened
+
+    async def _open_first(self, client, messages, model, params):
+        # Abre el stream y lee hasta el primer fragmento con contenido; si se
+        # cancela (perdió el hedging o venció el timeout) cierra la conexión
+        stream = None
+        try:
+            stream = await client.chat.completions.create(
+                model=model, messages=messages, stream=True, **params
+            )
+            chunks = stream.__aiter__()
+            pending = []
+            async for chunk in chunks:
+                pending.append(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    break
+            return stream, chunks, pending
+        except BaseException:
+            if stream is not None:
+                await stream.close()
+            raise
+
+    async def _discard(self, opened):
+        await opened[0].close()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Retorna el motor de streaming compartido por el proceso"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = StreamEngine()
+    return _engine
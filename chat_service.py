@@ -0,0 +1,252 @@
+import os
+import time
+
+import chat_engine
+import client_pool
+import metrics
+import resilience
+import response_cache
+import router
+from context_builder import ContextBuilder, compact_prompt, prompt_cache_tokens
+from security import SecurityValidator
+
+# Aviso que se agrega a una respuesta cortada por max_tokens; esas respuestas
+# no se guardan en la caché
+TRUNCATED_NOTICE = (
+    "\n\n*(Respuesta recortada por el límite de longitud. "
+    "Pide que continúe o escribe «explícalo en detalle» para una respuesta más larga.)*"
+)
+
+def strip_truncated_notice(text):
+    """Quita el aviso de respuesta recortada; el modelo no debe verlo en el historial"""
+    return text[:-len(TRUNCATED_NOTICE)] if text.endswith(TRUNCATED_NOTICE) else text
+
+class ChatService:
+    """Conversación con VictorIA sin depender de Streamlit.
+
+    Reúne validación, ruta, caché de respuestas, contexto multi-turno, motor
+    de streaming y métricas. VictoriaChatbot le agrega el render de
+    Streamlit; el servidor HTTP (api_server.py) usa stream_reply. El cliente
+    HTTP, el motor, el router y la caché son los compartidos del proceso.
+    """
+
+    def __init__(self):
+        self.api_key = os.getenv("DEEPSEEK_API_KEY")
+        self.base_url = os.getenv("DEEPSEEK_BASE_URL", client_pool.DEFAULT_BASE_URL)
+        # Motor de streaming compartido por todas las sesiones del proceso; sus
+        # clientes AsyncOpenAI usan el pool de conexiones de client_pool
+        self.engine = chat_engine.get_engine()
+        self._stream = None
+        self.model = "deepseek-chat"
+        # Modelo y límites de generación según el tipo de mensaje
+        self.router = router.get_router()
+        self.last_route = None
+        self.last_usage = None
+        self.last_truncated = False
+        self.security = SecurityValidator()
+        self.cache = response_cache.get_shared_cache()
+        self._hashed_prompt = None
+        self._system_hash = None
+        self.system_prompt = """Eres VictorIA, una asistente hombre salvadoreño virtual especializada en **minería de datos y análisis estadístico**, creada por estudiantes de la **Universidad Andrés Bello (UNAB), El Salvador**.  
+
+**Equipo creador:**  
+- **Estudiantes:** Héctor, Germán, Miguel, Víctor, Melissa y Melvin.  
+- **Ingeniero supervisor:** José Guillermo Rivera Pleitez (Contacto: joseguillermo.rivera@unab.edu.sv)
+
+        Tus capacidades incluyen:
+        1. Modelos de Machine Learning:
+           - Regresión y clasificación con scikit-learn
+           - Modelos avanzados con XGBoost
+           - Clustering y segmentación
+           - AutoML para optimización automática
+        
+        2. Visualización de datos:
+           - Gráficos interactivos con Plotly
+           - Visualizaciones declarativas con Altair
+           - Dashboards con Streamlit
+           
+        3. Análisis exploratorio:
+           - Generación automática de informes con pandas-profiling
+           - Detección de outliers y patrones
+           - Análisis de correlaciones
+        
+        4. Validación y seguridad:
+           - Verificación de intención del usuario
+           - Protección contra código malicioso
+           - Cumplimiento de normativas GDPR
+        """
+        # Historial multi-turno dentro de un presupuesto de tokens
+        self.context = ContextBuilder()
+
+    @property
+    def history(self):
+        """Mensajes del historial que caben en el contexto actual"""
+        return self.context.history
+    
+    def _format_messages(self, user_input):
+        return self.context.build(self.system_prompt, user_input)
+    
+    def is_code_request(self, message):
+        return router.is_code_request(message)
+    
+    def validate_request(self, message):
+        with metrics.histogram(metrics.VALIDATION_SECONDS, "Validación de seguridad del mensaje").time():
+            # Validación de seguridad
+            is_safe, warning = self.security.validate_input(message)
+            if not is_safe:
+                return False, warning
+            
+            # Validación de longitud
+            if len(message) > 2000:
+                return False, "Mensaje demasiado largo"
+                
+            return True, ""
+
+    def stream_reply(self, prompt):
+        """Genera la respuesta fragmento a fragmento, sin Streamlit.
+
+        Usa la misma caché, ruta, contexto y motor que la interfaz (no valida
+        el mensaje: eso queda en validate_request). Si quien consume deja de
+        iterar, por ejemplo porque el cliente HTTP se desconectó, cerrar el
+        generador corta el stream del upstream. Los errores se propagan.
+        """
+        start = time.perf_counter()
+        self.last_usage = None
+        self.last_truncated = False
+        route, messages, cache_key = self._prepare(prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            self._record_metrics("cache", {"time_to_first_chunk": time.perf_counter() - start}, route=route)
+            self._remember_turn(prompt, cached)
+            return
+
+        self._stream = handle = self._submit(messages, route, cache_key)
+        parts = []
+        first_chunk = None
+        try:
+            for content in handle.iter_chunks():
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                parts.append(content)
+                yield content
+        except GeneratorExit:
+            self._record_metrics("stopped", {"time_to_first_chunk": first_chunk}, route=route)
+            raise
+        except Exception as e:
+            metrics.counter(metrics.ERRORS_TOTAL, "Errores al generar respuestas").inc(kind=resilience.error_kind(e))
+            raise
+        finally:
+            handle.cancel()
+
+        self.last_usage = handle.usage
+        self._record_stream_seconds(route, time.perf_counter() - start)
+        self._record_metrics("upstream", {"time_to_first_chunk": first_chunk}, handle.usage, route)
+        response = "".join(parts)
+        if self._check_truncated(handle, route):
+            yield TRUNCATED_NOTICE
+        elif response:
+            self.cache.set(cache_key, response, self._system_hash)
+        self._remember_turn(prompt, response)
+
+    def _prepare(self, prompt):
+        """Arma los mensajes, elige la ruta y calcula la clave de caché"""
+        route = self.last_route = self.router.route(prompt)
+        messages = route.apply(self._format_messages(prompt))
+        cache_key = response_cache.make_key(
+            prompt, self._system_prompt_hash(), route.cache_tag(), self.context.fingerprint()
+        )
+        return route, messages, cache_key
+
+    def _submit(self, messages, route, cache_key):
+        """Inicia la generación en el motor asíncrono y retorna su StreamHandle"""
+        return self.engine.submit(
+            messages=messages,
+            model=route.model,
+            api_key=self.api_key,
+            base_url=self.base_url,
+            # Preguntas idénticas en curso en otras sesiones comparten stream
+            coalesce_key=cache_key,
+            # Pedir el conteo real de tokens en el último chunk
+            extra_body={"stream_options": {"include_usage": True}},
+            **route.params()
+        )
+
+    def _check_truncated(self, handle, route):
+        """Marca y cuenta una respuesta cortada por el max_tokens de la ruta"""
+        self.last_truncated = handle.finish_reason == "length"
+        if self.last_truncated:
+            metrics.counter(metrics.TRUNCATED_TOTAL, "Respuestas cortadas por max_tokens").inc(route=route.name)
+        return self.last_truncated
+
+    def _system_prompt_hash(self):
+        """Retorna el hash del system prompt e invalida la caché si cambió"""
+        if self.system_prompt != self._hashed_prompt:
+            if self._system_hash is not None:
+                self.cache.invalidate(self._system_hash)
+            self._hashed_prompt = self.system_prompt
+            # Cambios solo de espacios o sangría no invalidan la caché
+            self._system_hash = response_cache.hash_text(compact_prompt(self.system_prompt))
+        return self._system_hash
+
+    def _record_stream_seconds(self, route, seconds):
+        metrics.histogram(metrics.STREAM_SECONDS, "Duración total del stream").observe(seconds)
+        metrics.histogram(
+            metrics.ROUTE_STREAM_SECONDS.format(route=route.name), f"Duración del stream en la ruta {route.name}"
+        ).observe(seconds)
+
+    def _record_metrics(self, source, stats, usage=None, route=None):
+        """Registra el primer fragmento, el render (si hubo) y los tokens de la respuesta"""
+        metrics.counter(metrics.RESPONSES_TOTAL, "Respuestas por origen").inc(source=source)
+        if route is not None:
+            metrics.counter(metrics.ROUTED_TOTAL, "Peticiones por ruta del router").inc(route=route.name, source=source)
+        if stats.get("time_to_first_chunk") is not None:
+            metrics.histogram(metrics.FIRST_CHUNK_SECONDS, "Tiempo hasta el primer fragmento").observe(
+                stats["time_to_first_chunk"]
+            )
+            if route is not None and source != "cache":
+                metrics.histogram(
+                    metrics.ROUTE_FIRST_CHUNK_SECONDS.format(route=route.name),
+                    f"Tiempo hasta el primer fragmento en la ruta {route.name}"
+                ).observe(stats["time_to_first_chunk"])
+        if "render_time" in stats:
+            metrics.histogram(metrics.RENDER_SECONDS, "Tiempo de repintado por respuesta").observe(stats["render_time"])
+        if usage is not None:
+            metrics.histogram(metrics.PROMPT_TOKENS, "Tokens de prompt por petición", metrics.TOKEN_BUCKETS).observe(
+                usage["prompt_tokens"]
+            )
+            metrics.histogram(metrics.COMPLETION_TOKENS, "Tokens generados por respuesta", metrics.TOKEN_BUCKETS).observe(
+                usage["completion_tokens"]
+            )
+            if route is not None:
+                metrics.histogram(
+                    metrics.ROUTE_COMPLETION_TOKENS.format(route=route.name),
+                    f"Tokens generados en la ruta {route.name}", metrics.TOKEN_BUCKETS
+                ).observe(usage["completion_tokens"])
+            # Aciertos de la caché de contexto de DeepSeek sobre el prefijo
+            hit, miss = prompt_cache_tokens(usage)
+            if hit is not None:
+                metrics.counter(metrics.PROMPT_CACHE_TOKENS, "Tokens de prompt por estado de la caché de contexto").inc(
+                    hit, cache="hit"
+                )
+                metrics.counter(metrics.PROMPT_CACHE_TOKENS).inc(miss, cache="miss")
+                if stats.get("time_to_first_chunk") is not None:
+                    name = metrics.FIRST_CHUNK_PREFIX_HIT_SECONDS if hit > miss else metrics.FIRST_CHUNK_PREFIX_MISS_SECONDS
+                    metrics.histogram(name, "Tiempo hasta el primer fragmento según la caché de contexto").observe(
+                        stats["time_to_first_chunk"]
+                    )
+
+    def _remember_turn(self, prompt, response):
+        """Guarda el intercambio en el historial de la conversación"""
+        response = strip_truncated_notice(response)
+        if response:
+            self.context.add_turn("user", prompt)
+            self.context.add_turn("assistant", response)
+
+    def get_context_usage(self):
+        """Retorna los tokens de prompt estimados de la última petición"""
+        return self.context.last_usage
+
+    def get_cache_stats(self):
+        """Retorna los aciertos y fallos de la caché de respuestas"""
+        return self.cache.stats()
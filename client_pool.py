@@ -0,0 +1,74 @@
+import hashlib
+import os
+
+import httpx
+from openai import AsyncOpenAI
+
+DEFAULT_BASE_URL = "https://api.deepseek.com/v1"
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+def http2_available():
+    """HTTP/2 requiere el paquete opcional h2 (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def pool_settings():
+    """Lee la configuración del pool de conexiones desde el entorno"""
+    http2 = os.getenv("VICTORIA_HTTP2", "auto").lower()
+    return {
+        "max_connections": _env_int("VICTORIA_HTTP_MAX_CONNECTIONS", "100"),
+        "max_keepalive_connections": _env_int("VICTORIA_HTTP_MAX_KEEPALIVE", "20"),
+        "keepalive_expiry": _env_float("VICTORIA_HTTP_KEEPALIVE_EXPIRY", "30"),
+        "connect_timeout": _env_float("VICTORIA_HTTP_CONNECT_TIMEOUT", "5"),
+        "read_timeout": _env_float("VICTORIA_HTTP_READ_TIMEOUT", "60"),
+        "http2": http2_available() if http2 == "auto" else http2 in ("1", "true", "yes"),
+    }
+
+def request_timeout(settings=None):
+    """Timeout por petición: conexión corta y lectura larga para el streaming"""
+    settings = settings or pool_settings()
+    return httpx.Timeout(
+        settings["read_timeout"], connect=settings["connect_timeout"]
+    )
+
+def build_async_http_client(settings=None):
+    """Crea el cliente httpx asíncrono con los límites del pool y keep-alive"""
+    settings = settings or pool_settings()
+    return httpx.AsyncClient(
+        http2=settings["http2"],
+        timeout=request_timeout(settings),
+        limits=httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+    )
+
+def client_key(api_key, base_url):
+    # La api key no se guarda en claro como parte de la clave de los clientes del motor
+    return base_url, hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+
+def create_async_client(api_key=None, base_url=None, max_retries=None):
+    """Crea un cliente AsyncOpenAI con el pool de conexiones configurado.
+
+    Los clientes asíncronos quedan ligados al event loop donde se usan, así
+    que el motor de streaming crea uno por (base_url, api key) en su loop y
+    lo comparten todas las sesiones del proceso.
+    """
+    settings = pool_settings()
+    options = {} if max_retries is None else {"max_retries": max_retries}
+    return AsyncOpenAI(
+        api_key=api_key or os.getenv("DEEPSEEK_API_KEY"),
+        base_url=base_url or os.getenv("DEEPSEEK_BASE_URL", DEFAULT_BASE_URL),
+        timeout=request_timeout(settings),
+        http_client=build_async_http_client(settings),
+        **options,
+    )
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import re
+import unicodedata
+from collections import deque
+
+# Aproximación de tokens BPE: palabras partidas en trozos de hasta 4
+# caracteres más cada signo de puntuación. Para español queda cerca del
+# tokenizador real y cuesta un solo findall en C.
+_TOKEN_PIECES = re.compile(r"\w{1,4}|[^\w\s]")
+# Tokens extra que la API agrega por cada mensaje (rol y separadores)
+MESSAGE_OVERHEAD = 4
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def estimate_tokens(text):
+    """Estima los tokens de un texto sin depender del tokenizador del modelo"""
+    return len(_TOKEN_PIECES.findall(text))
+
+def compact_prompt(text):
+    """Forma canónica de un prompt: mismo texto, mismos bytes.
+
+    La caché de contexto de DeepSeek solo reutiliza prefijos idénticos byte a
+    byte, así que se normaliza Unicode y saltos de línea, se quitan espacios
+    finales, se elimina la sangría común de las líneas sangradas (la que
+    deja un string triple dentro de un método) y se colapsan las líneas en
+    blanco repetidas. Las sangrías relativas, como las de las listas, se
+    conservan.
+    """
+    text = unicodedata.normalize("NFC", text.replace("\r\n", "\n").replace("\t", "    "))
+    lines = [line.rstrip() for line in text.split("\n")]
+    indents = [len(line) - len(line.lstrip(" ")) for line in lines if line.startswith(" ") and line.strip()]
+    common = min(indents) if indents else 0
+    compacted = []
+    for line in lines:
+        if line.startswith(" " * common):
+            line = line[common:]
+        if not line and (not compacted or not compacted[-1]):
+            continue
+        compacted.append(line)
+    return "\n".join(compacted).strip()
+
+def prompt_cache_tokens(usage):
+    """Retorna (tokens del prompt en caché, tokens sin caché) de un usage.
+
+    DeepSeek informa prompt_cache_hit_tokens y prompt_cache_miss_tokens; la
+    API de OpenAI, prompt_tokens_details.cached_tokens. Sin datos retorna
+    (None, None).
+    """
+    if not usage:
+        return None, None
+    if usage.get("prompt_cache_hit_tokens") is not None:
+        return usage["prompt_cache_hit_tokens"], usage.get("prompt_cache_miss_tokens", 0)
+    details = usage.get("prompt_tokens_details") or {}
+    if details.get("cached_tokens") is not None:
+        return details["cached_tokens"], usage.get("prompt_tokens", 0) - details["cached_tokens"]
+    return None, None
+
+class Turn:
+    """Mensaje del historial con su conteo de tokens calculado una sola vez"""
+
+    __slots__ = ("role", "content", "tokens", "digest")
+
+    def __init__(self, role, content, count_tokens):
+        self.role = role
+        self.content = content
+        self.tokens = count_tokens(content) + MESSAGE_OVERHEAD
+        self.digest = hashlib.sha256(f"{role}\0{content}".encode("utf-8")).digest()
+
+    def as_message(self):
+        return {"role": self.role, "content": self.content}
+
+class ContextBuilder:
+    """Arma los mensajes de cada petición dentro de un presupuesto de tokens.
+
+    Los turnos se guardan con su conteo ya calculado y el total se mantiene
+    de forma incremental, así que cada petición solo tokeniza el prompt
+    nuevo. Cuando el historial no cabe, los turnos más antiguos salen de la
+    ventana y quedan condensados en un resumen extractivo corto.
+
+    El prefijo de cada petición (system prompt compactado, resumen e
+    historial) es determinista y solo cambia al recortar la ventana. Al
+    recortar se libera drop_ratio del presupuesto de una vez, para que el
+    mismo prefijo se repita en varias peticiones y DeepSeek lo sirva desde
+    su caché de contexto.
+    """
+
+    def __init__(self, max_tokens=None, summary_tokens=None, count_tokens=None, drop_ratio=None):
+        self.max_tokens = max_tokens or int(os.getenv("VICTORIA_CONTEXT_TOKENS", "3000"))
+        self.summary_tokens = summary_tokens or int(os.getenv("VICTORIA_SUMMARY_TOKENS", "200"))
+        self.count_tokens = count_tokens or estimate_tokens
+        self.drop_ratio = drop_ratio if drop_ratio is not None else float(
+            os.getenv("VICTORIA_CONTEXT_DROP_RATIO", "0.25")
+        )
+        self._turns = deque()
+        self._history_tokens = 0
+        self._summary = None
+        self._system_prompt = None
+        self._system_content = ""
+        self._system_tokens = 0
+        self.last_usage = {}
+
+    def add_turn(self, role, content):
+        """Agrega un mensaje al historial"""
+        turn = Turn(role, content, self.count_tokens)
+        self._turns.append(turn)
+        self._history_tokens += turn.tokens
+
+    def clear(self):
+        """Olvida el historial y el resumen"""
+        self._turns.clear()
+        self._history_tokens = 0
+        self._summary = None
+
+    @property
+    def history(self):
+        """Mensajes del historial dentro de la ventana actual"""
+        return [turn.as_message() for turn in self._turns]
+
+    def build(self, system_prompt, user_input):
+        """Retorna la lista de mensajes para la API respetando el presupuesto"""
+        if system_prompt is not self._system_prompt:
+            self._system_prompt = system_prompt
+            self._system_content = compact_prompt(system_prompt)
+            self._system_tokens = self.count_tokens(self._system_content) + MESSAGE_OVERHEAD
+        prompt_tokens = self.count_tokens(user_input) + MESSAGE_OVERHEAD
+
+        # Sacar los turnos más antiguos hasta que el historial quepa
+        available = self.max_tokens - self._system_tokens - prompt_tokens
+        dropped = []
+        if self._history_tokens + self._summary_cost() > available:
+            # Dejar lugar para el resumen de lo que sale de la ventana y
+            # margen para las próximas peticiones sin volver a recortar
+            target = available - int(max(available, 0) * self.drop_ratio)
+            while self._turns and self._history_tokens + self.summary_tokens > target:
+                turn = self._turns.popleft()
+                self._history_tokens -= turn.tokens
+                dropped.append(turn)
+            if dropped:
+                self._summarize(dropped)
+            if self._history_tokens + self._summary_cost() > available:
+                self._summary = None
+
+        messages = [{"role": "system", "content": self._system_content}]
+        if self._summary is not None:
+            messages.append(self._summary.as_message())
+        messages.extend(turn.as_message() for turn in self._turns)
+        messages.append({"role": "user", "content": user_input})
+
+        self.last_usage = {
+            "system_tokens": self._system_tokens,
+            "summary_tokens": self._summary_cost(),
+            "history_tokens": self._history_tokens,
+            "user_tokens": prompt_tokens,
+            "prompt_tokens": self._system_tokens + self._summary_cost() + self._history_tokens + prompt_tokens,
+            "turns": len(self._turns),
+            "dropped_turns": len(dropped),
+        }
+        return messages
+
+    def fingerprint(self):
+        """Hash del historial en la ventana, para distinguir entradas de caché"""
+        if not self._turns and self._summary is None:
+            return ""
+        digest = hashlib.sha256()
+        if self._summary is not None:
+            digest.update(self._summary.digest)
+        for turn in self._turns:
+            digest.update(turn.digest)
+        return digest.hexdigest()
+
+    def _summary_cost(self):
+        return self._summary.tokens if self._summary is not None else 0
+
+    def _summarize(self, dropped):
+        # Resumen extractivo: primera oración de cada turno descartado, sin
+        # llamar al modelo; las líneas más recientes tienen prioridad
+        lines = self._summary.content.splitlines()[1:] if self._summary is not None else []
+        for turn in dropped:
+            first = _SENTENCE_END.split(turn.content.strip(), 1)[0][:160]
+            who = "Usuario" if turn.role == "user" else "Asistente"
+            lines.append(f"- {who}: {first}")
+
+        header = "Resumen de la conversación anterior:"
+        kept = []
+        budget = self.summary_tokens - self.count_tokens(header) - MESSAGE_OVERHEAD
+        for line in reversed(lines):
+            cost = self.count_tokens(line)
+            if cost > budget:
+                break
+            kept.append(line)
+            budget -= cost
+        if not kept:
+            self._summary = None
+            return
+        self._summary = Turn("system", "\n".join([header, *reversed(kept)]), self.count_tokens)
@@ -0,0 +1,216 @@
+import hashlib
+import os
+import threading
+import time
+
+# Filas por record batch al escribir Feather: permite leer el archivo por
+# bloques (iter_table_chunks) sin cargarlo completo
+FEATHER_BATCH_ROWS = 64_000
+# Una columna de texto pasa a categórica si tiene como máximo esta fracción
+# de valores distintos
+CATEGORY_MAX_RATIO = 0.5
+# Error absoluto máximo al pasar un float64 a float32, el mismo que usa
+# pd.to_numeric(downcast="float"); si algún valor se aleja más, queda en float64
+FLOAT32_ATOL = 5e-4
+
+_arrow = None
+_arrow_lock = threading.Lock()
+
+def _load_arrow():
+    """Importa pyarrow bajo demanda (pesa casi tanto como pandas)"""
+    global _arrow
+    if _arrow is None:
+        with _arrow_lock:
+            if _arrow is None:
+                try:
+                    import pyarrow as pa
+                    import pyarrow.compute as pc
+                    import pyarrow.csv as csv
+                    import pyarrow.feather as feather
+                    import pyarrow.ipc as ipc
+                    import pyarrow.parquet as pq
+                except ImportError as e:
+                    raise ImportError("La carga de datasets requiere pyarrow (pip install pyarrow)") from e
+                _arrow = (pa, pc, csv, feather, ipc, pq)
+    return _arrow
+
+def default_store_dir():
+    """Directorio de los datasets ingeridos (VICTORIA_DATA_DIR)"""
+    return os.getenv(
+        "VICTORIA_DATA_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "victoria", "datasets")
+    )
+
+def _smallest_int_type(pa, source, low, high):
+    # Los enteros con signo siguen con signo aunque no haya negativos, como
+    # pd.to_numeric(downcast="integer"): en uint, df.edad - 130 daría la vuelta
+    if pa.types.is_unsigned_integer(source):
+        candidates = (pa.uint8(), pa.uint16(), pa.uint32())
+    else:
+        candidates = (pa.int8(), pa.int16(), pa.int32())
+    for candidate in candidates:
+        bits = candidate.bit_width
+        if pa.types.is_unsigned_integer(candidate):
+            min_value, max_value = 0, 2 ** bits - 1
+        else:
+            min_value, max_value = -2 ** (bits - 1), 2 ** (bits - 1) - 1
+        if min_value <= low and high <= max_value:
+            return candidate
+    return None
+
+def _fits_float32(pa, pc, column, candidate):
+    # Iguales (también infinitos), dentro de la tolerancia o NaN en ambos;
+    # un valor fuera del rango de float32 pasa a infinito y no cumple
+    back = candidate.cast(pa.float64())
+    close = pc.less_equal(pc.abs(pc.subtract(back, column)), FLOAT32_ATOL)
+    same = pc.or_(pc.or_(pc.equal(back, column), close), pc.is_nan(column))
+    return pc.all(same).as_py() is not False
+
+def downcast_table(table, category_max_ratio=CATEGORY_MAX_RATIO, float32=True):
+    """Reduce los tipos de una tabla de Arrow.
+
+    Los enteros pasan al tipo más chico que cubre su rango sin cambiar de
+    signo, los float64 a float32 si todos sus valores vuelven de float32 con
+    un error de a lo sumo FLOAT32_ATOL, y las columnas de texto con pocos
+    valores distintos a diccionario (categóricas en pandas). Retorna (tabla,
+    cambios).
+    """
+    pa, pc = _load_arrow()[:2]
+    changes = {}
+    for index, field in enumerate(table.schema):
+        column = table.column(index)
+        new_column = None
+        if pa.types.is_integer(field.type) and len(column) > column.null_count:
+            bounds = pc.min_max(column).as_py()
+            target = _smallest_int_type(pa, field.type, bounds["min"], bounds["max"])
+            if target is not None and target.bit_width < field.type.bit_width:
+                new_column = column.cast(target)
+        elif float32 and pa.types.is_float64(field.type):
+            candidate = column.cast(pa.float32(), safe=False)
+            if _fits_float32(pa, pc, column, candidate):
+                new_column = candidate
+        elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            valid = len(column) - column.null_count
+            distinct = pc.count_distinct(column).as_py()
+            if valid and distinct <= category_max_ratio * valid:
+                new_column = column.dictionary_encode()
+        if new_column is not None:
+            table = table.set_column(index, field.name, new_column)
+            changes[field.name] = f"{field.type} -> {new_column.type}"
+    return table, changes
+
+class DatasetHandle:
+    """Referencia liviana a un dataset ingerido.
+
+    Solo guarda la ruta y los metadatos, así que puede vivir en
+    st.session_state sin copiar datos en cada rerun. table() abre el
+    archivo Feather mapeado en memoria: las columnas se leen del page cache
+    del sistema sin copiarse al heap de Python.
+    """
+
+    def __init__(self, path, name, rows, columns, report):
+        self.path = path
+        self.name = name
+        self.rows = rows
+        self.columns = columns
+        self.report = report
+
+    def table(self, columns=None):
+        """Tabla de Arrow respaldada por el archivo (cero copias en Feather)"""
+        pa, _, _, _, ipc, pq = _load_arrow()
+        if self.path.endswith(".parquet"):
+            return pq.read_table(self.path, columns=columns, memory_map=True)
+        table = ipc.open_file(pa.memory_map(self.path, "r")).read_all()
+        return table.select(columns) if columns else table
+
+    def to_pandas(self, columns=None):
+        """DataFrame del dataset (las categóricas se conservan)"""
+        return self.table(columns).to_pandas(split_blocks=True)
+
+    def to_numpy(self, columns):
+        """Matriz 2D de columnas numéricas, para MLTools"""
+        import numpy as np
+        table = self.table(columns)
+        return np.column_stack([
+            table.column(name).to_numpy() for name in columns
+        ])
+
+    def __repr__(self):
+        return f"DatasetHandle({self.name!r}, rows={self.rows}, columns={len(self.columns)})"
+
+def ingest_csv(source, name=None, store_dir=None, file_format="feather",
+               category_max_ratio=CATEGORY_MAX_RATIO, float32=True):
+    """Lee un CSV con el lector de Arrow, reduce tipos y lo guarda en disco.
+
+    source es una ruta o un objeto tipo archivo (por ejemplo, el que
+    retorna st.file_uploader). El archivo se guarda con nombre según el
+    hash de su contenido, así que volver a subir el mismo CSV reutiliza la
+    versión ya convertida. Retorna un DatasetHandle con el reporte de
+    tiempo de carga y memoria.
+    """
+    pa, _, csv, feather, _, pq = _load_arrow()
+    if file_format not in ("feather", "parquet"):
+        raise ValueError(f"Formato no soportado: {file_format}")
+    store_dir = store_dir or default_store_dir()
+    os.makedirs(store_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    if isinstance(source, (str, os.PathLike)):
+        name = name or os.path.basename(source)
+        with open(source, "rb") as f:
+            data = f.read()
+    else:
+        name = name or getattr(source, "name", "dataset.csv")
+        data = source.getvalue() if hasattr(source, "getvalue") else source.read()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    # "-f32tol": los archivos "-f32" anteriores pasaban todo float64 a float32
+    suffix = "-f32tol" if float32 else ""
+    path = os.path.join(store_dir, f"{digest}{suffix}.{file_format}")
+
+    if os.path.exists(path):
+        handle = _open_existing(path, name, len(data))
+        handle.report["reused"] = True
+        handle.report["load_seconds"] = time.perf_counter() - start
+        return handle
+
+    table = csv.read_csv(pa.py_buffer(data))
+    parse_seconds = time.perf_counter() - start
+    original_bytes = table.nbytes
+    table, changes = downcast_table(table, category_max_ratio, float32)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if file_format == "feather":
+        # Sin compresión para poder mapear el archivo y leerlo sin copias
+        feather.write_feather(table, tmp_path, compression="uncompressed", chunksize=FEATHER_BATCH_ROWS)
+    else:
+        pq.write_table(table, tmp_path, row_group_size=FEATHER_BATCH_ROWS)
+    os.replace(tmp_path, path)
+
+    report = {
+        "source_bytes": len(data),
+        "arrow_bytes_before": original_bytes,
+        "arrow_bytes": table.nbytes,
+        "file_bytes": os.path.getsize(path),
+        "parse_seconds": parse_seconds,
+        "load_seconds": time.perf_counter() - start,
+        "downcast": changes,
+        "reused": False,
+    }
+    return DatasetHandle(path, name, table.num_rows, table.column_names, report)
+
+def _open_existing(path, name, source_bytes):
+    pa, _, _, _, ipc, pq = _load_arrow()
+    if path.endswith(".parquet"):
+        metadata = pq.ParquetFile(path).metadata
+        rows, columns = metadata.num_rows, metadata.schema.names
+        arrow_bytes = None
+    else:
+        table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+        rows, columns, arrow_bytes = table.num_rows, table.column_names, table.nbytes
+    report = {
+        "source_bytes": source_bytes,
+        "arrow_bytes": arrow_bytes,
+        "file_bytes": os.path.getsize(path),
+        "downcast": {},
+    }
+    return DatasetHandle(path, name, rows, columns, report)
@@ -4,46 +4,78 @@ from streamlit_elements import elements, mui, html
 from streamlit_card import card
 import hydralit_components as hc
 import time
+import re
+import functools
+from html import escape as escape_html
+import json
+import metrics
+import message_store
+import streamlit.components.v1 as components
 
-def set_custom_style():
-    """Configura los estilos personalizados de la interfaz"""
-    # Detectar el tema actual
-    is_dark_theme = st.get_option("theme.base") == "dark"
-    
-    # Colores base según el tema
-    colors = {
-        "light": {
-            "bg": "#ffffff",
-            "text": "#1e293b",
-            "primary": "#6366f1",
-            "secondary": "#8b5cf6",
-            "accent": "#3b82f6",
-            "surface": "#f8fafc",
-            "border": "#e2e8f0",
-            "hover": "#f1f5f9"
-        },
-        "dark": {
-            "bg": "#0f172a",
-            "text": "#e2e8f0",
-            "primary": "#818cf8",
-            "secondary": "#a78bfa",
-            "accent": "#60a5fa",
-            "surface": "#1e293b",
-            "border": "#334155",
-            "hover": "#1e293b"
-        }
+# Colores base según el tema
+THEME_COLORS = {
+    "light": {
+        "bg": "#ffffff",
+        "text": "#1e293b",
+        "primary": "#6366f1",
+        "secondary": "#8b5cf6",
+        "accent": "#3b82f6",
+        "surface": "#f8fafc",
+        "border": "#e2e8f0",
+        "hover": "#f1f5f9"
+    },
+    "dark": {
+        "bg": "#0f172a",
+        "text": "#e2e8f0",
+        "primary": "#818cf8",
+        "secondary": "#a78bfa",
+        "accent": "#60a5fa",
+        "surface": "#1e293b",
+        "border": "#334155",
+        "hover": "#1e293b"
     }
-    
-    theme = colors["dark"] if is_dark_theme else colors["light"]
-    
-    st.markdown(f"""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-        @import url('https://fonts.googleapis.com/css2?family=JetBrains+Mono:wght@400;500&display=swap');
+}
+
+# Fuentes servidas como archivos estáticos de la app (static/fonts, con
+# server.enableStaticServing). Si no están, se usa la fuente instalada o la
+# del sistema, sin bloquear el primer pintado ni depender de internet.
+FONT_FACES = """
+        @font-face {
+            font-family: 'Inter';
+            font-style: normal;
+            font-weight: 400 700;
+            font-display: swap;
+            src: local('Inter'), url('app/static/fonts/Inter.woff2') format('woff2');
+        }
         
+        @font-face {
+            font-family: 'JetBrains Mono';
+            font-style: normal;
+            font-weight: 400 500;
+            font-display: swap;
+            src: local('JetBrains Mono'), url('app/static/fonts/JetBrainsMono.woff2') format('woff2');
+        }
+"""
+
+_CSS_COMMENTS = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_SPACES = re.compile(r"\s+")
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+
+def minify_css(css):
+    """Quita comentarios y espacios innecesarios de una hoja de estilos"""
+    css = _CSS_COMMENTS.sub("", css)
+    css = _CSS_SPACES.sub(" ", css)
+    css = _CSS_PUNCTUATION.sub(r"\1", css)
+    return css.replace(";}", "}").replace(": ", ":").strip()
+
+def render_stylesheet(theme_name):
+    """Genera la hoja de estilos completa (sin minificar) de un tema"""
+    theme = THEME_COLORS[theme_name]
+    is_dark_theme = theme_name == "dark"
+    return FONT_FACES + f"""
         /* Estilos generales */
         .stApp {{
-            font-family: 'Inter', sans-serif;
+            font-family: 'Inter', system-ui, -apple-system, 'Segoe UI', sans-serif;
             background-color: {theme["bg"]};
             color: {theme["text"]};
         }}
@@ -185,7 +217,7 @@ def set_custom_style():
             padding: 1rem;
             border-radius: 0.5rem;
             border: 1px solid {theme["border"]};
-            font-family: 'JetBrains Mono', monospace;
+            font-family: 'JetBrains Mono', ui-monospace, SFMono-Regular, Menlo, monospace;
             margin: 1rem 0;
             position: relative;
         }}
@@ -201,8 +233,42 @@ def set_custom_style():
             color: {theme["secondary"]};
             text-decoration: underline;
         }}
-        </style>
-    """, unsafe_allow_html=True)
+"""
+
+@functools.lru_cache(maxsize=None)
+def build_stylesheet(theme_name):
+    """Hoja de estilos minificada de un tema, generada una vez por proceso"""
+    return minify_css(render_stylesheet(theme_name))
+
+@functools.lru_cache(maxsize=None)
+def stylesheet_payload(theme_name):
+    """HTML que instala la hoja de estilos en el documento de la app.
+
+    Se inyecta en el <head> de la página principal, donde sobrevive a los
+    reruns aunque el iframe del componente desaparezca, así que basta con
+    enviarlo una vez por sesión y cada vez que cambie el tema.
+    """
+    return f"""<script>
+const doc = window.parent.document;
+let style = doc.getElementById("victoria-theme");
+if (!style) {{
+    style = doc.createElement("style");
+    style.id = "victoria-theme";
+    doc.head.appendChild(style);
+}}
+style.textContent = {json.dumps(build_stylesheet(theme_name))};
+</script>"""
+
+def set_custom_style():
+    """Configura los estilos personalizados de la interfaz"""
+    # Detectar el tema actual
+    theme_name = "dark" if st.get_option("theme.base") == "dark" else "light"
+
+    # Solo reenviar los estilos si la sesión aún no tiene los de este tema
+    if st.session_state.get("_style_theme") == theme_name:
+        return
+    components.html(stylesheet_payload(theme_name), height=0)
+    st.session_state["_style_theme"] = theme_name
 
 def show_sidebar():
     """Muestra la barra lateral con información sobre VictorIA"""
@@ -369,22 +435,244 @@ def show_capabilities():
                         ]
                     )
 
-def format_code_blocks(text):
-    """Formatea los bloques de código con sintaxis resaltada"""
-    import re
-    code_blocks = re.finditer(r'```(?:python)?(.*?)```', text, re.DOTALL)
-    formatted_text = text
-    
-    for block in code_blocks:
-        code = block.group(1).strip()
-        formatted_code = f"""
+CODE_FENCE = "```"
+# Etiqueta de lenguaje tras el fence de apertura (python, js, c++, c#, ...)
+_LANGUAGE_TAG = re.compile(r"[\w+#.-]*")
+
+def _code_block_html(block):
+    return _escaped_block_html(escape_html(block, quote=False))
+
+def _escaped_block_html(block):
+    # Recibe el bloque ya escapado: el escape es carácter a carácter y no
+    # toca saltos de línea, espacios ni la etiqueta de lenguaje.
+    # La primera línea del bloque es la etiqueta de lenguaje; sin salto de
+    # línea el bloque completo es código en línea
+    language = ""
+    head, newline, body = block.partition("\n")
+    if newline and _LANGUAGE_TAG.fullmatch(head.strip()):
+        language, block = head.strip(), body
+    code = block.strip()
+    return f"""
         <div class="code-block">
-            <pre><code class="python">{code}</code></pre>
+            <pre><code class="{escape_html(language or 'python')}">{code}</code></pre>
         </div>
         """
-        formatted_text = formatted_text.replace(block.group(0), formatted_code)
-    
-    return formatted_text
+
+class CodeBlockFormatter:
+    """Formatea bloques de código en una sola pasada, fragmento a fragmento.
+
+    Guarda el estado entre fragmentos (si hay un bloque abierto y los
+    backticks que quedaron al final del último fragmento), así que cada
+    fragmento nuevo se recorre una sola vez sin volver al inicio del texto.
+    """
+
+    def __init__(self):
+        self._done = []
+        self._segment = []
+        # Versión escapada del bloque abierto, para repintarlo sin re-escaparlo
+        self._escaped = []
+        self._carry = ""
+        self.in_code = False
+
+    def feed(self, chunk):
+        """Procesa un fragmento nuevo del texto"""
+        text = self._carry + chunk if self._carry else chunk
+        self._carry = ""
+        pos = 0
+        while True:
+            fence = text.find(CODE_FENCE, pos)
+            if fence == -1:
+                break
+            self._segment.append(text[pos:fence])
+            self._close_segment()
+            pos = fence + len(CODE_FENCE)
+
+        rest = text[pos:]
+        # Los backticks finales pueden completar un fence con el próximo fragmento
+        trimmed = rest.rstrip("`")
+        if len(trimmed) != len(rest):
+            self._carry = rest[len(trimmed):]
+            rest = trimmed
+        if rest:
+            self._segment.append(rest)
+            if self.in_code:
+                self._escaped.append(escape_html(rest, quote=False))
+        return self
+
+    def render(self, partial=False):
+        """Retorna el HTML del texto procesado hasta ahora.
+
+        Con partial=True un bloque que sigue abierto (respuesta a medio
+        streaming) se muestra como bloque de código; si no, se deja como
+        texto, igual que un fence sin cerrar en el texto final.
+        """
+        pending = "".join(self._segment)
+        if not self.in_code:
+            tail = pending + self._carry
+        elif partial:
+            tail = _escaped_block_html("".join(self._escaped))
+        else:
+            tail = CODE_FENCE + pending + self._carry
+        return "".join(self._done) + tail
+
+    def _close_segment(self):
+        segment = "".join(self._segment)
+        self._segment = []
+        self._escaped = []
+        self._done.append(_code_block_html(segment) if self.in_code else segment)
+        self.in_code = not self.in_code
+
+def format_code_blocks(text, partial=False):
+    """Formatea los bloques de código con sintaxis resaltada"""
+    if CODE_FENCE not in text:
+        return text
+    return CodeBlockFormatter().feed(text).render(partial=partial)
+
+class StreamRenderer:
+    """Pinta una respuesta en streaming agrupando fragmentos por tiempo y tamaño.
+
+    Los párrafos ya terminados se congelan en su propio elemento y solo se
+    repinta el párrafo en curso, de modo que cada repintado envía únicamente
+    el texto nuevo. El párrafo en curso tiene su propio CodeBlockFormatter y
+    la búsqueda de fronteras continúa donde quedó, así que cada fragmento se
+    recorre una sola vez aunque un bloque de código largo siga abierto. Al
+    terminar se pinta la respuesta completa con los bloques ya formateados.
+    """
+
+    RESPONSE_TEMPLATE = """
+                            <div style='background-color: #f0f2f6; padding: 1rem; border-radius: 0.5rem; margin: 0.5rem 0;'>
+                                {content}
+                            </div>
+                        """
+    SEGMENT_TEMPLATE = "<div style='background-color: #f0f2f6; padding: 0.25rem 1rem;'>{content}</div>"
+
+    # Fronteras de párrafo y delimitadores de bloques de código
+    _BOUNDARY = re.compile(r"```|\n\n")
+
+    def __init__(self, container, flush_interval=0.08, flush_chunks=24):
+        self.container = container
+        self.flush_interval = flush_interval
+        self.flush_chunks = flush_chunks
+        self._root = None
+        self._slot = None
+        self._segments = []
+        self._formatted = []
+        self._tail = ""
+        self._fresh = []
+        self._formatter = CodeBlockFormatter()
+        # Estado de la búsqueda de fronteras dentro de _tail
+        self._scan_pos = 0
+        self._in_code = False
+        self._cut = 0
+        self._pending = 0
+        self._last_flush = time.perf_counter()
+        self.chunks = 0
+        self.renders = 0
+        self.render_time = 0.0
+        self._started = self._last_flush
+        self.first_chunk_time = None
+
+    def append(self, content):
+        """Acumula un fragmento y repinta solo si toca según la política de lotes"""
+        if not content:
+            return
+        if self.first_chunk_time is None:
+            self.first_chunk_time = time.perf_counter() - self._started
+        self._fresh.append(content)
+        self.chunks += 1
+        self._pending += 1
+        if (self._pending >= self.flush_chunks
+                or time.perf_counter() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def text(self):
+        """Retorna el texto acumulado hasta el momento"""
+        return "".join(self._segments) + self._tail + "".join(self._fresh)
+
+    def flush(self):
+        """Repinta el párrafo en curso y congela los párrafos ya completos"""
+        if not self._pending:
+            return
+        start = time.perf_counter()
+        if self._root is None:
+            self._root = self.container.container()
+            self._slot = self._root.empty()
+
+        self._take_fresh()
+        if self._cut:
+            cut = self._cut
+            done, self._tail = self._tail[:cut], self._tail[cut:]
+            # Un corte nunca cae dentro de un bloque: el segmento se formatea una vez
+            self._render_segment(format_code_blocks(done))
+            self._segments.append(done)
+            self._slot = self._root.empty()
+            self._scan_pos -= cut
+            self._cut = 0
+            # Solo el texto posterior al último corte se vuelve a formatear
+            self._formatter = CodeBlockFormatter().feed(self._tail)
+        if self._tail:
+            self._render_segment(self._formatter.render(partial=True), frozen=False)
+
+        self._pending = 0
+        self._last_flush = time.perf_counter()
+        self.render_time += self._last_flush - start
+
+    def finish(self):
+        """Pinta la respuesta completa en un único elemento y retorna el texto"""
+        start = time.perf_counter()
+        self._take_fresh()
+        text = "".join(self._segments) + self._tail
+        if not text:
+            return text
+        content = "".join(self._formatted) + self._formatter.render()
+        self.container.markdown(
+            self.RESPONSE_TEMPLATE.format(content=content), unsafe_allow_html=True
+        )
+        self.renders += 1
+        self._pending = 0
+        self.render_time += time.perf_counter() - start
+        return text
+
+    def stats(self):
+        """Retorna cuántos repintados se hicieron y cuántos se ahorraron"""
+        return {
+            "chunks": self.chunks,
+            "renders": self.renders,
+            "renders_saved": max(self.chunks - self.renders, 0),
+            "segments": len(self._segments),
+            "render_time": self.render_time,
+            "time_to_first_chunk": self.first_chunk_time,
+        }
+
+    def _take_fresh(self):
+        # Pasa los fragmentos nuevos al párrafo en curso, a su formateador y a
+        # la búsqueda del último corte
+        if not self._fresh:
+            return
+        fresh = "".join(self._fresh)
+        self._fresh = []
+        self._tail += fresh
+        self._formatter.feed(fresh)
+        self._scan()
+
+    def _render_segment(self, content, frozen=True):
+        self._slot.markdown(self.SEGMENT_TEMPLATE.format(content=content), unsafe_allow_html=True)
+        if frozen:
+            self._formatted.append(content)
+        self.renders += 1
+
+    def _scan(self):
+        # Última frontera de párrafo que no cae dentro de un bloque de código.
+        # Se retoma desde el final del último match; los dos últimos caracteres
+        # se revisan de nuevo por si son el inicio de un ``` incompleto
+        text = self._tail
+        for match in self._BOUNDARY.finditer(text, self._scan_pos):
+            if match.group() == CODE_FENCE:
+                self._in_code = not self._in_code
+            elif not self._in_code:
+                self._cut = match.end()
+            self._scan_pos = match.end()
+        self._scan_pos = max(self._scan_pos, len(text) - 2)
 
 def show_header():
     """Muestra el encabezado principal de la aplicación"""
@@ -404,41 +692,138 @@ def init_page():
     # La configuración de página se ha movido al archivo principal
     set_custom_style()
 
-def show_chat_message(role, content, avatar=None):
-    """Muestra un mensaje individual del chat con estilo mejorado"""
-    with st.chat_message(role, avatar=avatar):
-        message_class = "user" if role == "user" else "assistant"
-        st.markdown(f"""
+# Turnos del historial que se muestran de entrada y por cada "cargar anteriores"
+HISTORY_PAGE_SIZE = 20
+
+@functools.lru_cache(maxsize=4096)
+def message_html(role, content):
+    """Retorna el HTML de un mensaje, memoizado por rol y contenido.
+
+    Los str de Python guardan su hash, así que en cada rerun los mensajes
+    viejos se resuelven sin volver a formatear ni a recorrer el texto.
+    """
+    message_class = "user" if role == "user" else "assistant"
+    return f"""
             <div class='chat-message {message_class} animate-slide-in'>
                 {format_code_blocks(content) if role == "assistant" else content}
             </div>
-        """, unsafe_allow_html=True)
+        """
+
+def show_chat_message(role, content, avatar=None):
+    """Muestra un mensaje individual del chat con estilo mejorado"""
+    with st.chat_message(role, avatar=avatar):
+        st.markdown(message_html(role, content), unsafe_allow_html=True)
+
+def _load_earlier_messages():
+    st.session_state.history_window += HISTORY_PAGE_SIZE
+
+def show_chat_history(messages, window):
+    """Muestra solo los últimos `window` mensajes del historial"""
+    with metrics.histogram(metrics.HISTORY_RENDER_SECONDS, "Render del historial por rerun").time():
+        hidden = max(len(messages) - window, 0)
+        if hidden:
+            st.button(
+                f"⬆️ Cargar mensajes anteriores ({hidden})",
+                key="load_earlier_messages",
+                on_click=_load_earlier_messages
+            )
+        for message in messages[hidden:]:
+            show_chat_message(
+                role=message["role"],
+                content=message["content"],
+                avatar="🤖" if message["role"] == "assistant" else None
+            )
+
+def show_metrics_panel(registry):
+    """Panel de administración en la barra lateral con los p95 en vivo"""
+    def fmt(value, unit):
+        return "–" if value is None else f"{value * unit:.1f}"
+
+    summary = registry.summary()
+    with st.sidebar.expander("📊 Métricas", expanded=False):
+        rows = []
+        for name, values in sorted(summary.items()):
+            if "count" not in values:
+                continue
+            # Los histogramas de tokens y bytes no son tiempos
+            unit = 1 if name.endswith(("_tokens", "_bytes")) else 1000
+            rows.append(
+                f"| {name.replace('victoria_', '')} | {values['count']} "
+                f"| {fmt(values['p50'], unit)} | {fmt(values['p95'], unit)} |"
+            )
+        if rows:
+            st.markdown("\n".join(["| Métrica | n | p50 | p95 |", "|---|---:|---:|---:|", *rows]))
+            st.caption("Tiempos en ms, tokens y bytes en unidades")
+        else:
+            st.caption("Aún no hay mediciones")
+        for name, values in sorted(summary.items()):
+            if "count" in values:
+                continue
+            for labels, value in sorted(values.items()):
+                label = ", ".join(f"{k}={v}" for k, v in labels) or "total"
+                st.caption(f"{name.replace('victoria_', '')} ({label}): {value}")
+
+def show_dataset_panel():
+    """Carga de CSV en la barra lateral.
+
+    Cada archivo se ingiere una sola vez por sesión (por su file_id) y en
+    st.session_state solo queda el DatasetHandle, no un DataFrame.
+    """
+    import data_ingestion
+
+    if "datasets" not in st.session_state:
+        st.session_state.datasets = {}
+    datasets = st.session_state.datasets
+
+    with st.sidebar.expander("📁 Datos", expanded=False):
+        uploaded = st.file_uploader("Sube un CSV", type=["csv"], key="dataset_upload")
+        if uploaded is not None and uploaded.file_id not in datasets:
+            try:
+                with st.spinner("Procesando datos..."):
+                    datasets[uploaded.file_id] = data_ingestion.ingest_csv(uploaded, name=uploaded.name)
+            except Exception as e:
+                st.error(f"No se pudo cargar el archivo: {str(e)}")
+        for handle in datasets.values():
+            report = handle.report
+            arrow_mb = (report.get("arrow_bytes") or 0) / 2 ** 20
+            st.markdown(f"**{escape_html(handle.name)}**: {handle.rows:,} filas x {len(handle.columns)} columnas")
+            st.caption(
+                f"Carga {report['load_seconds'] * 1000:.0f} ms | "
+                f"memoria {arrow_mb:.1f} MB (CSV {report['source_bytes'] / 2 ** 20:.1f} MB)"
+                + (" | ya procesado" if report.get("reused") else "")
+            )
 
 def show_chat_interface(chatbot):
     """Muestra la interfaz del chat"""
+    if "history_window" not in st.session_state:
+        st.session_state.history_window = HISTORY_PAGE_SIZE
+
     # Contenedor para el historial de chat
     chat_container = st.container()
     
     with chat_container:
         st.markdown('<div class="chat-history">', unsafe_allow_html=True)
-        # Mostrar historial
-        for message in st.session_state.messages:
-            show_chat_message(
-                role=message["role"],
-                content=message["content"],
-                avatar="🤖" if message["role"] == "assistant" else None
-            )
+        # Mostrar historial (ventana con los turnos más recientes)
+        show_chat_history(st.session_state.messages, st.session_state.history_window)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Input del usuario con estilo mejorado
     if prompt := st.chat_input("¿En qué puedo ayudarte con tu análisis de datos? 💭"):
         # Agregar mensaje del usuario
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        st.session_state.messages.append("user", prompt)
         show_chat_message("user", prompt)
 
-        # Generar respuesta
-        response = chatbot.generate_response(prompt)
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        # Validar como la API antes de llamar al modelo (también mide la
+        # validación en las métricas del panel)
+        is_valid, error = chatbot.validate_request(prompt)
+        if is_valid:
+            response = chatbot.generate_response(prompt)
+        else:
+            response = f"⚠️ {error}"
+            show_chat_message("assistant", response)
+        st.session_state.messages.append("assistant", response)
+        # Pregunta y respuesta se guardan en disco en una sola escritura
+        st.session_state.messages.flush()
 
 def main():
     # Inicializar la configuración de página
@@ -460,7 +845,7 @@ def main():
         st.session_state.chatbot = VictoriaChatbot()
     
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        st.session_state.messages = message_store.open_session()
     
     # Mostrar interfaz de chat (siempre visible)
     show_chat_interface(st.session_state.chatbot)
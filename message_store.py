@@ -0,0 +1,297 @@
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+import metrics
+
+# Mensajes recientes de cada sesión que se guardan en memoria; los
+# anteriores se leen de SQLite solo si el usuario pide verlos
+HOT_MESSAGES = 40
+# Mensajes pendientes que fuerzan una escritura aunque no termine el turno
+WRITE_BATCH = 16
+# Límites de los buckets de memoria por sesión, de 1 KB a 16 MB
+BYTE_BUCKETS = tuple(2 ** power for power in range(10, 25))
+# Días sin mensajes nuevos tras los que se borra una sesión guardada
+MESSAGES_TTL_DAYS = 30
+
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+class Message:
+    """Mensaje del chat con los campos justos y sin __dict__.
+
+    Admite message["role"] y message["content"] como los dicts que
+    reemplaza.
+    """
+
+    __slots__ = ("seq", "role", "content", "created_at")
+
+    def __init__(self, seq, role, content, created_at):
+        self.seq = seq
+        # Solo hay dos roles: todas las sesiones comparten el mismo str
+        self.role = sys.intern(role)
+        self.content = content
+        self.created_at = created_at
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def as_dict(self):
+        return {"role": self.role, "content": self.content}
+
+    def __repr__(self):
+        return f"Message({self.seq}, {self.role!r}, {self.content[:30]!r})"
+
+class MessageDatabase:
+    """Archivo SQLite (modo WAL) con los mensajes de todas las sesiones.
+
+    Una conexión por proceso protegida con un candado; WAL deja que los
+    demás workers lean mientras uno escribe. El seq de cada mensaje se
+    asigna dentro de la transacción que lo guarda, así que dos stores de la
+    misma sesión (dos pestañas o dos workers) nunca pisan sus filas.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # En WAL, NORMAL solo arriesga la última transacción ante un corte de luz
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " session TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL,"
+            " content TEXT NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (session, seq)) WITHOUT ROWID"
+        )
+        self._db.commit()
+
+    def append(self, session, messages):
+        """Guarda mensajes al final de la sesión en una transacción.
+
+        Retorna el seq asignado al primero: el siguiente al último guardado,
+        que puede no ser el que esperaba el store si otro escribió antes.
+        """
+        with self._lock:
+            # IMMEDIATE toma el candado de escritura antes de leer MAX(seq)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT MAX(seq) FROM messages WHERE session = ?", (session,)
+                ).fetchone()
+                first = 0 if row[0] is None else row[0] + 1
+                self._db.executemany(
+                    "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                    [(session, first + i, m.role, m.content, m.created_at) for i, m in enumerate(messages)]
+                )
+            except BaseException:
+                self._db.rollback()
+                raise
+            self._db.commit()
+        return first
+
+    def read(self, session, start, stop):
+        """Mensajes con seq en [start, stop), en orden"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, role, content, created_at FROM messages"
+                " WHERE session = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session, start, stop)
+            ).fetchall()
+        return [Message(*row) for row in rows]
+
+    def count(self, session):
+        """Cantidad de mensajes guardados de la sesión"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MAX(seq) FROM messages WHERE session = ?", (session,)
+            ).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def delete(self, session):
+        """Borra los mensajes de la sesión"""
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE session = ?", (session,))
+            self._db.commit()
+
+    def purge(self, max_age):
+        """Borra las sesiones sin mensajes nuevos en max_age segundos; retorna cuántas"""
+        cutoff = time.time() - max_age
+        with self._lock:
+            expired = [row[0] for row in self._db.execute(
+                "SELECT session FROM messages GROUP BY session HAVING MAX(created_at) < ?", (cutoff,)
+            )]
+            self._db.executemany("DELETE FROM messages WHERE session = ?", [(s,) for s in expired])
+            self._db.commit()
+        return len(expired)
+
+class SessionMessageStore:
+    """Historial de una sesión: ventana caliente en memoria y el resto en SQLite.
+
+    Se usa como la lista de mensajes que reemplaza (len, índices y slices),
+    así que show_chat_history no distingue de dónde vienen. Los mensajes
+    nuevos se escriben por lotes: al terminar cada turno (flush), al juntar
+    WRITE_BATCH pendientes o antes de salir de la ventana. Sin base de datos
+    no hay dónde dejar los viejos, así que todo el historial queda en memoria
+    y len() solo cuenta mensajes que se pueden mostrar.
+    """
+
+    def __init__(self, session_id=None, db=None, hot_size=None, write_batch=WRITE_BATCH):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.db = db
+        self.hot_size = hot_size or int(os.getenv("VICTORIA_HOT_MESSAGES", str(HOT_MESSAGES)))
+        self.write_batch = write_batch
+        self._hot = deque()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._count = 0
+        self.resumed = False
+        if db is not None:
+            self._count = db.count(self.session_id)
+            if self._count:
+                self._hot.extend(db.read(self.session_id, max(0, self._count - self.hot_size), self._count))
+                self.resumed = True
+
+    def append(self, role, content):
+        """Agrega un mensaje al final del historial"""
+        with self._lock:
+            message = Message(self._count, role, content, time.time())
+            self._count += 1
+            self._hot.append(message)
+            if self.db is not None:
+                self._pending.append(message)
+                if len(self._pending) >= self.write_batch:
+                    self._flush_locked()
+            while self.db is not None and len(self._hot) > self.hot_size:
+                if self._pending and self._pending[0].seq <= self._hot[0].seq:
+                    # No sacar de memoria un mensaje que aún no está en disco;
+                    # si el flush recargó la ventana se vuelve a medir
+                    self._flush_locked()
+                    continue
+                self._hot.popleft()
+        return message
+
+    def flush(self):
+        """Escribe en SQLite los mensajes pendientes en una transacción"""
+        with self._lock:
+            self._flush_locked()
+        metrics.histogram(metrics.SESSION_MEMORY_BYTES, "Memoria del historial por sesión", BYTE_BUCKETS).observe(
+            self.memory_bytes()
+        )
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        expected = self._pending[0].seq
+        first = self.db.append(self.session_id, self._pending)
+        self._pending = []
+        if first != expected:
+            # Otra pestaña o worker escribió en la misma sesión: los mensajes
+            # quedaron después de los suyos, así que se recarga la ventana
+            self._count = self.db.count(self.session_id)
+            self._hot = deque(self.db.read(self.session_id, max(0, self._count - self.hot_size), self._count))
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._count)
+            return self._range(start, stop)[::step]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("índice de mensaje fuera de rango")
+        return self._range(index, index + 1)[0]
+
+    def __iter__(self):
+        return iter(self._range(0, self._count))
+
+    def _range(self, start, stop):
+        with self._lock:
+            hot = list(self._hot)
+        hot_start = hot[0].seq if hot else self._count
+        if start >= stop:
+            return []
+        cold = []
+        if start < hot_start:
+            # Sin disco la ventana tiene todo el historial y hot_start es 0
+            cold = self.db.read(self.session_id, start, min(stop, hot_start))
+        return cold + hot[max(0, start - hot_start):max(0, stop - hot_start)]
+
+    def tail(self, count):
+        """Los últimos count mensajes"""
+        return self[max(0, self._count - count):]
+
+    def clear(self):
+        """Olvida el historial, también el guardado en disco"""
+        with self._lock:
+            self._hot.clear()
+            self._pending = []
+            self._count = 0
+            if self.db is not None:
+                self.db.delete(self.session_id)
+
+    def memory_bytes(self):
+        """Bytes aproximados que ocupa el historial en memoria"""
+        with self._lock:
+            messages = list(self._hot)
+        total = sys.getsizeof(self._hot) + sys.getsizeof(self._pending)
+        for message in messages:
+            # Los roles internados no se cuentan: los comparten todas las sesiones
+            total += sys.getsizeof(message) + sys.getsizeof(message.content)
+        return total
+
+    def stats(self):
+        """Mensajes totales, en memoria, solo en disco y bytes en memoria"""
+        return {
+            "session_id": self.session_id,
+            "messages": self._count,
+            "hot": len(self._hot),
+            "spilled": self._count - len(self._hot),
+            "pending": len(self._pending),
+            "memory_bytes": self.memory_bytes(),
+            "resumed": self.resumed,
+        }
+
+_shared_db = None
+_shared_db_lock = threading.Lock()
+
+def get_message_db():
+    """Retorna la base de mensajes del proceso, o None si está desactivada.
+
+    Guardar las conversaciones es opcional: solo se activa con
+    VICTORIA_MESSAGES_DB (ruta del archivo SQLite). Todos los workers que
+    apunten al mismo archivo comparten los historiales. Al abrirla se borran
+    las sesiones sin actividad en VICTORIA_MESSAGES_TTL_DAYS días (por
+    defecto 30; 0 las conserva).
+    """
+    global _shared_db
+    path = os.getenv("VICTORIA_MESSAGES_DB")
+    if not path:
+        return None
+    with _shared_db_lock:
+        if _shared_db is None:
+            _shared_db = MessageDatabase(path)
+            ttl_days = float(os.getenv("VICTORIA_MESSAGES_TTL_DAYS", str(MESSAGES_TTL_DAYS)))
+            if ttl_days > 0:
+                _shared_db.purge(ttl_days * 86400)
+    return _shared_db
+
+def open_session(session_id=None, hot_size=None):
+    """Abre el historial de una sesión, retomándolo si ya existe en disco.
+
+    Un session_id que no sea un uuid en hexadecimal se ignora y se crea una
+    sesión nueva. Quien conozca el id puede leer la conversación, así que
+    no debe compartirse.
+    """
+    if session_id is not None and not _SESSION_ID.fullmatch(session_id):
+        session_id = None
+    return SessionMessageStore(session_id, get_message_db(), hot_size)
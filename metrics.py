@@ -0,0 +1,284 @@
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites de los buckets en segundos, de 0.1 ms a 2 min en pasos ~x2
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{name}="{value}"' for name, value in labels)
+    return "{" + inner + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Histograma de buckets fijos: observar cuesta un bisect y una suma.
+
+    Los percentiles se estiman interpolando dentro del bucket, igual que
+    histogram_quantile de Prometheus, así que no se guardan las muestras.
+    """
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self):
+        """Context manager que observa la duración del bloque"""
+        return _Timer(self)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def sum(self):
+        return self._sum
+
+    def percentile(self, p):
+        """Estima el percentil p (0-100); None si no hay observaciones"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+        if not total:
+            return None
+        rank = p / 100 * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    # Por encima del último límite no hay con qué interpolar
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, total_sum = self._count, self._sum
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {total}')
+        lines.append(f"{self.name}_sum {_format_value(total_sum)}")
+        lines.append(f"{self.name}_count {total}")
+        return lines
+
+class Counter:
+    """Contador monotónico, opcionalmente con etiquetas"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class MetricsRegistry:
+    """Registro en memoria de las métricas del proceso"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text="", buckets=LATENCY_BUCKETS):
+        """Retorna el histograma con ese nombre, creándolo si no existe"""
+        return self._get_or_create(name, lambda: Histogram(name, help_text, buckets))
+
+    def counter(self, name, help_text=""):
+        """Retorna el contador con ese nombre, creándolo si no existe"""
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def _get_or_create(self, name, factory):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = factory()
+        return metric
+
+    def metrics(self):
+        return list(self._metrics.values())
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Percentiles de cada histograma y valores de cada contador"""
+        result = {}
+        for metric in self.metrics():
+            if isinstance(metric, Histogram):
+                result[metric.name] = {"count": metric.count, **{
+                    f"p{p}": metric.percentile(p) for p in percentiles
+                }}
+            else:
+                result[metric.name] = metric.values()
+        return result
+
+    def render_prometheus(self):
+        """Exporta todas las métricas en el formato de texto de Prometheus"""
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda m: m.name):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+_registry = MetricsRegistry()
+
+def get_registry():
+    """Retorna el registro de métricas compartido por el proceso"""
+    return _registry
+
+# Métricas de un turno de chat
+VALIDATION_SECONDS = "victoria_validation_seconds"
+FIRST_CHUNK_SECONDS = "victoria_time_to_first_chunk_seconds"
+CHUNK_GAP_SECONDS = "victoria_chunk_gap_seconds"
+STREAM_SECONDS = "victoria_stream_seconds"
+RENDER_SECONDS = "victoria_render_seconds"
+HISTORY_RENDER_SECONDS = "victoria_history_render_seconds"
+PROMPT_TOKENS = "victoria_prompt_tokens"
+COMPLETION_TOKENS = "victoria_completion_tokens"
+RESPONSES_TOTAL = "victoria_responses_total"
+ERRORS_TOTAL = "victoria_errors_total"
+RETRIES_TOTAL = "victoria_upstream_retries_total"
+HEDGED_TOTAL = "victoria_hedged_requests_total"
+COALESCED_TOTAL = "victoria_coalesced_requests_total"
+PROMPT_CACHE_TOKENS = "victoria_prompt_cache_tokens_total"
+FIRST_CHUNK_PREFIX_HIT_SECONDS = "victoria_time_to_first_chunk_prefix_hit_seconds"
+FIRST_CHUNK_PREFIX_MISS_SECONDS = "victoria_time_to_first_chunk_prefix_miss_seconds"
+SESSION_MEMORY_BYTES = "victoria_session_memory_bytes"
+CANCELLED_TOTAL = "victoria_cancelled_streams_total"
+TOKENS_SAVED_TOTAL = "victoria_tokens_saved_total"
+CANCEL_SECONDS = "victoria_cancel_seconds"
+# Métricas por ruta del router (el nombre lleva la ruta: concept, code, general)
+ROUTED_TOTAL = "victoria_routed_requests_total"
+TRUNCATED_TOTAL = "victoria_truncated_responses_total"
+ROUTE_FIRST_CHUNK_SECONDS = "victoria_route_{route}_time_to_first_chunk_seconds"
+ROUTE_STREAM_SECONDS = "victoria_route_{route}_stream_seconds"
+ROUTE_COMPLETION_TOKENS = "victoria_route_{route}_completion_tokens"
+# Métricas de predicción por lotes
+PREDICT_BATCH_SECONDS = "victoria_predict_batch_seconds"
+PREDICTED_ROWS_TOTAL = "victoria_predicted_rows_total"
+
+def histogram(name, help_text="", buckets=LATENCY_BUCKETS):
+    return _registry.histogram(name, help_text, buckets)
+
+def counter(name, help_text=""):
+    return _registry.counter(name, help_text)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = _registry
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        data = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_exporter(port, host="127.0.0.1", registry=None):
+    """Sirve /metrics en formato Prometheus desde un hilo de fondo"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or _registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def write_metrics_file(path, registry=None):
+    """Escribe las métricas en un archivo de forma atómica"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write((registry or _registry).render_prometheus())
+    os.replace(tmp_path, path)
+
+def start_file_exporter(path, interval=15.0, registry=None):
+    """Reescribe el archivo de métricas cada `interval` segundos"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            write_metrics_file(path, registry)
+
+    threading.Thread(target=run, name="metrics-file", daemon=True).start()
+    return stop
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+def start_exporters_from_env():
+    """Arranca los exportadores configurados en el entorno, una vez por proceso.
+
+    VICTORIA_METRICS_PORT sirve /metrics para Prometheus y
+    VICTORIA_METRICS_FILE escribe el mismo texto cada
+    VICTORIA_METRICS_INTERVAL segundos (por defecto 15).
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    port = os.getenv("VICTORIA_METRICS_PORT")
+    if port:
+        start_http_exporter(int(port), os.getenv("VICTORIA_METRICS_HOST", "127.0.0.1"))
+    path = os.getenv("VICTORIA_METRICS_FILE")
+    if path:
+        start_file_exporter(path, float(os.getenv("VICTORIA_METRICS_INTERVAL", "15")))
@@ -0,0 +1,765 @@
+import json
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+try:
+    import resource
+except ImportError:  # Windows: sin pico de RSS en el reporte
+    resource = None
+
+import model_cache
+
+# El stack de ML (pandas, numpy, scikit-learn, xgboost) tarda varios segundos
+# en importarse y la mayoría de sesiones solo chatean, así que se carga bajo
+# demanda la primera vez que se usa MLTools.
+_ml_stack = None
+_ml_stack_lock = threading.Lock()
+_prewarm_thread = None
+
+def load_ml_stack():
+    """Importa el stack de ML una sola vez por proceso y lo retorna"""
+    global _ml_stack
+    if _ml_stack is None:
+        with _ml_stack_lock:
+            if _ml_stack is None:
+                import numpy as np
+                import pandas as pd
+                from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+                from sklearn.model_selection import (
+                    train_test_split, GridSearchCV, HalvingGridSearchCV,
+                    ParameterGrid, cross_val_score
+                )
+                from sklearn.preprocessing import StandardScaler
+                from sklearn.linear_model import LogisticRegression, SGDClassifier, SGDRegressor
+                from sklearn.ensemble import RandomForestClassifier
+                from sklearn.cluster import KMeans, MiniBatchKMeans
+                import xgboost as xgb
+
+                _ml_stack = SimpleNamespace(
+                    np=np,
+                    pd=pd,
+                    train_test_split=train_test_split,
+                    GridSearchCV=GridSearchCV,
+                    HalvingGridSearchCV=HalvingGridSearchCV,
+                    ParameterGrid=ParameterGrid,
+                    cross_val_score=cross_val_score,
+                    StandardScaler=StandardScaler,
+                    LogisticRegression=LogisticRegression,
+                    RandomForestClassifier=RandomForestClassifier,
+                    KMeans=KMeans,
+                    SGDClassifier=SGDClassifier,
+                    SGDRegressor=SGDRegressor,
+                    MiniBatchKMeans=MiniBatchKMeans,
+                    xgb=xgb
+                )
+    return _ml_stack
+
+def prewarm():
+    """Precarga el stack de ML en un hilo de fondo (solo la primera vez)"""
+    global _prewarm_thread
+    with _ml_stack_lock:
+        if _ml_stack is not None or _prewarm_thread is not None:
+            return _prewarm_thread
+        _prewarm_thread = threading.Thread(
+            target=load_ml_stack, name="ml-prewarm", daemon=True
+        )
+        _prewarm_thread.start()
+    return _prewarm_thread
+
+def is_loaded():
+    """Indica si el stack de ML ya fue importado"""
+    return _ml_stack is not None
+
+# Búsqueda por successive halving: cada ronda conserva 1/HALVING_FACTOR de
+# las configuraciones y les da HALVING_FACTOR veces más recursos
+HALVING_FACTOR = 3
+# Rondas de boosting de XGBoost (su valor por defecto) y paciencia del
+# early stopping sobre el conjunto de validación
+XGB_MAX_ROUNDS = 100
+EARLY_STOPPING_ROUNDS = 10
+VALIDATION_SIZE = 0.1
+
+def _candidate_models(ml, task):
+    """Retorna instancias nuevas de los modelos candidatos para la tarea"""
+    models = {
+        'classification': [
+            ('logistic', ml.LogisticRegression()),
+            ('rf', ml.RandomForestClassifier()),
+            ('xgb', ml.xgb.XGBClassifier())
+        ],
+        'regression': [
+            ('xgb', ml.xgb.XGBRegressor())
+        ],
+        'clustering': [
+            ('kmeans', ml.KMeans())
+        ]
+    }
+    return models.get(task, [])
+
+# Modo por bloques (out-of-core): filas por bloque, pasadas sobre el archivo
+# de los modelos incrementales y fracción de filas reservada para evaluar
+STREAM_CHUNK_ROWS = 50_000
+STREAM_EPOCHS = 3
+STREAM_TEST_SIZE = 0.2
+
+def _incremental_models(ml, task):
+    """Modelos que pueden entrenarse bloque a bloque con partial_fit"""
+    models = {
+        'classification': [('sgd', ml.SGDClassifier, {'loss': 'log_loss'})],
+        'regression': [('sgd', ml.SGDRegressor, {})],
+        'clustering': [('minibatch_kmeans', ml.MiniBatchKMeans, {'n_init': 3})],
+    }
+    return models.get(task, [])
+
+def iter_table_chunks(path, chunk_rows=STREAM_CHUNK_ROWS, columns=None):
+    """Lee un CSV, Parquet o Feather por bloques de DataFrames.
+
+    Solo hay en memoria un bloque a la vez. Parquet y Feather requieren
+    pyarrow.
+    """
+    ml = load_ml_stack()
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.pq', '.feather', '.arrow'):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            import pyarrow.ipc as ipc
+        except ImportError as e:
+            raise ImportError("Leer Parquet/Feather por bloques requiere pyarrow (pip install pyarrow)") from e
+        if extension in ('.parquet', '.pq'):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+        else:
+            reader = ipc.open_file(pa.memory_map(path))
+            for index in range(reader.num_record_batches):
+                frame = reader.get_batch(index).to_pandas()
+                yield frame[columns] if columns else frame
+        return
+    yield from ml.pd.read_csv(path, chunksize=chunk_rows, usecols=columns)
+
+class _StreamedDataset:
+    """Archivo tabular recorrido por bloques con un hold-out estable.
+
+    Cada fila va al conjunto de prueba según un generador aleatorio sembrado
+    con el número de bloque, así que todas las pasadas sobre el archivo ven
+    la misma partición sin guardarla en memoria.
+    """
+
+    def __init__(self, ml, path, target, features, chunk_rows, test_size, random_state):
+        self.ml = ml
+        self.path = path
+        self.target = target
+        self.features = features
+        self.chunk_rows = chunk_rows
+        self.test_size = test_size
+        self.random_state = random_state
+        self.rows = 0
+
+    def chunks(self, split):
+        """Genera (X, y) float32 de la partición 'train' o 'test'"""
+        np = self.ml.np
+        rows = 0
+        for index, frame in enumerate(iter_table_chunks(self.path, self.chunk_rows)):
+            rows += len(frame)
+            rng = np.random.default_rng([self.random_state, index])
+            in_test = rng.random(len(frame)) < self.test_size
+            mask = in_test if split == 'test' else ~in_test
+            if not mask.any():
+                continue
+            part = frame[mask]
+            del frame
+            features = self.features or [c for c in part.columns if c != self.target]
+            X = part[features].to_numpy(dtype=np.float32)
+            y = part[self.target].to_numpy() if self.target is not None else None
+            yield X, y
+        self.rows = rows
+
+def _xgb_stream_iter(ml, dataset, scaler, encode, cache_prefix, split):
+    """DataIter de XGBoost que entrega el archivo bloque a bloque"""
+    class ChunkIter(ml.xgb.DataIter):
+        def __init__(self):
+            self._chunks = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._chunks is None:
+                self._chunks = dataset.chunks(split)
+            try:
+                X, y = next(self._chunks)
+            except StopIteration:
+                return 0
+            input_data(data=scaler.transform(X), label=encode(y))
+            return 1
+
+        def reset(self):
+            self._chunks = None
+
+    return ChunkIter()
+
+class _StreamedScore:
+    """Acumula la métrica del hold-out bloque a bloque.
+
+    Usa las mismas métricas que score() de scikit-learn: exactitud en
+    clasificación, R² en regresión y la inercia negativa en clustering.
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self.n = 0
+        self.total = 0.0
+        self.sum_y = 0.0
+        self.sum_y2 = 0.0
+
+    def add(self, y_true, y_pred=None, inertia=None):
+        if self.task == 'classification':
+            self.total += float((y_true == y_pred).sum())
+            self.n += len(y_true)
+        elif self.task == 'regression':
+            y_true = y_true.astype(float)
+            self.total += float(((y_true - y_pred) ** 2).sum())
+            self.sum_y += float(y_true.sum())
+            self.sum_y2 += float((y_true ** 2).sum())
+            self.n += len(y_true)
+        else:
+            self.total -= inertia
+
+    def result(self):
+        if self.task == 'classification':
+            return self.total / self.n if self.n else float('nan')
+        if self.task == 'regression':
+            variance = self.sum_y2 - self.sum_y ** 2 / self.n if self.n else 0.0
+            return 1 - self.total / variance if variance else float('nan')
+        return self.total
+
+def _resolve_model_cache(cache):
+    if cache is True:
+        return model_cache.get_shared_model_cache()
+    return cache or None
+
+def _cached_result(artifacts, key, return_report, train):
+    """Carga el resultado de la caché de artefactos o entrena y lo guarda"""
+    start = time.perf_counter()
+
+    def compute():
+        model, scaler, score, report = train()
+        return model, scaler, score, {**report, "cache": not report.get("timed_out", False)}
+
+    artifact, hit = artifacts.get_or_compute(key, compute)
+    report = {k: v for k, v in artifact["meta"].items() if k != "cache"}
+    if hit:
+        report["wall_time"] = time.perf_counter() - start
+    report["cache_hit"] = hit
+    report["cache_key"] = key
+    result = (artifact["model"], artifact["scaler"], artifact["score"])
+    return (*result, report) if return_report else result
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# tracemalloc es global al proceso: entrenamientos concurrentes desde
+# archivo comparten el rastreo, que se apaga al salir el último solo si lo
+# encendió este módulo, y el pico se reinicia solo sin otro midiendo
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+def _start_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing_started = True
+            tracemalloc.reset_peak()
+        _tracing_users += 1
+
+def _stop_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+# Datos de entrenamiento de cada proceso del pool, enviados una sola vez
+# por proceso en el inicializador en lugar de en cada tarea
+_worker_data = None
+
+def _init_worker(X_train, y_train):
+    global _worker_data
+    _worker_data = (X_train, y_train)
+
+def _run_candidate(task, name, params, cross_validate):
+    """Evalúa un candidato dentro de un proceso del pool.
+
+    Con cross_validate=True retorna la media de la validación cruzada (la
+    misma que usa GridSearchCV); si no, retorna el modelo entrenado con todo
+    el conjunto de entrenamiento.
+    """
+    ml = load_ml_stack()
+    X_train, y_train = _worker_data
+    model = dict(_candidate_models(ml, task))[name]
+    # Un hilo por proceso para no sobresuscribir la CPU
+    if 'n_jobs' in model.get_params() and 'n_jobs' not in params:
+        model.set_params(n_jobs=1)
+    model.set_params(**params)
+
+    start = time.perf_counter()
+    if cross_validate:
+        score = ml.cross_val_score(model, X_train, y_train).mean()
+        return score, None, time.perf_counter() - start
+    model.fit(X_train, y_train)
+    return None, model, time.perf_counter() - start
+
+class MLTools:
+    @staticmethod
+    def auto_ml(X, y, task='classification', custom_params=None, parallel=False,
+                n_jobs=None, time_budget=None, return_report=False, search='grid', cache=True):
+        """Entrena los modelos candidatos y retorna (modelo, scaler, score).
+
+        Con parallel=True los candidatos y los puntos de la grilla de
+        custom_params se evalúan en un pool de procesos (n_jobs, por defecto
+        uno por CPU). time_budget limita el tiempo total en segundos: los
+        candidatos que sigan pendientes o en ejecución al agotarse se
+        cancelan; si no termina ninguno se lanza TimeoutError. Un punto de la
+        grilla que falla cuenta con score NaN, como error_score en
+        GridSearchCV. Con return_report=True se agrega un cuarto elemento con
+        el tiempo de cada candidato.
+
+        search='halving' cambia la búsqueda exhaustiva sobre custom_params por
+        successive halving (sobre muestras, o sobre rondas de boosting en
+        XGBoost) y reentrena el mejor XGBoost con early stopping sobre un
+        conjunto de validación. El reporte incluye el tiempo ahorrado frente
+        a la grilla completa.
+
+        Con cache=True (o una ModelArtifactCache) el resultado se guarda en
+        la caché de artefactos, con clave según el contenido de X e y, la
+        tarea, custom_params y search; una llamada igual posterior lo carga
+        sin reentrenar. Los resultados cortados por time_budget no se
+        guardan.
+        """
+        if search not in ('grid', 'halving'):
+            raise ValueError(f"Estrategia de búsqueda no soportada: {search}")
+        artifacts = _resolve_model_cache(cache)
+        if artifacts is None:
+            result = MLTools._auto_ml(X, y, task, custom_params, parallel, n_jobs, time_budget, search)
+            return result if return_report else result[:3]
+        key = model_cache.make_key(
+            model_cache.fingerprint_arrays(X, y), task,
+            {"custom_params": custom_params, "search": search}
+        )
+        return _cached_result(artifacts, key, return_report, lambda: MLTools._auto_ml(
+            X, y, task, custom_params, parallel, n_jobs, time_budget, search
+        ))
+
+    @staticmethod
+    def predict(model, scaler, X, batch_rows=None, n_threads=None):
+        """Predice X con un resultado de auto_ml usando BatchPredictor.
+
+        Para entradas que no caben en memoria, usar directamente
+        predictor.BatchPredictor con predict_file o predict_iter.
+        """
+        import predictor
+        batch_predictor = predictor.BatchPredictor(
+            model, scaler, batch_rows=batch_rows or predictor.PREDICT_BATCH_ROWS, n_threads=n_threads
+        )
+        return batch_predictor.predict(X)
+
+    @staticmethod
+    def _auto_ml(X, y, task, custom_params, parallel, n_jobs, time_budget, search):
+        ml = load_ml_stack()
+        start = time.perf_counter()
+        deadline = start + time_budget if time_budget else None
+        X_train, X_test, y_train, y_test = ml.train_test_split(X, y, test_size=0.2)
+        scaler = ml.StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+
+        if parallel and search == 'grid':
+            best_model, best_score, report = MLTools._auto_ml_parallel(
+                ml, task, custom_params, X_train_scaled, y_train,
+                X_test_scaled, y_test, n_jobs, deadline
+            )
+        else:
+            # La búsqueda por halving paraleliza sus propios ajustes con joblib
+            best_model, best_score, report = MLTools._auto_ml_serial(
+                ml, task, custom_params, X_train_scaled, y_train,
+                X_test_scaled, y_test, deadline, search,
+                (n_jobs or -1) if parallel else None
+            )
+
+        if best_model is None:
+            if report["timed_out"]:
+                raise TimeoutError(
+                    f"time_budget={time_budget} s se agotó antes de que terminara algún candidato; "
+                    "aumentarlo (con parallel=True incluye el arranque de los procesos) o quitarlo"
+                )
+            errors = [f"{c['model']}: {c['error']}" for c in report["candidates"] if c.get("error")]
+            raise RuntimeError("Ningún candidato pudo entrenarse: " + "; ".join(errors))
+        report["wall_time"] = time.perf_counter() - start
+        return best_model, scaler, best_score, report
+
+    @staticmethod
+    def auto_ml_from_file(path, target=None, task='classification', custom_params=None,
+                          features=None, chunk_rows=STREAM_CHUNK_ROWS, epochs=STREAM_EPOCHS,
+                          test_size=STREAM_TEST_SIZE, random_state=0, return_report=False,
+                          cache=True):
+        """Entrena desde un CSV, Parquet o Feather sin cargarlo completo.
+
+        El archivo se recorre por bloques de chunk_rows filas: el scaler se
+        ajusta con partial_fit, los modelos incrementales (SGD y
+        MiniBatchKMeans) se entrenan en `epochs` pasadas y XGBoost usa un
+        DMatrix en memoria externa con caché en disco. Un hold-out estable de
+        test_size se evalúa también por bloques. custom_params admite listas
+        por parámetro y cada combinación se entrena como un candidato más.
+
+        Retorna (modelo, scaler, score) como auto_ml; el XGBoost ganador se
+        retorna como xgboost.Booster. Con return_report=True se agrega un
+        reporte con el tiempo, las filas y el pico de memoria. cache funciona
+        como en auto_ml, con el contenido del archivo como parte de la clave.
+        """
+        if task != 'clustering' and target is None:
+            raise ValueError("target es obligatorio salvo en clustering")
+        options = dict(target=target, task=task, custom_params=custom_params, features=features,
+                       chunk_rows=chunk_rows, epochs=epochs, test_size=test_size,
+                       random_state=random_state)
+        artifacts = _resolve_model_cache(cache)
+        if artifacts is None:
+            result = MLTools._auto_ml_from_file(path, **options)
+            return result if return_report else result[:3]
+        key = model_cache.make_key(model_cache.fingerprint_file(path), task, options)
+        return _cached_result(artifacts, key, return_report,
+                              lambda: MLTools._auto_ml_from_file(path, **options))
+
+    @staticmethod
+    def _auto_ml_from_file(path, **options):
+        _start_tracing()
+        try:
+            return MLTools._fit_from_file(path, **options)
+        finally:
+            _stop_tracing()
+
+    @staticmethod
+    def _fit_from_file(path, target, task, custom_params, features, chunk_rows, epochs,
+                       test_size, random_state):
+        ml = load_ml_stack()
+        np = ml.np
+        start = time.perf_counter()
+        dataset = _StreamedDataset(ml, path, target, features, chunk_rows, test_size, random_state)
+        report = {"mode": "stream", "chunk_rows": chunk_rows, "epochs": epochs, "candidates": []}
+
+        # Primera pasada: scaler incremental y clases presentes
+        scaler = ml.StandardScaler()
+        classes = set()
+        for X, y in dataset.chunks('train'):
+            scaler.partial_fit(X)
+            if task == 'classification':
+                classes.update(np.unique(y).tolist())
+        classes = np.array(sorted(classes))
+
+        candidates = []
+        for name, factory, defaults in _incremental_models(ml, task):
+            for params in ml.ParameterGrid((custom_params or {}).get(name, {})):
+                model = factory(**{**defaults, 'random_state': random_state, **params})
+                candidates.append((name, params, model))
+
+        # Modelos incrementales: una sola lectura del archivo por pasada
+        # alimenta a todos los candidatos
+        fit_start = time.perf_counter()
+        rng = np.random.default_rng(random_state)
+        for _ in range(epochs):
+            for X, y in dataset.chunks('train'):
+                order = rng.permutation(len(X))
+                X_scaled = scaler.transform(X[order])
+                for _, _, model in candidates:
+                    if task == 'classification':
+                        model.partial_fit(X_scaled, y[order], classes=classes)
+                    elif task == 'regression':
+                        model.partial_fit(X_scaled, y[order])
+                    else:
+                        model.partial_fit(X_scaled)
+        fit_seconds = time.perf_counter() - fit_start
+
+        scores = [_StreamedScore(task) for _ in candidates]
+        for X, y in dataset.chunks('test'):
+            X_scaled = scaler.transform(X)
+            for (_, _, model), score in zip(candidates, scores):
+                if task == 'clustering':
+                    score.add(None, inertia=-model.score(X_scaled))
+                else:
+                    score.add(y, model.predict(X_scaled))
+
+        best_model, best_score = None, float('-inf')
+        for (name, params, model), score in zip(candidates, scores):
+            value = score.result()
+            report["candidates"].append({"model": name, "params": params, "status": "done",
+                                         "seconds": fit_seconds / len(candidates), "score": value})
+            if value > best_score:
+                best_model, best_score = model, value
+
+        if task in ('classification', 'regression'):
+            for params in ml.ParameterGrid((custom_params or {}).get('xgb', {})):
+                entry = {"model": "xgb", "params": params, "status": "done"}
+                xgb_start = time.perf_counter()
+                booster, value = MLTools._stream_xgb(ml, dataset, scaler, task, classes, params)
+                entry.update(seconds=time.perf_counter() - xgb_start, score=value)
+                report["candidates"].append(entry)
+                if value > best_score:
+                    best_model, best_score = booster, value
+
+        report.update(
+            rows=dataset.rows,
+            wall_time=time.perf_counter() - start,
+            peak_python_memory_mb=tracemalloc.get_traced_memory()[1] / 2 ** 20,
+            peak_rss_mb=_peak_rss_mb(),
+        )
+        return best_model, scaler, best_score, report
+
+    @staticmethod
+    def _stream_xgb(ml, dataset, scaler, task, classes, params):
+        """Entrena XGBoost en memoria externa y lo evalúa en el hold-out"""
+        np = ml.np
+        params = dict(params)
+        rounds = params.pop('n_estimators', XGB_MAX_ROUNDS)
+        booster_params = {'tree_method': 'hist', **params}
+        if task == 'classification':
+            encode = lambda y: np.searchsorted(classes, y)
+            if len(classes) > 2:
+                booster_params.update(objective='multi:softprob', num_class=len(classes))
+            else:
+                booster_params.update(objective='binary:logistic')
+        else:
+            encode = lambda y: y
+            booster_params.setdefault('objective', 'reg:squarederror')
+
+        with tempfile.TemporaryDirectory(prefix="victoria-xgb-") as cache_dir:
+            train_iter = _xgb_stream_iter(
+                ml, dataset, scaler, encode, os.path.join(cache_dir, "train"), 'train'
+            )
+            booster = ml.xgb.train(booster_params, ml.xgb.DMatrix(train_iter), num_boost_round=rounds)
+        if task == 'classification':
+            # El Booster solo conoce índices: las etiquetas viajan con él para
+            # que BatchPredictor pueda devolverlas
+            booster.set_attr(classes=json.dumps(classes.tolist()))
+
+        score = _StreamedScore(task)
+        for X, y in dataset.chunks('test'):
+            predicted = booster.predict(ml.xgb.DMatrix(scaler.transform(X)))
+            if task == 'classification':
+                index = predicted.argmax(axis=1) if predicted.ndim > 1 else (predicted > 0.5).astype(int)
+                predicted = classes[index]
+            score.add(y, predicted)
+        return booster, score.result()
+
+    @staticmethod
+    def _auto_ml_serial(ml, task, custom_params, X_train, y_train, X_test, y_test, deadline,
+                        search='grid', n_jobs=None):
+        best_score = float('-inf')
+        best_model = None
+        report = {"mode": "serial" if search == 'grid' else search, "workers": n_jobs or 1,
+                  "timed_out": False, "candidates": []}
+
+        for name, model in _candidate_models(ml, task):
+            entry = {"model": name, "phase": "fit", "params": {}, "status": "cancelled",
+                     "seconds": None, "score": None}
+            report["candidates"].append(entry)
+            if deadline and time.perf_counter() >= deadline:
+                report["timed_out"] = True
+                continue
+
+            fit_start = time.perf_counter()
+            if custom_params and search == 'halving':
+                model = MLTools._halving_search(
+                    ml, name, model, custom_params.get(name, {}), X_train, y_train, n_jobs, entry
+                )
+            elif custom_params:
+                grid = ml.GridSearchCV(model, custom_params.get(name, {}))
+                grid.fit(X_train, y_train)
+                model = grid.best_estimator_
+                entry["params"] = grid.best_params_
+            else:
+                model.fit(X_train, y_train)
+
+            score = model.score(X_test, y_test)
+            entry.update(status="done", seconds=time.perf_counter() - fit_start, score=score)
+            if score > best_score:
+                best_score = score
+                best_model = model
+
+        if search == 'halving':
+            report["time_saved"] = sum(c.get("time_saved", 0.0) for c in report["candidates"])
+        return best_model, best_score, report
+
+    @staticmethod
+    def _halving_search(ml, name, model, param_grid, X_train, y_train, n_jobs, entry):
+        """Busca la mejor configuración con successive halving y la reentrena"""
+        grid = list(ml.ParameterGrid(param_grid))
+        is_xgb = name == 'xgb'
+        params = grid[0] if grid else {}
+        if len(grid) > 1:
+            # En XGBoost el recurso son las rondas de boosting, salvo que la
+            # grilla ya las explore; en el resto, el número de muestras
+            if is_xgb and not any('n_estimators' in point for point in grid):
+                resource, max_resources = 'n_estimators', XGB_MAX_ROUNDS
+            else:
+                resource, max_resources = 'n_samples', 'auto'
+            halving = ml.HalvingGridSearchCV(
+                model, param_grid, factor=HALVING_FACTOR, resource=resource,
+                max_resources=max_resources, min_resources='exhaust', n_jobs=n_jobs
+            )
+            search_start = time.perf_counter()
+            halving.fit(X_train, y_train)
+            search_time = time.perf_counter() - search_start - halving.refit_time_
+            full_grid_time = MLTools._estimate_full_grid_time(halving)
+            entry.update(
+                search_time=search_time,
+                full_grid_estimate=full_grid_time,
+                time_saved=max(full_grid_time - search_time, 0.0),
+                candidates_per_iteration=list(halving.n_candidates_)
+            )
+            params = halving.best_params_
+            if not is_xgb:
+                entry["params"] = params
+                return halving.best_estimator_
+            if resource == 'n_estimators':
+                # El early stopping decide las rondas finales
+                params = {k: v for k, v in params.items() if k != 'n_estimators'}
+
+        entry["params"] = params
+        model.set_params(**params)
+        if not is_xgb:
+            model.fit(X_train, y_train)
+            return model
+
+        # Reentrenar el mejor XGBoost deteniéndose cuando la validación deja de mejorar
+        if model.get_params().get('n_estimators') is None:
+            model.set_params(n_estimators=XGB_MAX_ROUNDS)
+        model.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        X_fit, X_val, y_fit, y_val = ml.train_test_split(X_train, y_train, test_size=VALIDATION_SIZE)
+        model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        entry["boosting_rounds"] = model.best_iteration + 1
+        return model
+
+    @staticmethod
+    def _estimate_full_grid_time(search):
+        """Estima cuánto habría tardado la grilla completa con todos los recursos"""
+        results = search.cv_results_
+        last_iteration = search.n_iterations_ - 1
+        times = [
+            fit + score
+            for fit, score, iteration in zip(
+                results['mean_fit_time'], results['mean_score_time'], results['iter']
+            )
+            if iteration == last_iteration
+        ]
+        per_fit = sum(times) / len(times)
+        # Escalado lineal desde los recursos de la última ronda hasta el máximo
+        per_fit *= search.max_resources_ / search.n_resources_[last_iteration]
+        return per_fit * search.n_splits_ * search.n_candidates_[0]
+
+    @staticmethod
+    def _auto_ml_parallel(ml, task, custom_params, X_train, y_train, X_test, y_test,
+                          n_jobs, deadline):
+        # Puntos de la grilla por modelo; una grilla de un solo punto se
+        # entrena directamente porque la validación cruzada no cambiaría nada
+        grids = {
+            name: list(ml.ParameterGrid(custom_params.get(name, {}))) if custom_params else [{}]
+            for name, _ in _candidate_models(ml, task)
+        }
+        n_tasks = max(sum(len(grid) for grid in grids.values()), 1)
+        workers = max(1, min(n_jobs or os.cpu_count() or 1, n_tasks))
+        report = {"mode": "parallel", "workers": workers, "timed_out": False, "candidates": []}
+        cv_scores = {name: [None] * len(grid) for name, grid in grids.items()}
+        results = queue.Queue()
+        pending = 0
+        best_score = float('-inf')
+        best_model = None
+
+        # spawn evita heredar hilos de Streamlit u OpenMP a medio inicializar
+        pool = multiprocessing.get_context("spawn").Pool(
+            processes=workers, initializer=_init_worker, initargs=(X_train, y_train)
+        )
+
+        def submit(name, index, params, cross_validate):
+            nonlocal pending
+            entry = {"model": name, "phase": "cv" if cross_validate else "fit",
+                     "params": params, "status": "running", "seconds": None, "score": None}
+            report["candidates"].append(entry)
+            pool.apply_async(
+                _run_candidate, (task, name, params, cross_validate),
+                callback=lambda result: results.put((entry, index, result, None)),
+                error_callback=lambda error: results.put((entry, index, None, error))
+            )
+            pending += 1
+
+        try:
+            for name, grid in grids.items():
+                if len(grid) == 1:
+                    submit(name, 0, grid[0], False)
+                else:
+                    for index, params in enumerate(grid):
+                        submit(name, index, params, True)
+
+            while pending:
+                timeout = None
+                if deadline:
+                    timeout = deadline - time.perf_counter()
+                    if timeout <= 0:
+                        raise queue.Empty
+                entry, index, result, error = results.get(timeout=timeout)
+                pending -= 1
+                name = entry["model"]
+                if error is not None:
+                    entry.update(status="error", error=str(error))
+                    if entry["phase"] != "cv":
+                        continue
+                    # Como error_score=nan de GridSearchCV: el punto cuenta como
+                    # evaluado y el modelo se reentrena con el mejor que terminó
+                    score = float('nan')
+                else:
+                    score, model, seconds = result
+                    entry.update(status="done", seconds=seconds)
+                if entry["phase"] == "cv":
+                    entry["score"] = score
+                    cv_scores[name][index] = score
+                    done = [s for s in cv_scores[name] if s is not None]
+                    if len(done) == len(grids[name]):
+                        completed = [s for s in done if not math.isnan(s)]
+                        if completed:
+                            # Igual que GridSearchCV: ante empate gana el primero
+                            best_index = cv_scores[name].index(max(completed))
+                            submit(name, best_index, grids[name][best_index], False)
+                    continue
+
+                score = model.score(X_test, y_test)
+                entry["score"] = score
+                if score > best_score:
+                    best_score = score
+                    best_model = model
+            pool.close()
+        except queue.Empty:
+            # Presupuesto agotado: cancelar lo pendiente y lo que siga corriendo
+            report["timed_out"] = True
+            for entry in report["candidates"]:
+                if entry["status"] == "running":
+                    entry["status"] = "cancelled"
+            pool.terminate()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+        return best_model, best_score, report
@@ -0,0 +1,216 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Tamaño de lectura al calcular el hash de un archivo
+_HASH_BLOCK = 1 << 20
+# Candados de entrenamiento por clave: un conjunto fijo de archivos
+# compartido por todas las claves en lugar de un archivo por clave
+LOCK_STRIPES = 64
+
+def fingerprint_arrays(*arrays):
+    """Hash del contenido de arrays de numpy, listas o DataFrames/Series de pandas"""
+    import numpy as np
+    import pandas as pd
+    digest = hashlib.blake2b(digest_size=32)
+    for data in arrays:
+        if data is None:
+            digest.update(b"none")
+            continue
+        if isinstance(data, (pd.DataFrame, pd.Series)):
+            # pandas: hash por fila, que también cubre columnas de texto
+            columns = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+            digest.update(json.dumps(columns, default=str).encode("utf-8"))
+            data = pd.util.hash_pandas_object(data, index=False).to_numpy()
+        array = np.asarray(data)
+        digest.update(f"{array.dtype.str}{array.shape}".encode("ascii"))
+        if array.dtype.hasobject:
+            digest.update(json.dumps(array.tolist(), default=str).encode("utf-8"))
+        else:
+            digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+def fingerprint_file(path):
+    """Hash del contenido de un archivo, leído por bloques"""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def make_key(data_fingerprint, task, params=None):
+    """Clave del artefacto: hash del dataset + tarea + parámetros"""
+    payload = json.dumps(
+        {"data": data_fingerprint, "task": task, "params": params or {}},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ModelArtifactCache:
+    """Caché en disco de resultados de auto_ml (modelo, scaler y score).
+
+    Cada artefacto es un archivo joblib sin comprimir con nombre igual a su
+    clave, así que se carga con los arrays de numpy mapeados en memoria en
+    lugar de copiarlos. Se escribe en un temporal y se publica con
+    os.replace, por lo que ningún proceso lee un archivo a medias. Un
+    candado de archivo serializa la expulsión LRU (por fecha de último uso)
+    y evita que varios workers entrenen el mismo artefacto a la vez; las
+    claves se reparten entre LOCK_STRIPES candados, así que el directorio no
+    acumula un archivo de candado por cada clave entrenada.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or os.getenv(
+            "VICTORIA_MODEL_CACHE_DIR",
+            os.path.join(os.path.expanduser("~"), ".cache", "victoria", "models")
+        )
+        self.max_bytes = max_bytes or int(float(os.getenv("VICTORIA_MODEL_CACHE_MB", "1024")) * 2 ** 20)
+        os.makedirs(self.root, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.joblib")
+
+    def _key_lock(self, key):
+        return self._file_lock(f"stripe-{zlib.crc32(key.encode('utf-8')) % LOCK_STRIPES:02d}")
+
+    @contextlib.contextmanager
+    def _file_lock(self, name):
+        # Candado entre procesos (y entre hilos, vía un descriptor por llamada)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.root, f".{name}.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get(self, key):
+        """Retorna el artefacto guardado (dict) o None si no existe"""
+        artifact = self._load(key)
+        with self._lock:
+            if artifact is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return artifact
+
+    def _load(self, key):
+        import joblib
+        path = self._path(key)
+        try:
+            artifact = joblib.load(path, mmap_mode="r")
+            # La fecha de modificación marca el último uso para el LRU
+            os.utime(path)
+        except (FileNotFoundError, EOFError):
+            return None
+        return artifact
+
+    def set(self, key, model, scaler, score, meta=None):
+        """Guarda un artefacto y expulsa los menos usados si se pasa del límite"""
+        import joblib
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        artifact = {"model": model, "scaler": scaler, "score": score,
+                    "meta": meta or {}, "created_at": time.time()}
+        joblib.dump(artifact, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Retorna el artefacto de la clave o lo calcula una sola vez.
+
+        compute() debe retornar (modelo, scaler, score, meta). Si otro
+        proceso ya está calculando la misma clave, se espera a que termine y
+        se reutiliza su resultado. Si compute retorna meta con cache=False,
+        el resultado se entrega sin guardarlo.
+        """
+        artifact = self.get(key)
+        if artifact is not None:
+            return artifact, True
+        with self._key_lock(key):
+            artifact = self._load(key)
+            if artifact is not None:
+                return artifact, True
+            model, scaler, score, meta = compute()
+            if meta.get("cache", True):
+                self.set(key, model, scaler, score, meta)
+        return {"model": model, "scaler": scaler, "score": score, "meta": meta}, False
+
+    def evict(self):
+        """Borra los artefactos menos usados hasta quedar bajo max_bytes"""
+        with self._file_lock("evict"):
+            entries = []
+            for name in os.listdir(self.root):
+                if not name.endswith(".joblib"):
+                    continue
+                try:
+                    info = os.stat(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            # Un lector con el archivo mapeado lo conserva aunque se borre
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+            return total
+
+    def clear(self):
+        """Borra todos los artefactos y los candados por clave de versiones anteriores"""
+        with self._file_lock("evict"):
+            for name in os.listdir(self.root):
+                legacy_lock = (name.endswith(".lock") and name != ".evict.lock"
+                               and not name.startswith(".stripe-"))
+                if name.endswith(".joblib") or legacy_lock:
+                    os.remove(os.path.join(self.root, name))
+
+    def stats(self):
+        """Retorna aciertos, fallos, artefactos y bytes en disco"""
+        sizes = [
+            os.path.getsize(os.path.join(self.root, name))
+            for name in os.listdir(self.root) if name.endswith(".joblib")
+        ]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+        }
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_model_cache():
+    """Retorna la caché de artefactos del proceso.
+
+    Se configura con VICTORIA_MODEL_CACHE_DIR (por defecto
+    ~/.cache/victoria/models) y VICTORIA_MODEL_CACHE_MB (por defecto 1024).
+    Todos los workers que apunten al mismo directorio la comparten.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ModelArtifactCache()
+    return _shared_cache
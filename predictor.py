@@ -0,0 +1,199 @@
+import copy
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import ml_tools
+
+# Filas por lote: suficientes para amortizar la llamada al modelo y pocas
+# para que los buffers de cada lote quepan en la caché L2/L3 con decenas de
+# columnas
+PREDICT_BATCH_ROWS = 16_384
+
+def default_threads():
+    """Hilos de inferencia de XGBoost y RandomForest (VICTORIA_PREDICT_THREADS)"""
+    return int(os.getenv("VICTORIA_PREDICT_THREADS", str(os.cpu_count() or 1)))
+
+class BatchPredictor:
+    """Predicción vectorizada por lotes para los resultados de auto_ml.
+
+    Recibe el par (modelo, scaler) que retorna MLTools.auto_ml o
+    auto_ml_from_file (incluido el xgboost.Booster de este último). Las
+    filas se copian a dos buffers float64 preasignados de batch_rows filas:
+    mientras un hilo escala y predice un buffer, el llamador llena el otro
+    con el siguiente tramo de la entrada. Un StandardScaler se aplica en el
+    lugar y en float64, como scaler.transform; cualquier otro scaler usa su
+    transform. Solo XGBoost y RandomForest reciben después un buffer float32
+    (el tipo con el que comparan los árboles); escalar en float32 movería
+    valores justo sobre un umbral de corte al otro lado, y el resto de los
+    modelos (KMeans, lineales) predice sobre float64. XGBoost y RandomForest
+    usan n_threads hilos dentro de cada lote, sobre una copia del modelo
+    para no cambiar la configuración del original.
+    """
+
+    def __init__(self, model, scaler=None, batch_rows=PREDICT_BATCH_ROWS, n_threads=None):
+        self.ml = ml_tools.load_ml_stack()
+        self.scaler = scaler
+        self.batch_rows = batch_rows
+        self.n_threads = n_threads or default_threads()
+        self.model = self._prepare_model(model)
+        self.rows = 0
+        self.seconds = 0.0
+        self._buffers = None
+        self._lock = threading.Lock()
+        np = self.ml.np
+        # Media y escala en float64, las mismas operaciones que scaler.transform
+        self._mean = self._scale = None
+        self._inplace_scale = isinstance(scaler, self.ml.StandardScaler)
+        if self._inplace_scale:
+            # mean_ existe aunque with_mean=False; solo cuentan las opciones
+            if scaler.with_mean:
+                self._mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if scaler.with_std and scaler.scale_ is not None:
+                self._scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self._float32 = isinstance(self.model, (self.ml.xgb.Booster, self.ml.xgb.XGBModel,
+                                                self.ml.RandomForestClassifier))
+
+    def _prepare_model(self, model):
+        xgb = self.ml.xgb
+        self._classes = None
+        if isinstance(model, xgb.Booster):
+            model = model.copy()
+            model.set_param({"nthread": self.n_threads})
+            if model.attr("classes"):
+                self._classes = self.ml.np.array(json.loads(model.attr("classes")))
+            return model
+        if isinstance(model, xgb.XGBModel):
+            # Copia completa: el Booster interno es el que guarda nthread
+            model = copy.deepcopy(model)
+            model.get_booster().set_param({"nthread": self.n_threads})
+            return model
+        if "n_jobs" in model.get_params():
+            # Copia superficial: comparte los árboles ya entrenados
+            model = copy.copy(model)
+            model.n_jobs = self.n_threads
+        return model
+
+    def _buffer_pair(self, n_features):
+        # Por lote: entrada float64 (se escala en el lugar) y, para los
+        # árboles, su copia float32
+        np = self.ml.np
+        if self._buffers is None or self._buffers[0][0].shape[1] != n_features:
+            self._buffers = [
+                (np.empty((self.batch_rows, n_features), dtype=np.float64),
+                 np.empty((self.batch_rows, n_features), dtype=np.float32) if self._float32 else None)
+                for _ in range(2)
+            ]
+        return self._buffers
+
+    def _predict_buffer(self, buffers, rows):
+        np = self.ml.np
+        start = time.perf_counter()
+        X = buffers[0][:rows]
+        if self._mean is not None:
+            np.subtract(X, self._mean, out=X)
+        if self._scale is not None:
+            np.divide(X, self._scale, out=X)
+        if self.scaler is not None and not self._inplace_scale:
+            X = self.scaler.transform(X)
+        if self._float32:
+            X32 = buffers[1][:rows]
+            np.copyto(X32, X, casting="same_kind")
+            X = X32
+
+        if isinstance(self.model, self.ml.xgb.Booster):
+            predicted = self.model.inplace_predict(X)
+            if self._classes is not None:
+                index = predicted.argmax(axis=1) if predicted.ndim > 1 else (predicted > 0.5).astype(int)
+                predicted = self._classes[index]
+        else:
+            predicted = self.model.predict(X)
+
+        elapsed = time.perf_counter() - start
+        metrics.histogram(metrics.PREDICT_BATCH_SECONDS, "Duración de cada lote de predicción").observe(elapsed)
+        metrics.counter(metrics.PREDICTED_ROWS_TOTAL, "Filas predichas por BatchPredictor").inc(rows)
+        return predicted
+
+    def _as_array(self, chunk, columns):
+        np = self.ml.np
+        if hasattr(chunk, "columns"):
+            if columns is not None:
+                chunk = chunk[columns]
+            return chunk.to_numpy(dtype=np.float64)
+        array = np.asarray(chunk)
+        return array.reshape(1, -1) if array.ndim == 1 else array
+
+    def predict_iter(self, chunks, columns=None):
+        """Genera las predicciones de cada lote para un iterable de bloques.
+
+        Los bloques (arrays 2D o DataFrames, de cualquier tamaño) se
+        reagrupan en lotes de batch_rows filas. Las predicciones salen en el
+        mismo orden que las filas.
+        """
+        start = time.perf_counter()
+        pending = deque()
+        rows = 0
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="predict") as executor:
+            buffers, slot, fill = None, 0, 0
+            for chunk in chunks:
+                X = self._as_array(chunk, columns)
+                if buffers is None:
+                    buffers = self._buffer_pair(X.shape[1])
+                offset = 0
+                while offset < len(X):
+                    take = min(self.batch_rows - fill, len(X) - offset)
+                    buffers[slot][0][fill:fill + take] = X[offset:offset + take]
+                    fill += take
+                    offset += take
+                    if fill == self.batch_rows:
+                        pending.append(executor.submit(self._predict_buffer, buffers[slot], fill))
+                        rows += fill
+                        slot, fill = slot ^ 1, 0
+                        # El otro buffer se reutiliza solo cuando su lote terminó
+                        if len(pending) == 2:
+                            yield pending.popleft().result()
+            if fill:
+                pending.append(executor.submit(self._predict_buffer, buffers[slot], fill))
+                rows += fill
+            while pending:
+                yield pending.popleft().result()
+        with self._lock:
+            self.rows += rows
+            self.seconds += time.perf_counter() - start
+
+    def predict(self, X, columns=None):
+        """Predice un array 2D o DataFrame completo y retorna un solo array"""
+        np = self.ml.np
+        X = X if hasattr(X, "columns") else self._as_array(X, None)
+        slices = (X.iloc[i:i + self.batch_rows] if hasattr(X, "iloc") else X[i:i + self.batch_rows]
+                  for i in range(0, len(X), self.batch_rows))
+        out, offset = None, 0
+        for predicted in self.predict_iter(slices, columns):
+            if out is None:
+                out = np.empty((len(X),) + predicted.shape[1:], dtype=predicted.dtype)
+            out[offset:offset + len(predicted)] = predicted
+            offset += len(predicted)
+        return out if out is not None else np.empty(0)
+
+    def predict_file(self, path, columns=None, chunk_rows=ml_tools.STREAM_CHUNK_ROWS):
+        """Genera predicciones por lotes leyendo un CSV, Parquet o Feather por bloques.
+
+        columns son las columnas de entrada del modelo (por defecto, todas).
+        Sirve también para un dataset ingerido: predict_file(handle.path).
+        """
+        return self.predict_iter(ml_tools.iter_table_chunks(path, chunk_rows, columns))
+
+    def stats(self):
+        """Filas predichas, segundos y filas por segundo acumulados"""
+        with self._lock:
+            return {
+                "rows": self.rows,
+                "seconds": self.seconds,
+                "rows_per_second": self.rows / self.seconds if self.seconds else 0.0,
+                "batch_rows": self.batch_rows,
+                "threads": self.n_threads,
+            }
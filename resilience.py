@@ -0,0 +1,170 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+import openai
+
+# Códigos HTTP que vale la pena reintentar: timeout, conflicto, límite de
+# peticiones y errores del servidor
+RETRIABLE_STATUS = {408, 409, 429}
+
+class UpstreamError(Exception):
+    """Error del upstream que se muestra tal cual al usuario"""
+
+class FirstTokenTimeout(UpstreamError):
+    """El stream se abrió (o no) pero el primer token no llegó a tiempo"""
+
+    def __init__(self, timeout):
+        super().__init__(f"DeepSeek no envió el primer token en {timeout:.0f} s")
+        self.timeout = timeout
+
+class CircuitOpenError(UpstreamError):
+    """El circuito está abierto: no se llama al upstream por un rato"""
+
+    def __init__(self, retry_in):
+        super().__init__(
+            f"DeepSeek no está respondiendo; se reintentará en {max(retry_in, 0):.0f} s"
+        )
+        self.retry_in = retry_in
+
+def is_retriable(error):
+    """Indica si un error antes del primer token justifica reintentar"""
+    if isinstance(error, FirstTokenTimeout):
+        return True
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRIABLE_STATUS or error.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+def error_kind(error):
+    """Nombre corto del error para las métricas"""
+    if isinstance(error, openai.APIStatusError):
+        return f"http_{error.status_code}"
+    return type(error).__name__
+
+class RetryPolicy:
+    """Reintentos con backoff exponencial y jitter completo.
+
+    Cada espera es aleatoria entre 0 y base_delay * 2^intento (con tope en
+    max_delay), para que muchas sesiones que fallan a la vez no vuelvan a
+    golpear al upstream en el mismo instante.
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        self.max_attempts = max_attempts or int(os.getenv("VICTORIA_RETRY_ATTEMPTS", "3"))
+        self.base_delay = base_delay if base_delay is not None else float(
+            os.getenv("VICTORIA_RETRY_BASE_DELAY", "0.25")
+        )
+        self.max_delay = max_delay if max_delay is not None else float(
+            os.getenv("VICTORIA_RETRY_MAX_DELAY", "4")
+        )
+
+    def delay(self, attempt):
+        """Espera antes del reintento número `attempt` (desde 0)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+class CircuitBreaker:
+    """Circuit breaker clásico: cerrado, abierto y semiabierto.
+
+    Tras `failure_threshold` fallos seguidos se abre y rechaza las llamadas
+    durante `reset_timeout` segundos; después deja pasar una sola llamada de
+    prueba y se cierra si esta sale bien.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = failure_threshold or int(os.getenv("VICTORIA_BREAKER_FAILURES", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("VICTORIA_BREAKER_RESET", "30"))
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Lanza CircuitOpenError si el circuito no permite llamar ahora"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(self.reset_timeout - elapsed)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Libera la llamada de prueba si terminó sin éxito ni fallo (cancelada)"""
+        with self._lock:
+            self._probing = False
+
+async def hedged(start, timeout, discard, hedge_after=None):
+    """Lanza `start()` y, si tarda más de `hedge_after`, una segunda copia.
+
+    Se queda con la primera copia que termine bien, cancela la otra y
+    retorna (índice de la copia, resultado). Si todas fallan relanza el
+    último error y si se agota `timeout` lanza asyncio.TimeoutError. Las
+    corrutinas canceladas deben liberar sus recursos al cancelarse; los
+    resultados que terminaron bien pero perdieron se entregan a `discard`.
+    """
+    loop = asyncio.get_running_loop()
+    tasks = [loop.create_task(start())]
+    pending = set(tasks)
+    deadline = loop.time() + timeout
+    hedge_at = loop.time() + hedge_after if hedge_after else None
+    winner = None
+    error = None
+    try:
+        while pending:
+            now = loop.time()
+            if now >= deadline:
+                raise asyncio.TimeoutError()
+            wait = deadline - now
+            if hedge_at is not None:
+                if now >= hedge_at:
+                    # Ninguna copia respondió a tiempo: lanzar la de respaldo
+                    hedge_at = None
+                    task = loop.create_task(start())
+                    tasks.append(task)
+                    pending.add(task)
+                else:
+                    wait = min(wait, hedge_at - now)
+            done, pending = await asyncio.wait(
+                pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    winner = task
+                    return tasks.index(task), task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled() and task.exception() is None:
+                await discard(task.result())
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Signos que no cambian la pregunta ("¿Qué es k-means?" == "qué es k-means").
+# Las tildes se conservan: "papa" y "papá" son preguntas distintas
+_EDGE_PUNCTUATION = "¿?¡!.,;: \t\n"
+_WHITESPACE = re.compile(r"\s+")
+_REPLAY_CHUNK = re.compile(r"\s*\S+|\s+")
+
+def normalize_prompt(prompt):
+    """Normaliza un prompt para que preguntas equivalentes compartan entrada"""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    text = _WHITESPACE.sub(" ", text)
+    return text.strip(_EDGE_PUNCTUATION)
+
+def hash_text(text):
+    """Retorna el hash SHA-256 de un texto (por ejemplo, el system prompt)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def make_key(prompt, system_hash, model, context=""):
+    """Clave de caché: prompt normalizado + hash del system prompt + modelo.
+
+    context identifica el historial enviado junto al prompt (vacío en el
+    primer turno), para no reutilizar respuestas dadas en otra conversación.
+    """
+    return hash_text(f"{model}\0{system_hash}\0{context}\0{normalize_prompt(prompt)}")
+
+def replay_chunks(text):
+    """Divide una respuesta guardada en fragmentos palabra a palabra para el streaming"""
+    return _REPLAY_CHUNK.findall(text)
+
+class ResponseCache:
+    """Caché de respuestas con LRU y TTL en memoria y un nivel opcional en disco.
+
+    El nivel en memoria es propio de cada proceso; el nivel SQLite (modo WAL)
+    se comparte entre todos los procesos de Streamlit que apunten al mismo
+    archivo. Las entradas guardan el hash del system prompt para poder
+    invalidarlas cuando este cambia.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, system_hash TEXT NOT NULL,"
+                " response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_system_hash ON responses (system_hash)"
+            )
+            self._db.commit()
+
+    def get(self, key):
+        """Retorna la respuesta guardada o None si no existe o expiró"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, _, created_at = entry
+                if now - created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, system_hash, created_at FROM responses WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is not None and now - row[2] < self.ttl:
+                    self._remember(key, row[0], row[1], row[2])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key, response, system_hash):
+        """Guarda una respuesta completa en memoria y, si está activo, en disco"""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, response, system_hash, created_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, system_hash, response, created_at)
+                )
+                self._db.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (created_at - self.ttl,)
+                )
+                self._db.commit()
+
+    def invalidate(self, system_hash=None):
+        """Elimina las entradas de un system prompt, o todas si no se indica"""
+        with self._lock:
+            if system_hash is None:
+                self._entries.clear()
+            else:
+                stale = [k for k, (_, h, _) in self._entries.items() if h == system_hash]
+                for key in stale:
+                    del self._entries[key]
+            if self._db is not None:
+                if system_hash is None:
+                    self._db.execute("DELETE FROM responses")
+                else:
+                    self._db.execute("DELETE FROM responses WHERE system_hash = ?", (system_hash,))
+                self._db.commit()
+
+    def stats(self):
+        """Retorna los contadores de aciertos y fallos"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def _remember(self, key, response, system_hash, created_at):
+        self._entries[key] = (response, system_hash, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_shared_cache():
+    """Retorna la caché compartida por todas las sesiones del proceso.
+
+    Se configura con VICTORIA_CACHE_SIZE, VICTORIA_CACHE_TTL (segundos) y
+    VICTORIA_CACHE_DB (ruta del archivo SQLite; sin ella no hay nivel en disco).
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                max_entries=int(os.getenv("VICTORIA_CACHE_SIZE", "256")),
+                ttl=float(os.getenv("VICTORIA_CACHE_TTL", "3600")),
+                db_path=os.getenv("VICTORIA_CACHE_DB") or None
+            )
+    return _shared_cache
@@ -0,0 +1,128 @@
+import os
+import re
+import threading
+
+# Patrones de peticiones de código, compilados una sola vez por proceso.
+# IGNORECASE evita crear una copia en minúsculas de cada mensaje.
+CODE_PATTERN = re.compile(
+    r"\b(?:código|programar|script|función|analizar datos"
+    r"|pandas|numpy|matplotlib|seaborn|python|ml|machine learning"
+    r"|gráfico|gráfica|visualización|plot|predict|entrenar)\b",
+    re.IGNORECASE
+)
+# Mensajes de hasta estos caracteres sin pedir código se consideran
+# preguntas conceptuales
+SHORT_MESSAGE_CHARS = 240
+
+CONCEPT = "concept"
+CODE = "code"
+GENERAL = "general"
+
+# Instrucción que acompaña a las preguntas conceptuales: la respuesta corta
+# la pide el modelo y max_tokens queda solo como red de seguridad
+# (250 palabras en español son unos 400 tokens, bajo el límite de 700)
+CONCISE_INSTRUCTION = "Responde de forma breve y directa, en no más de 250 palabras."
+
+# Configuración por ruta: modelo, max_tokens, temperature (None = valor por
+# defecto de la API) e instrucción agregada al mensaje del usuario.
+# DeepSeek recomienda temperature 0 para código.
+DEFAULT_ROUTES = {
+    CONCEPT: {"model": "deepseek-chat", "max_tokens": 700, "temperature": 1.0,
+              "instruction": CONCISE_INSTRUCTION},
+    CODE: {"model": "deepseek-chat", "max_tokens": 8192, "temperature": 0.0, "instruction": None},
+    GENERAL: {"model": "deepseek-chat", "max_tokens": None, "temperature": None, "instruction": None},
+}
+
+def is_code_request(message):
+    """Indica si el mensaje pide código, análisis o visualizaciones"""
+    return CODE_PATTERN.search(message) is not None
+
+class Route:
+    """Configuración de generación de una ruta"""
+
+    __slots__ = ("name", "model", "max_tokens", "temperature", "instruction")
+
+    def __init__(self, name, model, max_tokens=None, temperature=None, instruction=None):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.instruction = instruction
+
+    @classmethod
+    def from_env(cls, name, defaults):
+        """Ruta con los valores de VICTORIA_ROUTE_<NOMBRE>_MODEL/_MAX_TOKENS/_TEMPERATURE/_INSTRUCTION"""
+        prefix = f"VICTORIA_ROUTE_{name.upper()}_"
+        max_tokens = os.getenv(prefix + "MAX_TOKENS")
+        temperature = os.getenv(prefix + "TEMPERATURE")
+        return cls(
+            name,
+            os.getenv(prefix + "MODEL", defaults["model"]),
+            int(max_tokens) if max_tokens else defaults["max_tokens"],
+            float(temperature) if temperature else defaults["temperature"],
+            os.getenv(prefix + "INSTRUCTION", defaults.get("instruction")) or None,
+        )
+
+    def params(self):
+        """Parámetros extra para chat.completions.create"""
+        params = {}
+        if self.max_tokens is not None:
+            params["max_tokens"] = self.max_tokens
+        if self.temperature is not None:
+            params["temperature"] = self.temperature
+        return params
+
+    def cache_tag(self):
+        """Identifica la configuración en la clave de la caché de respuestas"""
+        return f"{self.model}/{self.name}/{self.max_tokens}/{self.temperature}/{self.instruction or ''}"
+
+    def apply(self, messages):
+        """Agrega la instrucción de la ruta al último mensaje del usuario.
+
+        Va al final y no en el system prompt para no cambiar el prefijo que
+        la API reutiliza de su caché de prompts.
+        """
+        if not self.instruction:
+            return messages
+        last = messages[-1]
+        return messages[:-1] + [{**last, "content": f"{last['content']}\n\n{self.instruction}"}]
+
+    def __repr__(self):
+        return f"Route({self.name!r}, model={self.model!r}, max_tokens={self.max_tokens}, temperature={self.temperature})"
+
+class RequestRouter:
+    """Elige la configuración de generación según el tipo de mensaje.
+
+    Las peticiones de código van a la ruta CODE (más tokens, temperature
+    baja); los mensajes cortos sin código, a CONCEPT (se pide una respuesta
+    breve, con max_tokens como tope); el resto, a GENERAL.
+    """
+
+    def __init__(self, routes=None, short_chars=None):
+        self.routes = routes or {
+            name: Route.from_env(name, defaults) for name, defaults in DEFAULT_ROUTES.items()
+        }
+        self.short_chars = short_chars or int(os.getenv("VICTORIA_ROUTE_SHORT_CHARS", str(SHORT_MESSAGE_CHARS)))
+
+    def classify(self, message):
+        """Retorna el nombre de la ruta del mensaje"""
+        if is_code_request(message):
+            return CODE
+        if len(message) <= self.short_chars:
+            return CONCEPT
+        return GENERAL
+
+    def route(self, message):
+        """Retorna la Route del mensaje"""
+        return self.routes[self.classify(message)]
+
+_shared_router = None
+_shared_router_lock = threading.Lock()
+
+def get_router():
+    """Retorna el router del proceso, configurado con las variables VICTORIA_ROUTE_*"""
+    global _shared_router
+    with _shared_router_lock:
+        if _shared_router is None:
+            _shared_router = RequestRouter()
+    return _shared_router
@@ -0,0 +1,71 @@
+import re
+
+class SecurityValidator:
+    """Valida los mensajes del usuario contra las reglas de seguridad.
+
+    Todas las reglas se compilan una sola vez por proceso en una única
+    expresión combinada que se evalúa en una sola pasada sobre el mensaje en
+    minúsculas. Solo cuando hay coincidencia se identifica qué regla se activó,
+    respetando el mismo orden de prioridad de siempre: primero las palabras
+    clave de intención y luego los patrones bloqueados en el orden declarado.
+    """
+
+    INTENT_KEYWORDS = ["hack", "crack", "exploit", "vulnerability"]
+
+    # Cada alternativa empieza con un literal en minúsculas para que el motor
+    # de regex pueda saltar rápidamente las posiciones que no pueden coincidir
+    BLOCKED_RULES = [
+        ("sql_injection", [r"select.*from", r"insert.*from", r"update.*from", r"delete.*from"]),  # SQL injection
+        ("web_scraping", [r"requests\.get\(", r"urllib\.request", r"selenium"]),  # Web scraping
+        ("code_injection", [r"exec\(", r"eval\(", r"os\.system", r"os\.popen"]),  # Code injection
+        ("executable_file", [r"\.exe", r"\.dll", r"\.bat", r"\.sh"]),  # Executable files
+        ("system_command", [r"rm.*-rf", r"rmdir.*-rf", r"del.*-rf", r"format.*-rf"])  # Dangerous system commands
+    ]
+
+    INTENT_WARNING = "Solicitud potencialmente maliciosa detectada"
+    PATTERN_WARNING = "Patrón de código potencialmente peligroso detectado"
+
+    _combined_regex = re.compile("|".join(
+        [re.escape(kw) for kw in INTENT_KEYWORDS]
+        + [alt for _, alts in BLOCKED_RULES for alt in alts]
+    ))
+    _rule_regexes = [(name, re.compile("|".join(alts))) for name, alts in BLOCKED_RULES]
+    _rule_regexes_ci = [(name, re.compile("|".join(alts), re.IGNORECASE)) for name, alts in BLOCKED_RULES]
+
+    # Caracteres que IGNORECASE equipara a letras ASCII pero que lower() no
+    # convierte igual; si aparecen se evalúa la regla por el camino exacto
+    _casefold_specials = re.compile("[İıſK]")
+
+    def __init__(self):
+        self.blocked_patterns = ["|".join(alts) for _, alts in self.BLOCKED_RULES]
+
+    def match_rule(self, message):
+        """Retorna el nombre de la regla que bloquea el mensaje, o None"""
+        lowered = message.lower()
+        if self._casefold_specials.search(message):
+            return self._match_rule_exact(message, lowered)
+
+        if self._combined_regex.search(lowered) is None:
+            return None
+        return self._match_rule_exact(lowered, lowered)
+
+    def validate_input(self, message):
+        rule = self.match_rule(message)
+        if rule is None:
+            return True, ""
+        if rule.startswith("intent_"):
+            return False, self.INTENT_WARNING
+        return False, self.PATTERN_WARNING
+
+    def _match_rule_exact(self, message, lowered):
+        # Validación de intención
+        for keyword in self.INTENT_KEYWORDS:
+            if keyword in lowered:
+                return "intent_" + keyword
+
+        # Validación de patrones bloqueados
+        regexes = self._rule_regexes if message is lowered else self._rule_regexes_ci
+        for name, regex in regexes:
+            if regex.search(message):
+                return name
+        return None
@@ -1,18 +1,15 @@
 import os
-import re
-from openai import OpenAI
 from dotenv import load_dotenv
 import time
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.cluster import KMeans
-import xgboost as xgb
 import streamlit as st
 import design
+import ml_tools
+import response_cache
+import metrics
+import message_store
+import resilience
+from chat_service import ChatService, TRUNCATED_NOTICE, strip_truncated_notice
+from ml_tools import MLTools
 import json
 import threading
 import openai
@@ -42,161 +39,49 @@ st.set_page_config(
 if not st.secrets.get("RUNNING_IN_STREAMLIT_CLOUD", False):
     load_dotenv()
 
+# Precargar el stack de ML en segundo plano (opcional, solo una vez por proceso)
+if os.getenv("VICTORIA_PREWARM_ML", "").lower() in ("1", "true", "yes"):
+    ml_tools.prewarm()
+
+# Exportar métricas (Prometheus o archivo) si está configurado
+metrics.start_exporters_from_env()
+
 # Aplicar estilos personalizados
 design.set_custom_style()
 
-class SecurityValidator:
-    def __init__(self):
-        self.blocked_patterns = [
-            r"(SELECT|INSERT|UPDATE|DELETE).*FROM",  # SQL injection
-            r"requests\.get\(|urllib\.request|selenium",  # Web scraping
-            r"exec\(|eval\(|os\.(system|popen)",  # Code injection
-            r"\.exe|\.dll|\.bat|\.sh",  # Executable files
-            r"(rm|rmdir|del|format).*-rf"  # Dangerous system commands
-        ]
-    
-    def validate_input(self, message):
-        # Validación de intención
-        if any(pattern in message.lower() for pattern in ["hack", "crack", "exploit", "vulnerability"]):
-            return False, "Solicitud potencialmente maliciosa detectada"
-        
-        # Validación de patrones bloqueados
-        for pattern in self.blocked_patterns:
-            if re.search(pattern, message, re.IGNORECASE):
-                return False, "Patrón de código potencialmente peligroso detectado"
-        
-        return True, ""
-
-class MLTools:
-    @staticmethod
-    def auto_ml(X, y, task='classification', custom_params=None):
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
-        
-        models = {
-            'classification': [
-                ('logistic', LogisticRegression()),
-                ('rf', RandomForestClassifier()),
-                ('xgb', xgb.XGBClassifier())
-            ],
-            'regression': [
-                ('xgb', xgb.XGBRegressor())
-            ],
-            'clustering': [
-                ('kmeans', KMeans())
-            ]
-        }
-        
-        best_score = float('-inf')
-        best_model = None
-        
-        for name, model in models.get(task, []):
-            if custom_params:
-                grid = GridSearchCV(model, custom_params.get(name, {}))
-                grid.fit(X_train_scaled, y_train)
-                model = grid.best_estimator_
-            else:
-                model.fit(X_train_scaled, y_train)
-            
-            score = model.score(X_test_scaled, y_test)
-            if score > best_score:
-                best_score = score
-                best_model = model
-        
-        return best_model, scaler, best_score
+class VictoriaChatbot(ChatService):
+    """ChatService con el render en streaming y el botón de detener de Streamlit"""
 
-class VictoriaChatbot:
     def __init__(self):
+        super().__init__()
         self.stop_generation = False
-        self.response_thread = None
         self.current_response = ""
         self.is_generating = False
-        self.client = OpenAI(
-            api_key=os.getenv("DEEPSEEK_API_KEY"),
-            base_url=os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
-        )
-        self.model = "deepseek-chat"
-        self.security = SecurityValidator()
-        self.system_prompt = """Eres VictorIA, una asistente hombre salvadoreño virtual especializada en **minería de datos y análisis estadístico**, creada por estudiantes de la **Universidad Andrés Bello (UNAB), El Salvador**.  
-
-**Equipo creador:**  
-- **Estudiantes:** Héctor, Germán, Miguel, Víctor, Melissa y Melvin.  
-- **Ingeniero supervisor:** José Guillermo Rivera Pleitez (Contacto: joseguillermo.rivera@unab.edu.sv)
+        self._renderer = None
+        self.last_render_stats = {}
 
-        Tus capacidades incluyen:
-        1. Modelos de Machine Learning:
-           - Regresión y clasificación con scikit-learn
-           - Modelos avanzados con XGBoost
-           - Clustering y segmentación
-           - AutoML para optimización automática
-        
-        2. Visualización de datos:
-           - Gráficos interactivos con Plotly
-           - Visualizaciones declarativas con Altair
-           - Dashboards con Streamlit
-           
-        3. Análisis exploratorio:
-           - Generación automática de informes con pandas-profiling
-           - Detección de outliers y patrones
-           - Análisis de correlaciones
-        
-        4. Validación y seguridad:
-           - Verificación de intención del usuario
-           - Protección contra código malicioso
-           - Cumplimiento de normativas GDPR
-        """
-        self.history = []
-    
-    def _format_messages(self, user_input):
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            *self.history[-4:],
-            {"role": "user", "content": user_input}
-        ]
-        return messages
-    
-    def is_code_request(self, message):
-        patterns = [
-            r"\b(código|programar|script|función|analizar datos)\b",
-            r"\b(pandas|numpy|matplotlib|seaborn|python|ml|machine learning)\b",
-            r"\b(gráfico|gráfica|visualización|plot|predict|entrenar)\b"
-        ]
-        return any(re.search(p, message.lower()) for p in patterns)
-    
-    def validate_request(self, message):
-        # Validación de seguridad
-        is_safe, warning = self.security.validate_input(message)
-        if not is_safe:
-            return False, warning
-        
-        # Validación de longitud
-        if len(message) > 2000:
-            return False, "Mensaje demasiado largo"
-            
-        return True, ""
-    
     def stop_response(self):
         """Detiene la generación de la respuesta actual"""
         self.stop_generation = True
         self.is_generating = False
-        if self.response_thread and self.response_thread.is_alive():
-            self.response_thread.join(timeout=1.0)
+        if self._stream is not None:
+            self._stream.cancel()
     
     def generate_response(self, prompt):
         """Genera una respuesta usando la API de Deepseek con streaming"""
         self.stop_generation = False
         self.current_response = ""
         self.is_generating = True
+        self.last_truncated = False
         
         # Crear un contenedor para la respuesta en streaming
         response_container = st.empty()
+        self._renderer = design.StreamRenderer(response_container)
         stop_button_container = st.empty()
         
         # Mostrar el botón de detener con un diseño más compacto
         with stop_button_container:
-            if st.button("🛑", key="stop_button", help="Detener respuesta"):
+            if st.button("🛑", key="stop_button", help="Detener respuesta", on_click=self.stop_response):
                 self.stop_response()
                 st.markdown("""
                     <div style='color: #ff4b4b; font-size: 0.9em;'>
@@ -205,45 +90,65 @@ class VictoriaChatbot:
                 """, unsafe_allow_html=True)
                 return self.current_response
 
+        route, messages, cache_key = self._prepare(prompt)
+
+        # Si la pregunta ya fue respondida, repetir la respuesta guardada
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            for piece in response_cache.replay_chunks(cached):
+                self._renderer.append(piece)
+            self.current_response = self._renderer.finish()
+            self.last_render_stats = self._renderer.stats()
+            self._record_metrics("cache", self.last_render_stats, route=route)
+            self._remember_turn(prompt, self.current_response)
+            self.is_generating = False
+            return self.current_response
+
         try:
-            # Iniciar la generación de respuesta usando Deepseek
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": prompt}
-                ],
-                stream=True
+            stream_start = time.perf_counter()
+            # Iniciar la generación de respuesta en el motor asíncrono
+            self._stream = self._submit(messages, route, cache_key)
+
+            # Procesar la respuesta en streaming, repintando por lotes
+            try:
+                for content in self._stream.iter_chunks():
+                    if self.stop_generation:
+                        break
+                    self._renderer.append(content)
+            finally:
+                # Si se detuvo o Streamlit interrumpió el script, cortar el upstream
+                self._stream.cancel()
+
+            if not self.stop_generation and self._check_truncated(self._stream, route):
+                self._renderer.append(TRUNCATED_NOTICE)
+            self.current_response = self._renderer.finish()
+            self.last_render_stats = self._renderer.stats()
+            self._record_stream_seconds(route, time.perf_counter() - stream_start)
+            self.last_usage = self._stream.usage
+            self._record_metrics(
+                "stopped" if self.stop_generation else "upstream", self.last_render_stats, self._stream.usage, route
             )
-
-            # Procesar la respuesta en streaming
-            for chunk in response:
-                if self.stop_generation:
-                    break
-                
-                if hasattr(chunk.choices[0].delta, 'content'):
-                    content = chunk.choices[0].delta.content
-                    self.current_response += content
-                    
-                    # Actualizar el contenedor con la respuesta actual usando un diseño más compacto
-                    with response_container:
-                        st.markdown(f"""
-                            <div style='background-color: #f0f2f6; padding: 1rem; border-radius: 0.5rem; margin: 0.5rem 0;'>
-                                {self.current_response}
-                            </div>
-                        """, unsafe_allow_html=True)
-
+            if not self.stop_generation and not self.last_truncated and self.current_response:
+                self.cache.set(cache_key, self.current_response, self._system_hash)
+            self._remember_turn(prompt, self.current_response)
             self.is_generating = False
             return self.current_response
 
         except Exception as e:
             self.is_generating = False
+            metrics.counter(metrics.ERRORS_TOTAL, "Errores al generar respuestas").inc(kind=resilience.error_kind(e))
             return f"Lo siento, ha ocurrido un error: {str(e)}"
 
     def get_current_response(self):
         """Retorna la respuesta actual"""
+        if self.is_generating and self._renderer is not None:
+            return self._renderer.text()
         return self.current_response
 
+    def get_render_stats(self):
+        """Retorna los repintados ahorrados y el tiempo de render de la última respuesta"""
+        return self.last_render_stats
+
     def is_generating_response(self):
         """Verifica si está generando una respuesta"""
         return self.is_generating
@@ -263,6 +168,9 @@ def main():
     
     # Inicializa la interfaz
     design.show_sidebar()
+    design.show_dataset_panel()
+    if os.getenv("VICTORIA_ADMIN_PANEL", "").lower() in ("1", "true", "yes"):
+        design.show_metrics_panel(metrics.get_registry())
     design.show_header()
     design.show_capabilities()
     
@@ -277,9 +185,17 @@ def main():
             st.error(f"No se pudo inicializar el chatbot: {str(e)}")
             return
     
-    # Inicializar historial de mensajes
+    # Inicializar historial de mensajes; si se guarda en disco, el id de
+    # sesión va en la URL para retomar la conversación aunque el worker se reinicie
     if "messages" not in st.session_state:
-        st.session_state.messages = []
+        store = message_store.open_session(st.query_params.get("session"))
+        if store.db is not None:
+            st.query_params["session"] = store.session_id
+        if store.resumed:
+            # El contexto del modelo se reconstruye con los turnos recientes
+            for message in store.tail(store.hot_size):
+                st.session_state.chatbot.context.add_turn(message.role, strip_truncated_notice(message.content))
+        st.session_state.messages = store
     
     # Mostrar interfaz de chat
     design.show_chat_interface(st.session_state.chatbot)